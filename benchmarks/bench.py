@@ -0,0 +1,231 @@
+"""
+Offline benchmarks of the api against the local MockServer. No credentials or network are needed.
+
+    python benchmarks/bench.py                          # run all, save to benchmarks/results/<version>.json
+    python benchmarks/bench.py --latency 0.02 listing   # selected scenarios with 20ms per request
+    python benchmarks/bench.py --compare benchmarks/results/0.9.0.json
+    python benchmarks/bench.py --transport http2 --output http2.json --compare http1.json
+
+Each scenario reports the wall time, operations per sec. (and MB/s for transfers), the number of requests
+and the median / 95th percentile request latency recorded by onedrive.metrics.
+"""
+import argparse
+import json
+import os
+import os.path
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from onedrive import api  # noqa: E402
+from onedrive import client  # noqa: E402
+from onedrive import download  # noqa: E402
+from onedrive import metrics  # noqa: E402
+from onedrive import session  # noqa: E402
+from onedrive import throttle  # noqa: E402
+from onedrive import transfer  # noqa: E402
+from onedrive import transport  # noqa: E402
+from onedrive import upload  # noqa: E402
+from mock_server import MockServer  # noqa: E402
+
+header = {'Authorization': 'bearer benchmark'}
+results_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+# scenario sizes, scaled down by --quick
+sizes = {'children': 2000, 'page': 200, 'small_files': 200, 'large_file': 32 * 1024 * 1024,
+         'metadata_calls': 1000, 'copies': 50}
+
+
+def listing(server, auth, workers):
+    """list a folder with many children, paged"""
+    server.drive.mkdir('/list')
+    for i in range(sizes['children']):
+        server.drive.put('/list/f{:05d}'.format(i), b'')
+    start = time.perf_counter()
+    res = api.list_children('/list', auth, max_results=sizes['page'])
+    assert res.status_code == 200, res.status_code
+    return time.perf_counter() - start, len(res.json_body()['value']), 0
+
+
+def small_files(server, auth, workers):
+    """upload a tree of small files (fan-out)"""
+    with tempfile.TemporaryDirectory() as d:
+        for i in range(sizes['small_files']):
+            sub = os.path.join(d, 'd{}'.format(i % 10))
+            os.makedirs(sub, exist_ok=True)
+            with open(os.path.join(sub, 'f{}.txt'.format(i)), 'wb') as f:
+                f.write(os.urandom(1024))
+        start = time.perf_counter()
+        p = transfer.put_tree(d, '/small', auth, workers=workers, skip_unchanged=False)
+        assert not p.failed, p.failed
+        return time.perf_counter() - start, p.files_done, p.bytes_done
+
+
+def large_upload(server, auth, workers):
+    """upload one large file through an upload session"""
+    with tempfile.TemporaryDirectory() as d:
+        src = os.path.join(d, 'large.bin')
+        with open(src, 'wb') as f:
+            f.write(os.urandom(sizes['large_file']))
+        start = time.perf_counter()
+        res = upload.upload_large(src, '/large.bin', auth, fragment_size=10 * upload.fragment_unit)
+        assert res.status_code in (200, 201), res.status_code
+        return time.perf_counter() - start, 1, sizes['large_file']
+
+
+def large_download(server, auth, workers):
+    """download one large file in parallel segments"""
+    server.drive.put('/large_dl.bin', os.urandom(sizes['large_file']))
+    with tempfile.TemporaryDirectory() as d:
+        start = time.perf_counter()
+        res = download.download_to('/large_dl.bin', os.path.join(d, 'large.bin'), auth, segments=workers)
+        assert res.status_code in (200, 206), res.status_code
+        return time.perf_counter() - start, 1, sizes['large_file']
+
+
+def _metadata_storm(server, auth, workers):
+    for i in range(100):
+        server.drive.put('/meta{}'.format(i), b'x')
+    paths = ['/meta{}'.format(i % 100) for i in range(sizes['metadata_calls'])]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        codes = list(pool.map(lambda p: api.get_metadata(p, auth).status_code, paths))
+    assert set(codes) == {200}, set(codes)
+    return time.perf_counter() - start, len(paths), 0
+
+
+def metadata_storm(server, auth, workers):
+    """many concurrent metadata requests"""
+    return _metadata_storm(server, auth, workers)
+
+
+def throttled(server, auth, workers):
+    """metadata storm where every 10th request is answered with 429"""
+    server.throttle_every = 10
+    try:
+        return _metadata_storm(server, auth, workers)
+    finally:
+        server.throttle_every = 0
+
+
+def copies(server, auth, workers):
+    """copy files and wait for the async monitors"""
+    server.drive.mkdir('/copy')
+    for i in range(sizes['copies']):
+        server.drive.put('/copy/src{}'.format(i), b'x' * 100)
+
+    def copy(i):
+        res = api.copy('/copy/src{}'.format(i), '/copy/dst{}'.format(i), auth)
+        assert res.status_code == 202, res.status_code
+        api.AsyncOperationStatus(res.headers['Location'], auth).block()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(copy, range(sizes['copies'])))
+    return time.perf_counter() - start, sizes['copies'], 0
+
+
+scenarios = {f.__name__: f for f in (listing, small_files, large_upload, large_download, metadata_storm, throttled,
+                                     copies)}
+
+
+transports = {'requests': lambda workers: None,
+              'http2': lambda workers: transport.Http2Transport(max_connections=workers * 2)}
+
+
+def run(names, latency=0.0, workers=8, backend='requests'):
+    """
+    run the scenarios, each against a new MockServer
+    :param backend: one of transports
+    :return: dict scenario -> measurements
+    """
+    results = {}
+    session.configure(pool_maxsize=workers * 2)
+    t = transports[backend](workers)  # None: the default transport
+    throttle.configure(backoff=0.01)  # retry throttled requests quickly
+    try:
+        for name in names:
+            with MockServer(latency=latency) as server:
+                auth = client.Client(header, base_url=server.base_url, transport=t,
+                                     limiter=throttle.RateLimiter(min_rate=100))
+                stats = metrics.enable()
+                seconds, ops, size = scenarios[name](server, auth, workers)
+                metrics.disable()
+
+            requests = sum(s['requests'] for s in stats.snapshot().values())
+            latencies = metrics.Histogram()  # of all requests
+            for s in stats.operations.values():
+                latencies.merge(s.request_latency)
+            results[name] = {'seconds': round(seconds, 4), 'ops': ops, 'ops_per_sec': round(ops / seconds, 1),
+                             'mb_per_sec': round(size / seconds / 1024 / 1024, 2) if size else None,
+                             'requests': requests, 'throttled': server.throttled,
+                             'p50': latencies.quantile(0.5), 'p95': latencies.quantile(0.95)}
+    finally:
+        if t is not None:
+            t.close()
+        throttle.configure()
+        session.close()
+    return results
+
+
+def version():
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'setup.py')) as f:
+        for line in f:
+            if 'version=' in line:
+                return line.split("'")[1]
+    return 'dev'
+
+
+def compare(results, baseline):
+    """:return: lines with the change of the wall time of each scenario"""
+    lines = ['{:16} {:>10} {:>10} {:>8}'.format('scenario', 'baseline', 'now', 'change')]
+    for name, r in results.items():
+        old = baseline.get('results', {}).get(name)
+        if old is None:
+            lines.append('{:16} {:>10} {:>9.3f}s {:>8}'.format(name, '-', r['seconds'], 'new'))
+            continue
+        change = (r['seconds'] - old['seconds']) / old['seconds'] * 100
+        lines.append('{:16} {:>9.3f}s {:>9.3f}s {:>+7.1f}%'.format(name, old['seconds'], r['seconds'], change))
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('scenarios', nargs='*', help='any of {}, default: all'.format(', '.join(scenarios)))
+    parser.add_argument('--latency', type=float, default=0.0, help='sec. injected per request')
+    parser.add_argument('-j', '--workers', type=int, default=8, help='concurrent requests')
+    parser.add_argument('--quick', action='store_true', help='small sizes, e.g. for a smoke test')
+    parser.add_argument('--output', help='result file, default: results/<version>.json')
+    parser.add_argument('--compare', help='result file of an earlier run to compare with')
+    parser.add_argument('--transport', choices=sorted(transports), default='requests',
+                        help='http backend, http2 needs httpx (default: requests)')
+    args = parser.parse_args(argv)
+    unknown = set(args.scenarios) - set(scenarios)
+    if unknown:
+        parser.error('unknown scenarios: ' + ', '.join(sorted(unknown)))
+
+    if args.quick:
+        for k in sizes:
+            sizes[k] = max(1, sizes[k] // 20) if k != 'large_file' else 2 * 1024 * 1024
+    results = run(args.scenarios or list(scenarios), args.latency, args.workers, args.transport)
+    for name, r in results.items():
+        print('{:16} {}'.format(name, ' '.join('{}={}'.format(k, v) for k, v in r.items() if v is not None)))
+
+    output = args.output or os.path.join(results_dir, version() + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({'version': version(), 'python': platform.python_version(), 'date': time.strftime('%Y-%m-%d'),
+                   'latency': args.latency, 'workers': args.workers, 'quick': args.quick, 'transport': args.transport,
+                   'results': results},
+                  f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            print('\n'.join(compare(results, json.load(f))))
+    return results
+
+
+if __name__ == '__main__':
+    main()
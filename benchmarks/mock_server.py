@@ -0,0 +1,121 @@
+"""
+Local HTTP stand-in for the OneDrive api, serving the in-memory fake.FakeDrive over real sockets.
+Latency and throttling (429 + Retry-After) can be injected.
+
+    with MockServer(latency=0.01) as server:
+        api.list_children("/", client.Client(header, base_url=server.base_url))
+"""
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from onedrive.fake import FakeDrive
+
+
+class _Request:
+    """the parts of a requests.PreparedRequest FakeDrive looks at"""
+
+    def __init__(self, method, url, headers, body):
+        self.method = method
+        self.url = url
+        self.headers = headers
+        self.body = body
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, as the real service
+    disable_nagle_algorithm = True  # headers and body are written separately
+
+    def _handle(self):
+        server = self.server.mock
+        length = int(self.headers.get('Content-Length', 0) or 0)
+        body = self.rfile.read(length) if length else None
+        if server.latency:
+            time.sleep(server.latency)
+
+        if server.should_throttle():
+            status, headers, content = 429, {'Retry-After': str(server.retry_after)}, b''
+        else:
+            request = _Request(self.command, server.url + self.path, self.headers, body)
+            with server.lock:  # FakeDrive is not thread-safe
+                status, headers, content = server.drive(request)
+            if isinstance(content, (dict, list)):
+                content = json.dumps(content).encode('utf-8')
+                headers = dict(headers, **{'Content-Type': 'application/json'})
+            elif isinstance(content, str):
+                content = content.encode('utf-8')
+
+        self.send_response(status)
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.send_header('Content-Length', str(len(content or b'')))
+        self.end_headers()
+        if content and self.command != 'HEAD':
+            self.wfile.write(content)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = do_HEAD = _handle
+
+    def log_message(self, *args):
+        pass
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], ConnectionError):  # clients closing their pooled connections
+            super().handle_error(request, client_address)
+
+
+class MockServer:
+    """
+    Serves a FakeDrive on 127.0.0.1 in a background thread, one thread per connection.
+    """
+
+    def __init__(self, drive=None, latency=0.0, throttle_every=0, retry_after=0, port=0):
+        """
+        :param drive: the FakeDrive to serve, default: an empty one
+        :param latency: sec. each request is delayed
+        :param throttle_every: answer every n-th request with 429, 0 = never
+        :param retry_after: Retry-After in sec. of the 429 answers
+        :param port: 0 = any free port
+        """
+        self.drive = drive or FakeDrive()
+        self.latency = latency
+        self.throttle_every = throttle_every
+        self.retry_after = retry_after
+        self.requests = 0
+        self.throttled = 0
+        self.lock = threading.Lock()
+        self.httpd = _Server(('127.0.0.1', port), _Handler)
+        self.httpd.mock = self
+        self.url = 'http://127.0.0.1:{}'.format(self.httpd.server_address[1])
+        self.base_url = self.url + '/v1.0'
+        self.drive.base = self.base_url
+        self.thread = None
+
+    def should_throttle(self):
+        with self.lock:
+            self.requests += 1
+            if self.throttle_every and self.requests % self.throttle_every == 0:
+                self.throttled += 1
+                return True
+        return False
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='onedrive-mock', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
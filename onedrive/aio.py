@@ -0,0 +1,296 @@
+"""
+asyncio version of onedrive.api. Requires aiohttp (pip install onedrive[aio]).
+
+    async with aio.Client() as client:
+        res = await client.get_metadata("/foo", header)
+"""
+import asyncio
+import json
+import os.path
+
+import aiohttp
+from multidict import CIMultiDict
+
+from onedrive import api
+from onedrive import throttle
+from onedrive import upload
+
+
+class _Response:
+    """a fully read aiohttp response, shaped like a requests response so that it can be wrapped in a Result"""
+
+    def __init__(self, status_code, headers, content, history=()):
+        self.status_code = status_code
+        self.headers = headers
+        self.encoding = 'utf-8'
+        self.content = content
+        self.history = history
+
+
+class _Sink:
+    """the file a download is streamed into"""
+
+    def __init__(self, f, chunk_size):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.written = 0
+        try:
+            self.start = f.tell() if f.seekable() else None
+        except (AttributeError, OSError, ValueError):
+            self.start = None
+
+    def write(self, chunk):
+        self.f.write(chunk)
+        self.written += len(chunk)
+
+    def rewind(self):
+        """:return: True if the download can be started again"""
+        if self.written and self.start is None:
+            return False
+        if self.written:
+            self.f.seek(self.start)
+            self.f.truncate()
+            self.written = 0
+        return True
+
+
+class Client:
+    """
+    Owns a pooled aiohttp session, all operations of one client share its connections.
+    The operations have the same parameters and return the same Results as the functions in onedrive.api.
+    """
+
+    def __init__(self, limit=100, timeout=None, base_url=None):
+        """
+        :param limit: max. number of connections kept open (and thus requests in flight)
+        :param timeout: total timeout in sec. per request, None = wait forever
+        :param base_url: the api url, default: api.base_url
+        """
+        self.base_url = base_url or api.base_url
+        self.limit = limit
+        self.timeout = timeout
+        self._session = None
+
+    @property
+    def session(self):
+        """the aiohttp session, created on first use inside the event loop"""
+        if self._session is None:
+            self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.limit),
+                                                  timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self._session
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _send(self, method, url, auth, headers, data, allow_redirects, sink=None):
+        h = dict(auth) if auth else {}  # read for each attempt, so a refreshed token is used
+        if headers:
+            h.update(headers)
+        async with self.session.request(method, url, headers=h, data=data, allow_redirects=allow_redirects) as r:
+            if sink is not None and r.status == 200:
+                async for chunk in r.content.iter_chunked(sink.chunk_size):
+                    sink.write(chunk)
+                return _Response(r.status, CIMultiDict(r.headers), b'', r.history)
+            return _Response(r.status, CIMultiDict(r.headers), await r.read(), r.history)
+
+    async def request(self, method, url, auth, headers=None, data=None, allow_redirects=True):
+        """
+        Send a request with the retry policy of throttle.configure().
+        :return: the response, fully read, as Result
+        """
+        return api.Result(await self._request(method, url, auth, headers, data, allow_redirects))
+
+    async def _request(self, method, url, auth, headers=None, data=None, allow_redirects=True, sink=None):
+        """:param sink: optional _Sink a 200 body is streamed into instead of being read"""
+        res = await self._retry(method, url, auth, headers, data, allow_redirects, sink)
+        if res.status_code == 401 and hasattr(auth, 'refresh'):  # see auth.TokenProvider
+            stale = dict(auth).get('Authorization')
+            await asyncio.get_running_loop().run_in_executor(None, auth.refresh, stale)
+            res = await self._retry(method, url, auth, headers, data, allow_redirects, sink)
+        return res
+
+    async def _retry(self, method, url, auth, headers, data, allow_redirects, sink=None):
+        policy, limiter = throttle.get_policy(), throttle.get_limiter()
+        idempotent = method.upper() in throttle.idempotent_methods
+        attempt = 0
+        while True:
+            locked = limiter.locked_out()
+            if locked > 0:
+                return throttle.locked_out_response(locked)
+            wait, sent = limiter.try_acquire()
+            if wait > 0:  # the rate limit shared with the threads of the sync api
+                await asyncio.sleep(wait)
+                continue
+            try:
+                res = await self._send(method, url, auth, headers, data, allow_redirects, sink)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if not idempotent or attempt >= policy.max_retries or (sink is not None and not sink.rewind()):
+                    raise
+                await asyncio.sleep(policy.delay(attempt))
+                attempt += 1
+                continue
+
+            wait = None
+            if res.status_code in throttle.throttle_codes:
+                wait = throttle.retry_after(res)
+                if wait is not None and wait > policy.max_retry_after:
+                    limiter.throttled(sent=sent)
+                    limiter.lock_out(wait)
+                    return res
+                limiter.throttled(wait, sent)
+            elif not (res.status_code in throttle.retry_codes and idempotent):
+                limiter.succeeded()
+                return res
+            if attempt >= policy.max_retries:
+                return res
+            await asyncio.sleep(wait if wait is not None else policy.delay(attempt))
+            attempt += 1
+
+    async def exists(self, file, auth):
+        return (await self.get_metadata(file, auth, 'id')).status_code == 200
+
+    async def get_metadata(self, file, auth, select=None):
+        """see api.get_metadata()"""
+        q = "?select=" + select if select else ""
+        return await self.request('GET', self.base_url + "/drive/root:" + file + q, auth)
+
+    async def mkdir(self, new_dir, auth, parents=False):
+        """see api.mkdir()"""
+        parent = os.path.dirname(new_dir)
+        parent_meta = await self.get_metadata(parent, auth)
+        if parent_meta.status_code == 404 and parents:
+            await self.mkdir(parent, auth, True)
+            parent_meta = await self.get_metadata(parent, auth)
+
+        parent_id = dict(parent_meta.json_body()).get('id', '00000000')
+        data = json.dumps({"name": os.path.basename(new_dir), "folder": {}})
+        return await self.request('POST', self.base_url + "/drive/items/" + parent_id + "/children", auth,
+                                  headers={'Content-Type': 'application/json'}, data=data)
+
+    async def delete(self, file, auth):
+        """see api.delete()"""
+        return await self.request('DELETE', self.base_url + "/drive/root:" + file, auth)
+
+    async def get_sha1(self, file, auth):
+        """see api.get_sha1()"""
+        m = (await self.get_metadata(file, auth, select='file')).json_body()
+        return m.get('file', {}).get('hashes', {}).get('sha1Hash', None)
+
+    async def copy(self, src, dst, auth):
+        """see api.copy()"""
+        header = {'Content-Type': 'application/json', 'Prefer': 'respond-async'}
+        return await self.request('POST', self.base_url + '/drive/root:' + src + ':/action.copy', auth,
+                                  headers=header, data=json.dumps(api._copy_body(dst)))
+
+    async def move(self, src, dst, auth):
+        """see api.move()"""
+        return await self.request('PATCH', self.base_url + '/drive/root:' + src, auth,
+                                  headers={'Content-Type': 'application/json'}, data=json.dumps(api._move_body(dst)))
+
+    async def rename(self, src, dst, auth):
+        """see api.rename()"""
+        return await self.request('PATCH', self.base_url + '/drive/root:' + src, auth,
+                                  headers={'Content-Type': 'application/json'}, data=json.dumps({"name": dst}))
+
+    async def _child_pages(self, path, auth, max_results):
+        if path in ('', '/'):
+            url = self.base_url + "/drive/root/children?top=" + str(max_results)
+        else:
+            url = self.base_url + "/drive/root:" + path + ":/children?top=" + str(max_results)
+        while url:
+            res = await self._request('GET', url, auth)
+            result = api.Result(res)
+            if res.status_code != 200:
+                raise IOError("listing {} failed with {}".format(path, res.status_code), result)
+            body = result.json_body()
+            yield res, body
+            url = body.get('@odata.nextLink')
+
+    async def iter_children(self, path, auth, max_results=1024):
+        """
+        see api.iter_children(), as async generator
+        :raise IOError: if a page cannot be fetched. args[1] is the failed Result
+        """
+        async for res, body in self._child_pages(path, auth, max_results):
+            for item in body['value']:
+                yield item
+
+    async def list_children(self, path, auth, max_results=1024):
+        """see api.list_children()"""
+        value = []
+        try:
+            async for res, body in self._child_pages(path, auth, max_results):
+                value.extend(body['value'])
+        except IOError as e:
+            return e.args[1]
+        return api.Result(res, body={'value': value})
+
+    async def upload_simple(self, data, dst, auth, conflict='replace'):
+        """see api.upload_simple()"""
+        url = self.base_url + "/drive/root:" + dst + ":/content?@name.conflictBehavior=" + conflict
+        return await self.request('PUT', url, auth, data=data)
+
+    async def upload_large(self, src, dst, auth, conflict='replace', fragment_size=upload.default_fragment_size):
+        """see upload.upload_large(), the fragments are sent one after the other without a state file"""
+        size = os.path.getsize(src)
+        if size == 0:
+            return await self.upload_simple(b'', dst, auth, conflict)
+        res = await self.request('POST', self.base_url + "/drive/root:" + dst + ":/upload.createSession", auth,
+                                 headers={'Content-Type': 'application/json'},
+                                 data=json.dumps({"item": {"@name.conflictBehavior": conflict}}))
+        if res.status_code != 200:
+            return res
+        upload_url = res.json_body()['uploadUrl']
+        with open(src, 'rb') as f:
+            for start, end in upload.fragments([(0, size - 1)], fragment_size):
+                f.seek(start)
+                data = f.read(end - start + 1)
+                res = await self.request('PUT', upload_url, None, data=data,
+                                         headers={'Content-Range': 'bytes {}-{}/{}'.format(start, end, size)})
+                if res.status_code not in (200, 201, 202):
+                    break
+        return res
+
+    async def download(self, path, auth):
+        """see api.download()"""
+        return await self.request('GET', self.base_url + "/drive/root:" + path + ":/content", auth)
+
+    async def download_to(self, path, f, auth, chunk_size=1024 * 1024):
+        """
+        stream a file into a binary file like object, see download.download_to(). It is sent like all requests
+        (retries, rate limit, refresh on 401), a retry after a broken connection starts again if f can seek
+        :return: Result 200 with empty text or the Result of the failed request
+        """
+        url = self.base_url + "/drive/root:" + path + ":/content"
+        res = await self._request('GET', url, auth, sink=_Sink(f, chunk_size))
+        if res.status_code == 200:
+            return api.Result(res, '')
+        return api.Result(res)
+
+    async def wait_for(self, location, auth, refresh_delay=api.AsyncOperationStatus.refresh_delay):
+        """
+        poll a long running action until it is done, see api.AsyncOperationStatus
+        :param location: the Location header of e.g. copy()
+        :return: the last status as json: operation, status, percentageComplete
+        :raise IOError: if the monitor answers with an error, e.g. 404 once it expired
+        """
+        while True:
+            res = await self._request('GET', location, auth)
+            if not 200 <= res.status_code < 300:
+                raise IOError("monitor {} returned {}".format(location, res.status_code), api.Result(res))
+            if res.history:  # redirected to the item: done
+                return {'status': 'completed', 'percentageComplete': 100}
+            data = api.Result(res).json_body()
+            if not isinstance(data, dict):
+                return {'status': 'failed'}
+            if data.get('status') in ('completed', 'failed') or data.get('percentageComplete', 0) >= 100:
+                return data
+            await asyncio.sleep(refresh_delay)
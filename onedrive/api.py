@@ -1,17 +1,27 @@
+import collections
 import json
 import os
 import os.path
-import requests
 import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from onedrive import cache
+from onedrive import disk_cache
+from onedrive import items
+from onedrive import metrics
+from onedrive import session
+from onedrive import streams
 
 base_url = 'https://api.onedrive.com/v1.0'
 
 
+@metrics.operation('exists')
 def exists(file, auth):
     code = get_metadata(file, auth, 'id').status_code
     return code == 200
 
 
+@metrics.operation('get_metadata')
 def get_metadata(file, auth, select=None):
     """
     get the metadata for the given path: https://dev.onedrive.com/items/get.htm
@@ -25,10 +35,26 @@ def get_metadata(file, auth, select=None):
         q = "?select=" + select
     else:
         q = ""
-    res = requests.get(base_url + "/drive/root:" + file + q, headers=auth)
-    return Result(res)
-
 
+    cached = cache.lookup(file, select, auth=auth)  # None if caching is disabled, see cache.configure()
+    headers = None
+    if cached is not None:
+        result, etag, fresh = cached
+        if fresh:
+            return result
+        if etag:
+            headers = {'If-None-Match': etag}
+
+    res = Result(session.request('get', base_url + "/drive/root:" + file + q, auth, headers=headers))
+    if res.status_code == 304:  # not modified since cached
+        cache.touch(file, select, auth=auth)
+        return cached[0]
+    if res.status_code == 200:
+        cache.store(file, select, res, auth=auth)
+    return res
+
+
+@metrics.operation('mkdir')
 def mkdir(new_dir, auth, parents=False):
     """
     creates the directory structure (compare mkdir)
@@ -39,8 +65,6 @@ def mkdir(new_dir, auth, parents=False):
     :return: Result with code 201 + json if dir created
     """
     dirname = os.path.basename(new_dir)
-    headers = dict(auth)
-    headers['Content-Type'] = 'application/json'
     data = json.dumps({
         "name": dirname,
         "folder": {}
@@ -51,14 +75,134 @@ def mkdir(new_dir, auth, parents=False):
     parent_meta = get_metadata(file=parent, auth=auth)
 
     if parent_meta.status_code == 404 and parents:  # parent does not exist but should be created!
-        mkdir(parent, auth, True)  # recurse into parents
-        parent_meta = get_metadata(file=parent, auth=auth)
+        parent_id = makedirs([parent], auth, workers=1)[parent.rstrip('/') or '/']
+    else:
+        parent_id = dict(parent_meta.json_body()).get('id', '00000000')
+    return _post_folder(parent_id, new_dir, auth, data)
 
-    parent_id = dict(parent_meta.json_body()).get('id', '00000000')
-    res = requests.post(base_url + "/drive/items/" + parent_id + "/children", headers=headers, data=data)
-    return Result(res)
+
+def _post_folder(parent_id, new_dir, auth, data):
+    res = Result(session.request('post', base_url + "/drive/items/" + parent_id + "/children", auth,
+                                 headers={'Content-Type': 'application/json'}, data=data))
+    if res.status_code == 201:
+        cache.invalidate(new_dir, auth=auth)
+        cache.store(new_dir, None, res, auth=auth)
+    return res
+
+
+_list_threshold = 16  # list the parent instead of probing if at least this many of its children are in question
+
+
+@metrics.operation('makedirs')
+def makedirs(paths, auth, workers=8, created=None):
+    """
+    Create many directories including their parents (compare mkdir -p) with as few requests as possible.
+    Each distinct prefix is probed at most once and only if its parent exists: below a missing directory
+    everything is missing. The siblings below a parent are probed in one batch, parents with many candidates
+    are listed instead. The missing directories
+    are then created level by level, siblings in parallel.
+    :param paths: full paths of the directories
+    :param auth:
+    :param workers: number of concurrent requests
+    :param created: optional set, the directories which were created are added to it
+    :return: dict path -> item id for all paths and their parents (without trailing slash, the root is '/')
+    :raise IOError: if a directory cannot be probed or created or is a file. args[1] is the failed Result
+    """
+    levels = {}
+    for p in paths:
+        p = '/' + p.strip('/')
+        while p != '/' and p not in levels.get(p.count('/'), ()):
+            levels.setdefault(p.count('/'), set()).add(p)
+            p = os.path.dirname(p)
+
+    ids = {'/': None}  # None: the root, addressed without id
+    missing = set()  # did not exist before, so neither do their children
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for depth in sorted(levels):
+            candidates = {}  # existing parent -> children which may exist
+            todo = []
+            for p in sorted(levels[depth]):
+                parent = os.path.dirname(p)
+                if parent in missing:
+                    todo.append(p)
+                else:
+                    candidates.setdefault(parent, []).append(p)
+
+            probes = [(parent, children) for parent, children in candidates.items()]
+            find, create = metrics.bind(_find_folders), metrics.bind(_create_folder)
+            for found in pool.map(lambda pc: find(pc[0], pc[1], auth), probes):
+                for p, item_id in found.items():
+                    if item_id is None:
+                        todo.append(p)
+                    else:
+                        ids[p] = item_id
+
+            for p, item_id in zip(todo, pool.map(lambda d: create(d, ids, auth), todo)):
+                ids[p] = item_id
+                missing.add(p)
+            if created is not None:
+                created.update(todo)
+    return ids
+
+
+def _find_folders(parent, children, auth):
+    """
+    :return: dict child -> id or None if it does not exist. A single child is probed, a few siblings are probed
+             in one batch, many siblings are found by listing the parent
+    """
+    if len(children) < _list_threshold:
+        if len(children) == 1:
+            results = [get_metadata(children[0], auth, select='id,name,folder')]
+        else:
+            from onedrive import batch  # batch imports api
+            b = batch.Batch(auth)
+            for p in children:
+                b.get_metadata(p, 'id,name,folder')
+            results = b.execute()
+        found = {}
+        for p, res in zip(children, results):
+            if res.status_code == 404:
+                found[p] = None
+            elif res.status_code != 200:
+                raise IOError("cannot probe {}: {}".format(p, res.status_code), res)
+            else:
+                found[p] = _folder_id(p, res.json_body(), res)
+        return found
+
+    existing = {item['name'].lower(): item for item in iter_children(parent, auth)}  # names are case insensitive
+    found = {}
+    for p in children:
+        item = existing.get(os.path.basename(p).lower())
+        found[p] = None if item is None else _folder_id(p, item, None)
+    return found
+
+
+def _folder_id(path, item, res):
+    if not is_dir_meta(item):
+        raise IOError("{} exists and is not a directory".format(path), res)
+    return item['id']
+
+
+def _create_folder(path, ids, auth):
+    parent_id = ids[os.path.dirname(path)]
+    data = json.dumps({"name": os.path.basename(path), "folder": {}, "@name.conflictBehavior": "fail"})
+    if parent_id is None:
+        res = Result(session.request('post', base_url + "/drive/root/children", auth,
+                                     headers={'Content-Type': 'application/json'}, data=data))
+        if res.status_code == 201:
+            cache.invalidate(path, auth=auth)
+    else:
+        res = _post_folder(parent_id, path, auth, data)
+    if res.status_code == 201:
+        return res.json_body()['id']
+    if res.status_code == 409:  # created concurrently by someone else
+        res = get_metadata(path, auth, select='id,name,folder')
+        if res.status_code == 200:
+            return _folder_id(path, res.json_body(), res)
+    raise IOError("cannot create {}: {}".format(path, res.status_code), res)
 
 
+@metrics.operation('delete')
 def delete(file, auth):
     """
     Deletes file.
@@ -66,9 +210,12 @@ def delete(file, auth):
     :param auth:
     :return:  204 No Content
     """
-    return Result(requests.delete(base_url + "/drive/root:" + file, headers=auth))
+    res = Result(session.request('delete', base_url + "/drive/root:" + file, auth))
+    cache.invalidate(file, auth=auth)
+    return res
 
 
+@metrics.operation('get_sha1')
 def get_sha1(file, auth):
     """
     return the sha1 or None
@@ -81,75 +228,126 @@ def get_sha1(file, auth):
 
 
 def is_file_meta(meta):
+    """:param meta: driveItem json or items.DriveItem"""
+    if isinstance(meta, items.DriveItem):
+        return meta.is_file
     return 'file' in meta
 
 
 def is_dir_meta(meta):
+    """:param meta: driveItem json or items.DriveItem"""
+    if isinstance(meta, items.DriveItem):
+        return meta.is_dir
     return 'folder' in meta
 
 
-def copy(src, dst, auth):
-    """Copy a onedrive file
-    https://dev.onedrive.com/items/copy.htm
-    :param src:
-    :param dst:
-    :param auth:
-    :return: URL for a AsyncJobStatus in LOCATION header with code 202
+@metrics.operation('get_item')
+def get_item(file, auth):
     """
-    header = dict(auth)
-    header['Content-Type'] = 'application/json'
-    header['Prefer'] = 'respond-async'
+    the metadata of a path as compact DriveItem, only the properties in items.fields are requested
+    :return: items.DriveItem or None if the path does not exist
+    :raise IOError: on other errors, args[1] is the Result
+    """
+    res = get_metadata(file, auth, select=items.fields)
+    if res.status_code == 404:
+        return None
+    if res.status_code != 200:
+        raise IOError("getting {} failed with {}".format(file, res.status_code), res)
+    return items.DriveItem(res.json_body())
+
 
+def _copy_body(dst):
     dst_path, dst_file = os.path.split(dst)
     if dst_path == "/":
         dst_path = ""
 
-    data = json.dumps({
+    return {
         "parentReference": {
             "path": "/drive/root:" + dst_path
         },
         "name": dst_file
-    })
+    }
+
 
-    copy_request = requests.post(base_url + '/drive/root:' + src + ':/action.copy', headers=header, data=data)
+@metrics.operation('copy')
+def copy(src, dst, auth):
+    """Copy a onedrive file
+    https://dev.onedrive.com/items/copy.htm
+    :param src:
+    :param dst:
+    :param auth:
+    :return: URL for a AsyncJobStatus in LOCATION header with code 202
+    """
+    header = {'Content-Type': 'application/json', 'Prefer': 'respond-async'}
+    data = json.dumps(_copy_body(dst))
+    copy_request = session.request('post', base_url + '/drive/root:' + src + ':/action.copy', auth,
+                                   headers=header, data=data)
+    cache.invalidate(dst, auth=auth)
     return Result(copy_request)
 
 
-def upload_simple(data, dst, auth, conflict='replace'):
+@metrics.operation('upload_simple')
+def upload_simple(data, dst, auth, conflict='replace', progress=None):
     """ Simple item upload is available for items with less than 100MB of content.
     see: https://dev.onedrive.com/items/upload.htm
-    :param data: binary stream of data
+    :param data: bytes, memoryview, a binary file object or an iterable of chunks. All but bytes are streamed
+                 (see streams.body()), memory stays flat. Iterables are sent chunked, wrap them with
+                 streams.body(data, size) if the size is known.
     :param dst: upload path
     :param auth: auth header
     :param conflict: fail, replace, or rename. The default for PUT is replace
+    :param progress: optional callback, called with (bytes sent, size) while sending
     :return: 201 Created (ok, conflict=renamed), 200 Ok (conflict=replaced), 409 (conflict=fail)
     """
     url = base_url + "/drive/root:" + dst + ":/content?@name.conflictBehavior=" + conflict
-    requ = requests.put(url, data=data, headers=auth)
+    requ = session.request('put', url, auth, data=streams.body(data, progress=progress))
+    cache.invalidate(dst, auth=auth)
     return Result(requ)
 
 
+@metrics.operation('create_upload_session')
+def create_upload_session(dst, auth, conflict='replace'):
+    """ Create an upload session for items larger than 100MB.
+    see: https://dev.onedrive.com/items/upload_large_files.htm
+    Use onedrive.upload.upload_large() to actually upload a file through the session.
+    :param dst: upload path
+    :param auth: auth header
+    :param conflict: fail, replace, or rename
+    :return: 200 + json with uploadUrl, expirationDateTime and nextExpectedRanges
+    """
+    data = json.dumps({"item": {"@name.conflictBehavior": conflict}})
+    url = base_url + "/drive/root:" + dst + ":/upload.createSession"
+    cache.invalidate(dst, auth=auth)
+    res = session.request('post', url, auth, headers={'Content-Type': 'application/json'}, data=data)
+    return Result(res)
+
+
+@metrics.operation('download')
 def download(path, auth):
-    """ download a File Facet. No range downloads yet
+    """ download a File Facet into memory. See onedrive.download for streaming and range downloads.
     See: https://dev.onedrive.com/items/download.htm
     :param path: download this
     :param auth: auth header
     :return: 200 with file, maybe also 302 Found + Location with the download URL which does NOT req. authentication
     """
+    dc = disk_cache.get_cache(auth)  # None if disabled, see disk_cache.configure()
+    item_id = tag = None
+    if dc is not None:
+        meta = get_metadata(path, auth, select='id,eTag,cTag')
+        if meta.status_code == 200:
+            item_id, tag = meta.json_body().get('id'), disk_cache.tag(meta.json_body())
+            data = dc.get(item_id, tag)
+            if data is not None:
+                return Result(disk_cache.response(data))
+
     url = base_url + "/drive/root:" + path + ":/content"
-    requ = requests.get(url, headers=auth)
+    requ = session.request('get', url, auth)
+    if dc is not None and requ.status_code == 200:
+        dc.put(item_id, tag, requ.content)
     return Result(requ)
 
 
-def move(src, dst, auth):
-    """move a file: https://dev.onedrive.com/items/move.htm
-     :param src: the file to move. /foo/bar.tgz
-     :param dst: the target directory. /bar
-     :return: 200, As with other PATCH actions, the entire item object will be included in the response.
-    """
-    header = dict(auth)
-    header['Content-Type'] = 'application/json'
-
+def _move_body(dst):
     # When moving items to the root of a OneDrive you cannot use the
     # "id:" "root" syntax. You either need to use the real ID of the root folder,
     # or use {"path": "/drive/root"} for the parent reference.
@@ -157,15 +355,28 @@ def move(src, dst, auth):
         dst_path = "/drive/root"
     else:
         dst_path = "/drive/root:" + dst
-    data = json.dumps({
+    return {
         "parentReference": {
             "path": dst_path
         }
-    })
-    res = requests.patch(base_url + '/drive/root:' + src, headers=header, data=data)
+    }
+
+
+@metrics.operation('move')
+def move(src, dst, auth):
+    """move a file: https://dev.onedrive.com/items/move.htm
+     :param src: the file to move. /foo/bar.tgz
+     :param dst: the target directory. /bar
+     :return: 200, As with other PATCH actions, the entire item object will be included in the response.
+    """
+    header = {'Content-Type': 'application/json'}
+    data = json.dumps(_move_body(dst))
+    res = session.request('patch', base_url + '/drive/root:' + src, auth, headers=header, data=data)
+    cache.invalidate(src, os.path.join(dst, os.path.basename(src)), auth=auth)
     return Result(res)
 
 
+@metrics.operation('rename')
 def rename(src, dst, auth):
     """
     renames a file/directory
@@ -174,57 +385,195 @@ def rename(src, dst, auth):
     :param auth:
     :return: 200 OK
     """
-    header = dict(auth)
-    header['Content-Type'] = 'application/json'
+    header = {'Content-Type': 'application/json'}
 
     # When moving items to the root of a OneDrive you cannot use the
     # "id:" "root" syntax. You either need to use the real ID of the root folder,
     # or use {"path": "/drive/root"} for the parent reference.
     data = json.dumps({"name": dst})
-    res = requests.patch(base_url + '/drive/root:' + src, headers=header, data=data)
+    res = session.request('patch', base_url + '/drive/root:' + src, auth, headers=header, data=data)
+    cache.invalidate(src, os.path.join(os.path.dirname(src), dst), auth=auth)
     return Result(res)
 
 
-def list_children(path, auth, max_results=1024):
+def _children_url(path, max_results, select=None):
+    q = "?top=" + str(max_results)
+    if select:
+        q += "&select=" + select
+    if path in ('', '/'):
+        return base_url + "/drive/root/children" + q
+    return base_url + "/drive/root:" + path + ":/children" + q
+
+
+def _child_pages(path, auth, max_results, select=None):
+    """
+    generator of the pages of a listing as (response, parsed body)
+    :raise IOError: if a page cannot be fetched
+    """
+    res = session.request('get', _children_url(path, max_results, select), auth)
+    while True:
+        result = Result(res)
+        if res.status_code != 200:
+            raise IOError("listing {} failed with {}".format(path, res.status_code), result)
+        body = result.json_body()
+        yield res, body
+        if '@odata.nextLink' not in body:  # page as long as there is a next link
+            break
+        res = session.request('get', body['@odata.nextLink'], auth)
+
+
+@metrics.operation('list_children')
+def list_children(path, auth, max_results=1024, select=None):
     """
     List children for an item: https://dev.onedrive.com/items/list.htm
     Paging is resolved by this method already.
     :param path: full path
     :param auth: 
     :param max_results: limit before paging occurs. (for testing only)
+    :param select: select only these properties or None for all
     :return: json, mapping value -> List of driveItems: https://dev.onedrive.com/resources/item.htm  
     """
-    res = requests.get(base_url + "/drive/root:" + path + ":/children?top=" + str(max_results), headers=auth)
-    body = Result(res).json_body()
-    value = body['value']
+    value = []
+    try:
+        for res, body in _child_pages(path, auth, max_results, select):
+            value.extend(body['value'])
+    except IOError as e:
+        return e.args[1]
+
+    return Result(res, body={'value': value})
+
+
+@metrics.operation('iter_children')
+def iter_children(path, auth, max_results=1024, select=None):
+    """
+    Iterate over the children of an item: https://dev.onedrive.com/items/list.htm
+    Items are yielded page by page as they arrive, the next page is fetched when the current one is consumed.
+    :param path: full path
+    :param auth:
+    :param max_results: page size
+    :param select: select only these properties or None for all
+    :return: generator of driveItems: https://dev.onedrive.com/resources/item.htm
+    :raise IOError: if a page cannot be fetched. args[1] is the failed Result
+    """
+    for res, body in _child_pages(path, auth, max_results, select):
+        yield from body['value']
+
+
+@metrics.operation('iter_items')
+def iter_items(path, auth, max_results=1024):
+    """
+    as iter_children(), but only the properties in items.fields are requested and each child is
+    converted to a compact items.DriveItem, the json of a page is dropped once it is converted
+    :return: generator of items.DriveItem
+    :raise IOError: if a page cannot be fetched. args[1] is the failed Result
+    """
+    for res, body in _child_pages(path, auth, max_results, items.fields):
+        yield from [items.DriveItem(i) for i in body['value']]
 
-    while '@odata.nextLink' in body:  # page as long as there is a next link
-        res = requests.get(body['@odata.nextLink'], headers=auth)
-        body = Result(res).json_body()
-        value.extend(body['value'])
 
-    return Result(res, json.dumps({'value': value}))
+def _join(path, name):
+    return path.rstrip('/') + '/' + name
+
+
+@metrics.operation('walk')
+def walk(path, auth, workers=4, onerror=None, max_results=1024, select=None, compact=False):
+    """
+    Walk the tree below path, compare os.walk. Directories are listed by `workers` threads in parallel,
+    so the order of the directories is not defined (parents always come before their children).
+    As in os.walk the folders list can be modified in place to prune the walk.
+    :param path: full path of the top directory
+    :param auth:
+    :param workers: number of directories that are listed concurrently
+    :param onerror: called with the IOError if a directory cannot be listed. Default: ignore
+    :param max_results: page size
+    :param select: select only these properties or None for all (name and folder are always selected)
+    :param compact: True: list items.DriveItem instead of json (selects items.fields)
+    :return: generator of (path, folders, files), folders and files are lists of driveItems
+    """
+    if select:
+        select = ','.join(dict.fromkeys(select.split(',') + ['name', 'folder']))
+
+    def listing(p):
+        folders, files = [], []
+        children = iter_items(p, auth, max_results) if compact else iter_children(p, auth, max_results, select)
+        for item in children:
+            (folders if is_dir_meta(item) else files).append(item)
+        return p, folders, files
+
+    listing = metrics.bind(listing)
+    todo = collections.deque([path])
+    pending = set()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while todo or pending:
+            while todo and len(pending) < workers:
+                pending.add(pool.submit(listing, todo.popleft()))
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    p, folders, files = future.result()
+                except IOError as e:
+                    if onerror is not None:
+                        onerror(e)
+                    continue
+                yield p, folders, files
+                todo.extend(_join(p, f.name if compact else f['name']) for f in folders)
+
+
+_unset = object()
 
 
 class Result:
-    def __init__(self, response, text=None):
+    __slots__ = ('status_code', 'headers', '_content', '_encoding', '_text', '_body')
+
+    def __init__(self, response, text=None, body=_unset):
         """
+        The body is kept as raw bytes and only decoded / parsed on first access.
         :param response: the response from requests 
-        :param text: optional text, otherwise response.text is used
+        :param text: optional text, otherwise the response content is used
+        :param body: optional already parsed json body, otherwise the response content is used
         """
         self.status_code = response.status_code
-        if not text:
-            self.text = response.text
-        else:
-            self.text = text
         self.headers = response.headers
+        self._encoding = response.encoding or 'utf-8'
+        self._text = text
+        self._body = body
+        if text is None and body is _unset:
+            self._content = response.content
+        else:
+            self._content = None
+
+    @property
+    def content(self):
+        """the raw body as bytes"""
+        if self._content is None:
+            self._content = self.text.encode('utf-8')
+        return self._content
+
+    @property
+    def text(self):
+        """the body decoded as text"""
+        if self._text is None:
+            if self._content is None:
+                self._text = json.dumps(self._body)
+            else:
+                self._text = str(self._content, self._encoding, errors='replace')
+        return self._text
 
     def json_body(self):
-        from json import JSONDecodeError
-        try:
-            return json.loads(self.text)
-        except JSONDecodeError:
-            return self.text
+        """
+        The parsed json is cached, so modifying it modifies the body of this result.
+        :return: the parsed json body or the text if the body is no json
+        """
+        if self._body is _unset:
+            try:
+                if self._content is not None:
+                    self._body = json.loads(self._content)
+                else:
+                    self._body = json.loads(self._text)
+            except ValueError:  # no json or no valid unicode
+                self._body = self.text
+        return self._body
 
     def to_string(self):
         str_header = "\n\t".join([str(k) + ":" + str(v) for k, v in self.headers.items()])
@@ -241,7 +590,12 @@ class AsyncOperationStatus:
     """https://dev.onedrive.com/resources/asyncJobStatus.htm"""
     refresh_delay = 0.5
 
-    def __init__(self, location, auth):
+    def __init__(self, location, auth, refresh=True):
+        """
+        :param location: the Location header of the long running action
+        :param auth:
+        :param refresh: False to not ask for the status right away (see jobs.JobTracker)
+        """
         self.location = location
         self.auth = auth
 
@@ -250,10 +604,15 @@ class AsyncOperationStatus:
         self.response = None  # the final response
         self.percentageComplete = 0.0
 
-        self.refresh()
+        if refresh:
+            self.refresh()
 
+    @metrics.operation('monitor')
     def refresh(self):
-        req = requests.get(self.location, headers=self.auth)
+        """:raise IOError: if the monitor answers with an error, e.g. 404 once it expired"""
+        req = session.request('get', self.location, self.auth)
+        if not 200 <= req.status_code < 300:
+            raise IOError("monitor {} returned {}".format(self.location, req.status_code), Result(req))
         if req.history:  # it is the redirected response already
             self.operation = None
             self.percentageComplete = 100
@@ -281,7 +640,7 @@ class AsyncOperationStatus:
         return self.response
 
     def block(self):
-        while self.percentageComplete < 100:
+        while self.percentageComplete < 100 and self.status != 'failed':
             time.sleep(AsyncOperationStatus.refresh_delay)  # wait this many sec
             self.refresh()
 
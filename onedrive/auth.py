@@ -9,7 +9,9 @@ from urllib.parse import urlparse
 from urllib.parse import unquote
 from http.server import HTTPServer, BaseHTTPRequestHandler
 from onedrive import json_io
+import threading
 import time
+from collections.abc import Mapping
 
 
 class AuthCodeHandler(BaseHTTPRequestHandler):
@@ -84,27 +86,119 @@ def token_invaild(tokens):
     return created + exp < now
 
 
+class TokenProvider(Mapping):
+    """
+    Thread-safe, in-memory auth header which refreshes itself.
+    The provider is a mapping with the Authorization header and can be passed as auth to all api calls.
+    The tokens are refreshed in the background before they expire, concurrent refreshes (e.g. after a 401)
+    are coalesced into one request. Reading the header never touches the disk.
+    """
+
+    def __init__(self, tokens, client_id, client_secret, token_file=None, background=True):
+        """
+        :param tokens: the tokens as returned by get_tokens() / refresh_tokens()
+        :param client_id:
+        :param client_secret:
+        :param token_file: file the refreshed tokens are saved to, None to not save them
+        :param background: refresh the tokens in a background thread before they expire
+        """
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.token_file = token_file
+        self.background = background
+        self.lock = threading.Lock()
+        self.timer = None
+        self._set(tokens)
+
+    def _set(self, tokens):
+        self.tokens = tokens
+        self.header = {'Authorization': 'bearer ' + tokens['access_token']}
+        if self.background:
+            if self.timer is not None:
+                self.timer.cancel()
+            delay = max(0.0, tokens.get('created', 0) + tokens.get('expires_in', 0) * 0.9 - time.time())
+            self.timer = threading.Timer(delay, self._refresh_in_background)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def _refresh_in_background(self):
+        try:
+            self.refresh()
+        except (IOError, ValueError, KeyError):
+            pass  # the next request gets a 401 and tries again
+
+    def refresh(self, stale_header=None):
+        """
+        refresh the tokens
+        :param stale_header: the Authorization header which was rejected. If the tokens were refreshed
+                             in the meantime (by another thread), nothing is done.
+        :return: the new auth header
+        """
+        with self.lock:
+            if stale_header is not None and stale_header != self.header['Authorization']:
+                return self.header
+            tokens = refresh_tokens(self.tokens['refresh_token'], self.client_id, self.client_secret)
+            if 'access_token' not in tokens:
+                raise IOError("refreshing the tokens failed: {}".format(tokens.get('error', tokens)))
+            if self.token_file:
+                json_io.save(tokens, self.token_file)
+            self._set(tokens)
+            return self.header
+
+    def close(self):
+        """stop refreshing in the background"""
+        self.background = False
+        if self.timer is not None:
+            self.timer.cancel()
+
+    def __getitem__(self, key):
+        if token_invaild(self.tokens):  # the background refresh did not happen (yet)
+            self.refresh(self.header['Authorization'])
+        return self.header[key]
+
+    def __iter__(self):
+        return iter(self.header)
+
+    def __len__(self):
+        return len(self.header)
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def provider(keys_file='onedrive_keys.json', token_file='tokens.json'):
+    """
+    Login once (see login()) and return the TokenProvider for this process.
+    The key and token files are only read on the first call.
+    :return: the TokenProvider, usable as auth header in all api calls
+    """
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            keys = json_io.load(keys_file)
+            client_id = keys.get('client_id')
+            client_secret = keys.get('client_secret')
+
+            if not os.path.isfile(token_file):
+                auth_code = get_auth_code(client_id)
+                tokens = get_tokens(auth_code, client_id, client_secret)
+                json_io.save(tokens, token_file)
+
+            tokens = json_io.load(token_file)
+            if token_invaild(tokens):
+                tokens = refresh_tokens(tokens['refresh_token'], client_id, client_secret)
+                json_io.save(tokens, token_file)
+            _provider = TokenProvider(tokens, client_id, client_secret, token_file)
+        return _provider
+
+
 def login():
     """
     Try to login to OneDrive and acquire the required tokens.
     If a token file already exists, try to refresh the token.
-    In the end: return the auth header which needs to be passed to the api calls
+    In the end: return the auth header which needs to be passed to the api calls.
+    Long running processes should use provider() instead, which refreshes the header itself.
     :return: the auth header required in each oneDrive API call
     """
-    keys = json_io.load('onedrive_keys.json')
-    client_id = keys.get('client_id')
-    client_secret = keys.get('client_secret')
-
-    token_file = 'tokens.json'
-    if not os.path.isfile(token_file):
-        auth_code = get_auth_code(client_id)
-        tokens = get_tokens(auth_code, client_id, client_secret)
-        json_io.save(tokens, token_file)
-
-    tokens = json_io.load(token_file)
-    if token_invaild(tokens):
-        tokens = refresh_tokens(tokens['refresh_token'], client_id, client_secret)
-        json_io.save(tokens, token_file)
-
-    auth_header = {'Authorization': 'bearer ' + tokens['access_token']}
-    return auth_header
+    return dict(provider())
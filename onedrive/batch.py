@@ -0,0 +1,141 @@
+import json
+import os.path
+
+from requests.structures import CaseInsensitiveDict
+
+from onedrive import api
+from onedrive import cache
+from onedrive import metrics
+from onedrive import session
+
+# max. number of requests the service accepts in one batch
+max_batch_size = 20
+
+
+class _SubResponse:
+    """one response of a batch, shaped like a requests response so that it can be wrapped in a Result"""
+
+    def __init__(self, status_code, headers, content):
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers or {})
+        self.encoding = 'utf-8'
+        self.content = content
+
+
+class Batch:
+    """
+    Collects api operations and sends them as JSON batches: https://dev.onedrive.com/misc/batching.htm
+    Each operation returns an id which can be used in depends_on of later operations.
+    execute() sends the operations with max_batch_size operations per round trip.
+
+        b = Batch(header)
+        b.delete("/foo/a.tmp")
+        b.rename("/foo/b.tmp", "c.tmp")
+        results = b.execute()  # one Result per operation in the order of the calls
+    """
+
+    def __init__(self, auth):
+        self.auth = auth
+        self.requests = []
+        self.changed = []  # paths to drop from the metadata cache after execute()
+
+    def add(self, method, url, body=None, headers=None, depends_on=None):
+        """
+        add a request
+        :param method: GET, POST, PUT, PATCH, DELETE
+        :param url: url relative to the api base url, e.g. /drive/root:/foo
+        :param body: json body or None
+        :param headers: request headers
+        :param depends_on: id or list of ids of requests which need to succeed before this one runs
+        :return: the id of the request
+        """
+        request = {'id': str(len(self.requests)), 'method': method.upper(), 'url': url}
+        if body is not None:
+            request['body'] = body
+            headers = dict(headers or {})
+            headers.setdefault('Content-Type', 'application/json')
+        if headers:
+            request['headers'] = headers
+        if depends_on is not None:
+            request['dependsOn'] = [depends_on] if isinstance(depends_on, str) else list(depends_on)
+        self.requests.append(request)
+        return request['id']
+
+    def get_metadata(self, file, select=None, depends_on=None):
+        """see api.get_metadata()"""
+        q = "?select=" + select if select else ""
+        return self.add('GET', "/drive/root:" + file + q, depends_on=depends_on)
+
+    def exists(self, file, depends_on=None):
+        """see api.exists(): the result has status code 200 if the file exists"""
+        return self.get_metadata(file, 'id', depends_on)
+
+    def delete(self, file, depends_on=None):
+        """see api.delete()"""
+        self.changed.append(file)
+        return self.add('DELETE', "/drive/root:" + file, depends_on=depends_on)
+
+    def move(self, src, dst, depends_on=None):
+        """see api.move()"""
+        self.changed += [src, os.path.join(dst, os.path.basename(src))]
+        return self.add('PATCH', "/drive/root:" + src, api._move_body(dst), depends_on=depends_on)
+
+    def rename(self, src, dst, depends_on=None):
+        """see api.rename()"""
+        self.changed += [src, os.path.join(os.path.dirname(src), dst)]
+        return self.add('PATCH', "/drive/root:" + src, {"name": dst}, depends_on=depends_on)
+
+    def copy(self, src, dst, depends_on=None):
+        """see api.copy()"""
+        self.changed.append(dst)
+        return self.add('POST', "/drive/root:" + src + ":/action.copy", api._copy_body(dst),
+                        {'Prefer': 'respond-async'}, depends_on)
+
+    @metrics.operation('batch')
+    def execute(self):
+        """
+        Send all collected requests, max_batch_size per round trip, and clear the batch.
+        Dependencies on requests of an earlier round trip are resolved locally: if such a request failed,
+        the dependent request is not sent and gets the status 424 Failed Dependency.
+        :return: list of Results in the order the requests were added
+        :raise IOError: if a batch as a whole fails
+        """
+        requests, self.requests = self.requests, []
+        changed, self.changed = self.changed, []
+        results = {}
+        try:
+            for i in range(0, len(requests), max_batch_size):
+                chunk = []
+                for request in requests[i:i + max_batch_size]:
+                    earlier = [d for d in request.get('dependsOn', []) if d in results]
+                    if any(not 200 <= results[d].status_code < 300 for d in earlier):
+                        results[request['id']] = api.Result(_SubResponse(424, {}, b''))
+                        continue
+                    request = dict(request)
+                    request['dependsOn'] = [d for d in request.get('dependsOn', []) if d not in earlier]
+                    if not request['dependsOn']:
+                        del request['dependsOn']
+                    chunk.append(request)
+                if chunk:
+                    results.update(self._send(chunk))
+        finally:
+            cache.invalidate(*changed, auth=self.auth)
+        return [results[r['id']] for r in requests]
+
+    def _send(self, chunk):
+        res = session.request('post', api.base_url + "/$batch", self.auth,
+                              headers={'Content-Type': 'application/json'}, data=json.dumps({'requests': chunk}))
+        if res.status_code != 200:
+            raise IOError("batch failed with {}".format(res.status_code), api.Result(res))
+
+        results = {}
+        for r in api.Result(res).json_body()['responses']:
+            body = r.get('body')
+            if body is None:
+                content = b''
+            elif isinstance(body, str):
+                content = body.encode('utf-8')
+            else:
+                content = json.dumps(body).encode('utf-8')
+            results[r['id']] = api.Result(_SubResponse(r['status'], r.get('headers'), content))
+        return results
@@ -0,0 +1,180 @@
+import bisect
+import collections
+import threading
+import time
+
+_cache = None
+
+
+class MetadataCache:
+    """
+    LRU cache of metadata Results keyed by (path, select), paths compared case insensitively like the service does.
+    Entries older than ttl are not dropped but revalidated with their eTag (If-None-Match) by api.get_metadata().
+    The cached paths are also kept sorted, so a subtree is found by bisection instead of a scan of all entries.
+    """
+
+    def __init__(self, max_entries=10000, ttl=60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = collections.OrderedDict()  # (path, select) -> (Result, etag, time stored)
+        self.selects = {}  # path -> set of the selects cached for it
+        self.paths = []  # the keys of selects, sorted
+        self.lock = threading.Lock()
+
+    def lookup(self, path, select):
+        """
+        :return: (Result, etag, fresh) or None. A fresh entry for all properties also serves any select
+        """
+        now = time.time()
+        stale = None
+        with self.lock:
+            for key in ((path, select), (path, None)):
+                entry = self.entries.get(key)
+                if entry is None:
+                    continue
+                self.entries.move_to_end(key)
+                result, etag, stored = entry
+                if now - stored < self.ttl:
+                    return result, etag, True
+                if key[1] == select:
+                    stale = result, etag, False
+        return stale
+
+    def store(self, path, select, result, etag):
+        with self.lock:
+            self.entries[(path, select)] = (result, etag, time.time())
+            self.entries.move_to_end((path, select))
+            if path not in self.selects:
+                self.selects[path] = set()
+                bisect.insort(self.paths, path)
+            self.selects[path].add(select)
+            while len(self.entries) > self.max_entries:
+                self._remove(self.entries.popitem(last=False)[0])
+
+    def touch(self, path, select):
+        """mark an entry as fresh again, after it was revalidated"""
+        with self.lock:
+            entry = self.entries.get((path, select))
+            if entry is not None:
+                self.entries[(path, select)] = (entry[0], entry[1], time.time())
+
+    def _remove(self, key):
+        """forget key in the path index (it is removed from entries already)"""
+        path, select = key
+        selects = self.selects[path]
+        selects.discard(select)
+        if not selects:
+            del self.selects[path]
+            del self.paths[bisect.bisect_left(self.paths, path)]
+
+    def _drop(self, paths):
+        for path in paths:
+            for select in self.selects.pop(path):
+                del self.entries[(path, select)]
+
+    def invalidate(self, path):
+        """drop the entries of path and everything below it"""
+        with self.lock:
+            if path == '/':
+                self._clear()
+                return
+            # the paths below path sort between path + '/' and path + '0' ('0' follows '/')
+            lo, hi = bisect.bisect_left(self.paths, path + '/'), bisect.bisect_left(self.paths, path + '0')
+            below = self.paths[lo:hi]
+            del self.paths[lo:hi]
+            self._drop(below)
+            if path in self.selects:
+                self._drop([path])
+                del self.paths[bisect.bisect_left(self.paths, path)]
+
+    def discard(self, path):
+        """drop the entries of exactly this path"""
+        with self.lock:
+            if path in self.selects:
+                self._drop([path])
+                del self.paths[bisect.bisect_left(self.paths, path)]
+
+    def _clear(self):
+        self.entries.clear()
+        self.selects.clear()
+        del self.paths[:]
+
+    def clear(self):
+        with self.lock:
+            self._clear()
+
+
+def configure(max_entries=10000, ttl=60):
+    """
+    Enable the in-process metadata cache used by api.get_metadata() (and therefore exists(), mkdir(), get_sha1()).
+    Our own delete, move, rename, copy, mkdir and uploads invalidate the affected paths.
+    Changes made by other clients are noticed after ttl sec. at the latest.
+    :param max_entries: least recently used entries are evicted above this size
+    :param ttl: sec. an entry is used without asking the service. After that it is revalidated with its eTag
+    :return: the new cache
+    """
+    global _cache
+    _cache = MetadataCache(max_entries, ttl)
+    return _cache
+
+
+def disable():
+    global _cache
+    _cache = None
+
+
+def get_cache():
+    """:return: the active cache or None if caching is disabled"""
+    return _cache
+
+
+def _normalize(path):
+    """paths of the service are case insensitive: /A/b and /a/b are the same item"""
+    return (path.rstrip('/') or '/').casefold()
+
+
+def etag(result):
+    """:return: the eTag of a metadata Result or None"""
+    tag = result.headers.get('ETag')
+    if tag is None:
+        body = result.json_body()
+        tag = body.get('eTag') if isinstance(body, dict) else None
+    return tag
+
+
+def _get(auth):
+    """:return: the cache for requests with auth: the one of a client.Client, else the shared one, see client.Client"""
+    c = getattr(auth, 'cache', None)
+    if c is not None or getattr(auth, 'base_url', None):
+        return c
+    return _cache
+
+
+def lookup(path, select=None, auth=None):
+    c = _get(auth)
+    if c is None:
+        return None
+    return c.lookup(_normalize(path), select)
+
+
+def store(path, select, result, auth=None):
+    c = _get(auth)
+    if c is not None:
+        c.store(_normalize(path), select, result, etag(result))
+
+
+def touch(path, select=None, auth=None):
+    c = _get(auth)
+    if c is not None:
+        c.touch(_normalize(path), select)
+
+
+def invalidate(*paths, auth=None):
+    """drop the given paths, everything below them and their parent folders (whose children changed)"""
+    c = _get(auth)
+    if c is None:
+        return
+    for path in paths:
+        path = _normalize(path)
+        c.invalidate(path)
+        c.discard(path.rsplit('/', 1)[0] or '/')
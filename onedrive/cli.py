@@ -0,0 +1,384 @@
+"""
+Command line client, installed as `onedrive`:
+
+    onedrive ls -l /photos
+    onedrive put -j 8 ./photos /photos
+    onedrive get --resume /backups/backup.tgz .
+    onedrive mkdir -p /a/b/c /a/d
+    onedrive sync --dry-run ./photos /photos
+    onedrive sync --both ./photos /photos
+
+Remote paths are absolute paths in the drive. The modules doing the work (and requests) are imported
+by the commands only, so that parsing and --help stay fast.
+"""
+import argparse
+import os
+import os.path
+import sys
+
+_ls_fields = 'name,size,folder,lastModifiedDateTime'  # listed properties, see api.iter_children()
+
+
+def _remote(path):
+    return '/' + path.strip('/')
+
+
+def _size(value):
+    """parse a size like 10M, 320K, 1G or a number of bytes"""
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+    value = value.strip().upper().rstrip('B').rstrip('I')
+    if value and value[-1] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+
+
+def _login(args):
+    from onedrive import auth
+    return auth.provider(args.keys, args.tokens)
+
+
+def _check(res, what):
+    if res.status_code >= 300:
+        raise IOError("{} failed: {} {}".format(what, res.status_code, res.text[:200]))
+    return res
+
+
+def _meta(path, header):
+    from onedrive import api
+    res = api.get_metadata(path, header)
+    return res.json_body() if res.status_code == 200 else None
+
+
+def _format(item, long, name=None):
+    name = name or item['name']
+    if 'folder' in item:
+        name += '/'
+    if not long:
+        return name
+    return '{:>12} {:20} {}'.format(item.get('size', 0), item.get('lastModifiedDateTime', '')[:19], name)
+
+
+def cmd_ls(args, header):
+    from onedrive import api
+    path = _remote(args.path)
+    if args.recursive:
+        for p, folders, files in api.walk(path, header, workers=args.jobs, select=_ls_fields):
+            for item in sorted(folders + files, key=lambda i: i['name']):
+                print(_format(item, args.long, api._join(p, item['name'])))
+        return 0
+    meta = _meta(path, header)
+    if meta is None:
+        raise IOError("{}: no such file or directory".format(path))
+    if 'folder' not in meta:
+        print(_format(meta, args.long, path))
+        return 0
+    for item in sorted(api.iter_children(path, header, select=_ls_fields), key=lambda i: i['name']):
+        print(_format(item, args.long))
+    return 0
+
+
+def cmd_stat(args, header):
+    import json
+    from onedrive import api
+    status = 0
+    for path in args.paths:
+        res = api.get_metadata(_remote(path), header)
+        if res.status_code != 200:
+            print("onedrive: {}: {}".format(path, res.status_code), file=sys.stderr)
+            status = 1
+            continue
+        print(json.dumps(res.json_body(), indent=2, sort_keys=True))
+    return status
+
+
+def _report(progress, what):
+    print("{}: {}".format(what, progress))
+    for path, error in progress.failed:
+        print("onedrive: {}: {}".format(path, getattr(error, 'status_code', error)), file=sys.stderr)
+    return 1 if progress.failed else 0
+
+
+def _state_dir():
+    """:return: the directory the sessions of resumable uploads are kept in"""
+    import tempfile
+    return tempfile.gettempdir()
+
+
+def _put_plan(src, dst, header, skip_unchanged):
+    """:return: list of (local, remote) files which would be uploaded"""
+    from onedrive import api, hashes
+    remote = {}
+    try:
+        for p, folders, files in api.walk(dst, header, select='name,size,file'):
+            remote.update((api._join(p, f['name']), f) for f in files)
+    except IOError:
+        pass
+    plan = []
+    for root, _, names in os.walk(src):
+        rel = os.path.relpath(root, src).replace(os.sep, '/')
+        base = dst if rel == '.' else api._join(dst, rel)
+        for name in sorted(names):
+            local, target = os.path.join(root, name), api._join(base, name)
+            if not (skip_unchanged and hashes.same_content(local, remote.get(target))):
+                plan.append((local, target))
+    return plan
+
+
+def _get_plan(src, dst, header, skip_unchanged):
+    """:return: list of (remote, local) files which would be downloaded"""
+    from onedrive import api, hashes
+    plan = []
+    for p, folders, files in api.walk(src, header, select='name,size,file'):
+        rel = p[len(src.rstrip('/')):].lstrip('/')
+        local_dir = os.path.join(dst, *rel.split('/')) if rel else dst
+        for meta in files:
+            local = os.path.join(local_dir, meta['name'])
+            if not (skip_unchanged and os.path.isfile(local) and hashes.same_content(local, meta)):
+                plan.append((api._join(p, meta['name']), local))
+    return plan
+
+
+def _put(args, header, skip_unchanged):
+    from onedrive import transfer, upload
+    src, dst = args.src, _remote(args.dst)
+    if os.path.isdir(src):
+        if args.dry_run:
+            for local, remote in _put_plan(src, dst, header, skip_unchanged):
+                print("put {} -> {}".format(local, remote))
+            return 0
+        p = transfer.put_tree(src, dst, header, workers=args.jobs, skip_unchanged=skip_unchanged,
+                              fragment_size=args.chunk_size or upload.default_fragment_size,
+                              state_dir=_state_dir() if args.resume else None)
+        return _report(p, 'put')
+
+    meta = _meta(dst, header)
+    if meta is not None and 'folder' in meta:
+        dst = dst.rstrip('/') + '/' + os.path.basename(src)
+    if args.dry_run:
+        print("put {} -> {}".format(src, dst))
+        return 0
+    fragment_size = args.chunk_size or upload.default_fragment_size
+    if args.resume or os.path.getsize(src) > transfer.large_file_size:
+        res = upload.upload_large(src, dst, header, fragment_size=fragment_size,
+                                  state_file=transfer._state_file(_state_dir(), src, dst) if args.resume else None)
+    else:
+        res = transfer.put_file(src, dst, header, skip_unchanged=skip_unchanged, fragment_size=fragment_size)
+    if res is not None:
+        _check(res, 'put ' + src)
+    return 0
+
+
+def _get(args, header, skip_unchanged):
+    from onedrive import download, transfer
+    src, dst = _remote(args.src), args.dst
+    meta = _meta(src, header)
+    if meta is None:
+        raise IOError("{}: no such file or directory".format(src))
+    if 'folder' in meta:
+        if args.dry_run:
+            for remote, local in _get_plan(src, dst, header, skip_unchanged):
+                print("get {} -> {}".format(remote, local))
+            return 0
+        p = transfer.get_tree(src, dst, header, workers=args.jobs, skip_unchanged=skip_unchanged,
+                              segments=args.jobs, resume=args.resume)
+        return _report(p, 'get')
+
+    if os.path.isdir(dst):
+        dst = os.path.join(dst, meta['name'])
+    if args.dry_run:
+        print("get {} -> {}".format(src, dst))
+        return 0
+    segments = args.jobs if meta.get('size', 0) > transfer.large_file_size and not args.resume else 1
+    res = download.download_to(src, dst, header, chunk_size=args.chunk_size or download.default_chunk_size,
+                               resume=args.resume, segments=segments)
+    _check(res, 'get ' + src)
+    return 0
+
+
+def cmd_put(args, header):
+    return _put(args, header, skip_unchanged=False)
+
+
+def cmd_get(args, header):
+    return _get(args, header, skip_unchanged=False)
+
+
+def _mirror(args, header):
+    from onedrive import mirror
+    m = mirror.Mirror(args.local, _remote(args.remote), header, conflict=args.conflict, workers=args.jobs,
+                      max_deletes=args.max_deletes if args.max_deletes >= 0 else None)
+    if args.dry_run:
+        for action in m.plan():
+            print(action)
+        return 0
+    summary = m.sync()
+    print("sync: {}".format(summary))
+    for action, error in summary.failed:
+        print("onedrive: {}: {}".format(action, getattr(error, 'status_code', error)), file=sys.stderr)
+    for path in summary.conflicts:
+        print("onedrive: {}: changed on both sides".format(path), file=sys.stderr)
+    return 1 if summary.failed or summary.conflicts else 0
+
+
+def cmd_sync(args, header):
+    """one-way: upload (or with --down download) everything which changed, with --both in both directions"""
+    if args.both:
+        return _mirror(args, header)
+    if args.down:
+        args.src, args.dst = args.remote, args.local
+        return _get(args, header, skip_unchanged=True)
+    args.src, args.dst = args.local, args.remote
+    return _put(args, header, skip_unchanged=True)
+
+
+def _target(src, dst, header):
+    """cp/mv semantics: into dst if it is a directory, otherwise to dst"""
+    meta = _meta(dst, header)
+    if meta is not None and 'folder' in meta:
+        return dst.rstrip('/') + '/' + os.path.basename(src)
+    return dst
+
+
+def cmd_cp(args, header):
+    from onedrive import api
+    src, dst = _remote(args.src), _target(_remote(args.src), _remote(args.dst), header)
+    if args.dry_run:
+        print("cp {} -> {}".format(src, dst))
+        return 0
+    res = _check(api.copy(src, dst, header), 'cp ' + src)
+    if not args.no_wait:
+        status = api.AsyncOperationStatus(res.headers['Location'], header)
+        status.block()
+        if status.status == 'failed':
+            raise IOError("cp {} failed".format(src))
+    return 0
+
+
+def cmd_mv(args, header):
+    from onedrive import api
+    src, dst = _remote(args.src), _target(_remote(args.src), _remote(args.dst), header)
+    if args.dry_run:
+        print("mv {} -> {}".format(src, dst))
+        return 0
+    parent, name = os.path.split(dst)
+    if parent != os.path.dirname(src):
+        _check(api.move(src, parent, header), 'mv ' + src)
+        src = parent.rstrip('/') + '/' + os.path.basename(src)
+    if name != os.path.basename(src):
+        _check(api.rename(src, name, header), 'mv ' + src)
+    return 0
+
+
+def cmd_rm(args, header):
+    from onedrive import batch
+    paths = [_remote(p) for p in args.paths]
+    if args.dry_run:
+        for p in paths:
+            print("rm " + p)
+        return 0
+    b = batch.Batch(header)
+    for p in paths:
+        b.delete(p)
+    status = 0
+    for p, res in zip(paths, b.execute()):
+        if res.status_code != 204 and not (res.status_code == 404 and args.force):
+            print("onedrive: rm {}: {}".format(p, res.status_code), file=sys.stderr)
+            status = 1
+    return status
+
+
+def cmd_mkdir(args, header):
+    from onedrive import api
+    paths = [_remote(p) for p in args.paths]
+    if args.dry_run:
+        for p in paths:
+            print("mkdir " + p)
+        return 0
+    if args.parents:
+        api.makedirs(paths, header, workers=args.jobs)
+        return 0
+    for p in paths:
+        _check(api.mkdir(p, header), 'mkdir ' + p)
+    return 0
+
+
+def _parser():
+    parser = argparse.ArgumentParser(prog='onedrive', description='OneDrive command line client')
+    parser.add_argument('--keys', default='onedrive_keys.json', help='file with client_id and client_secret')
+    parser.add_argument('--tokens', default='tokens.json', help='file the tokens are kept in')
+    sub = parser.add_subparsers(dest='command', metavar='command')
+    sub.required = True
+
+    def command(name, f, help, transfer=False):
+        p = sub.add_parser(name, help=help)
+        p.set_defaults(func=f)
+        p.add_argument('-j', '--jobs', type=int, default=8, help='parallel requests (default: 8)')
+        p.add_argument('-n', '--dry-run', action='store_true', help='only print what would be done')
+        if transfer:
+            p.add_argument('--chunk-size', type=_size, help='upload fragment / download chunk size, e.g. 10M')
+            p.add_argument('--resume', action='store_true', help='resume interrupted transfers')
+        return p
+
+    p = command('ls', cmd_ls, 'list a directory')
+    p.add_argument('-l', '--long', action='store_true', help='show size and modification time')
+    p.add_argument('-R', '--recursive', action='store_true')
+    p.add_argument('path', nargs='?', default='/')
+
+    p = command('stat', cmd_stat, 'print the metadata as json')
+    p.add_argument('paths', nargs='+')
+
+    p = command('put', cmd_put, 'upload a file or directory', transfer=True)
+    p.add_argument('src')
+    p.add_argument('dst')
+
+    p = command('get', cmd_get, 'download a file or directory', transfer=True)
+    p.add_argument('src')
+    p.add_argument('dst', nargs='?', default='.')
+
+    p = command('sync', cmd_sync, 'transfer only what changed', transfer=True)
+    p.add_argument('--down', action='store_true', help='download remote changes instead of uploading')
+    p.add_argument('--both', action='store_true', help='two-way: transfer, move and delete in both directions')
+    p.add_argument('--conflict', choices=('rename', 'replace', 'fail'), default='rename',
+                   help='files changed on both sides (--both): keep both, local wins or skip (default: rename)')
+    p.add_argument('--max-deletes', type=int, default=100, metavar='N',
+                   help='refuse to sync (--both) if more than N files would be deleted, -1: no limit (default: 100)')
+    p.add_argument('local')
+    p.add_argument('remote')
+
+    p = command('cp', cmd_cp, 'copy a file or directory on the drive')
+    p.add_argument('--no-wait', action='store_true', help='do not wait until the copy is done')
+    p.add_argument('src')
+    p.add_argument('dst')
+
+    p = command('mv', cmd_mv, 'move or rename a file or directory')
+    p.add_argument('src')
+    p.add_argument('dst')
+
+    p = command('rm', cmd_rm, 'delete files or directories')
+    p.add_argument('-f', '--force', action='store_true', help='ignore missing files')
+    p.add_argument('paths', nargs='+')
+
+    p = command('mkdir', cmd_mkdir, 'create directories')
+    p.add_argument('-p', '--parents', action='store_true', help='create parents as needed')
+    p.add_argument('paths', nargs='+')
+    return parser
+
+
+def main(argv=None, header=None):
+    """
+    :param argv: arguments without the program name, default: sys.argv[1:]
+    :param header: auth header to use instead of logging in
+    :return: the exit code
+    """
+    args = _parser().parse_args(argv)
+    try:
+        return args.func(args, header if header is not None else _login(args))
+    except (IOError, ValueError) as e:
+        print("onedrive: {}".format(e.args[0] if e.args else e), file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        return 130
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""
+A client bundles the auth header with its own transport and base url. It is passed as auth to the api functions,
+so several clients (e.g. OneDrive and a local stand-in) can be used side by side, also from worker threads.
+A client with its own base url does not share the metadata cache, the disk cache and the rate limiter of the
+default service, it brings its own (or none):
+
+    c = client.Client(header, base_url="http://localhost:8080/v1.0")
+    api.mkdir("/a/b", c, parents=True)
+    transfer.put_tree("./photos", "/photos", c)
+"""
+from collections.abc import Mapping
+from urllib.parse import urlsplit
+
+from onedrive import api
+from onedrive import throttle
+
+
+class Client(Mapping):
+    """
+    The auth header (a dict or auth.TokenProvider) of the client as a mapping, plus
+    transport: the transport its requests are sent through, None: the default one (see session.configure())
+    base_url: the api url its requests go to, None: api.base_url
+    cache, disk_cache: its cache.MetadataCache and disk_cache.DiskCache, None: the shared ones (see cache.configure()
+    and disk_cache.configure()) without base_url, no caching with base_url
+    limiter: its throttle.RateLimiter, None: the shared one without base_url, a new one with base_url
+    """
+
+    def __init__(self, auth, base_url=None, transport=None, cache=None, disk_cache=None, limiter=None):
+        self.auth = auth
+        self.base_url = base_url.rstrip('/') if base_url else None
+        self.transport = transport
+        self.cache = cache
+        self.disk_cache = disk_cache
+        self.limiter = limiter if limiter is not None or not self.base_url else throttle.RateLimiter()
+
+    def __getitem__(self, key):
+        return self.auth[key]
+
+    def __iter__(self):
+        return iter(self.auth)
+
+    def __len__(self):
+        return len(self.auth)
+
+    @property
+    def refresh(self):
+        """refresh of the auth.TokenProvider or None"""
+        return getattr(self.auth, 'refresh', None)
+
+    def route(self, url):
+        """:return: the url, sent to base_url instead of api.base_url. Other urls (e.g. download urls) stay"""
+        if not self.base_url:
+            return url
+        u, base = urlsplit(url), urlsplit(api.base_url)
+        path = base.path.rstrip('/')
+        if (u.scheme.lower(), u.netloc.lower()) != (base.scheme.lower(), base.netloc.lower()) or \
+                not (u.path == path or u.path.startswith(path + '/')):
+            return url
+        rest = url[url.index(u.netloc) + len(u.netloc):]  # path, query, ... as they were
+        return self.base_url + rest[len(path):]
+
+    def anonymous(self):
+        """:return: a client without auth header on the same transport, for pre-authenticated urls"""
+        return Client({}, self.base_url, self.transport, self.cache, self.disk_cache, self.limiter)
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __repr__(self):
+        return 'Client({!r})'.format(self.base_url or api.base_url)
@@ -0,0 +1,147 @@
+import os.path
+
+from onedrive import api
+from onedrive import json_io
+from onedrive import metrics
+from onedrive import session
+
+
+@metrics.operation('delta')
+def delta_pages(auth, link=None):
+    """
+    Stream the changes of the drive: https://dev.onedrive.com/items/view_delta.htm
+    :param auth: auth header
+    :param link: the delta link (or token) of the last run, None to enumerate the whole drive
+    :return: generator of parsed pages. The last page carries the link for the next run,
+             see next_link()
+    :raise IOError: if a page cannot be fetched, e.g. 410 Gone if the token expired. args[1] is the Result
+    """
+    if link is None:
+        url = api.base_url + "/drive/root/view.delta"
+    elif link.startswith('http'):
+        url = link
+    else:
+        url = api.base_url + "/drive/root/view.delta?token=" + link
+
+    while url:
+        res = api.Result(session.request('get', url, auth))
+        if res.status_code != 200:
+            raise IOError("delta failed with {}".format(res.status_code), res)
+        body = res.json_body()
+        yield body
+        url = body.get('@odata.nextLink')
+
+
+def next_link(body):
+    """:return: the link or token to continue with in the next run, taken from the last page"""
+    return body.get('@odata.deltaLink') or body.get('@delta.token')
+
+
+def _record(item):
+    """the part of a driveItem which is kept in the index"""
+    r = {'name': item.get('name'), 'parent': item.get('parentReference', {}).get('id')}
+    if 'folder' in item or 'root' in item:
+        r['folder'] = True
+    else:
+        r['size'] = item.get('size')
+        sha1 = item.get('file', {}).get('hashes', {}).get('sha1Hash')
+        if sha1:
+            r['sha1'] = sha1
+    if 'eTag' in item:
+        r['eTag'] = item['eTag']
+    if 'lastModifiedDateTime' in item:
+        r['modified'] = item['lastModifiedDateTime']
+    if 'root' in item:
+        r['root'] = True
+    return r
+
+
+class DeltaSync:
+    """
+    Local index of the remote drive which is kept up to date through the delta endpoint.
+    Index and delta link are persisted in state_file, so each sync() only fetches what changed since the last one.
+
+        d = DeltaSync("drive_index.json", header)
+        for change, item_id in d.sync():
+            print(change, d.path(item_id))
+    """
+
+    def __init__(self, state_file, auth):
+        self.state_file = state_file
+        self.auth = auth
+        self.link = None
+        self.items = {}  # id -> record, see _record()
+        self.children = None
+        if os.path.isfile(state_file):
+            state = json_io.load(state_file)
+            self.link = state.get('link')
+            self.items = state.get('items', {})
+
+    def save(self):
+        json_io.save({'link': self.link, 'items': self.items}, self.state_file)
+
+    def sync(self):
+        """
+        Fetch and apply all changes since the last sync. If the service requests a resync (410 Gone),
+        the index is rebuilt from scratch.
+        :return: list of (change, id) with change in 'changed', 'deleted', in the order reported
+        """
+        try:
+            changes = self._apply(delta_pages(self.auth, self.link))
+        except IOError as e:
+            if e.args[1].status_code != 410:
+                raise
+            self.link = None
+            self.items = {}
+            changes = self._apply(delta_pages(self.auth))
+        self.save()
+        return changes
+
+    def _apply(self, pages):
+        changes = []
+        link = None
+        for body in pages:
+            for item in body['value']:
+                if 'deleted' in item:
+                    if self.items.pop(item['id'], None) is not None:
+                        changes.append(('deleted', item['id']))
+                else:
+                    self.items[item['id']] = _record(item)
+                    changes.append(('changed', item['id']))
+            link = next_link(body) or link
+        self.link = link  # only after all pages were applied
+        self.children = None
+        return changes
+
+    def path(self, item_id):
+        """:return: the path of the item in the index, e.g. /foo/bar.txt, or None if it is unknown"""
+        names = []
+        while True:
+            r = self.items.get(item_id)
+            if r is None:
+                return None
+            if r.get('root'):
+                return '/' + '/'.join(reversed(names))
+            names.append(r['name'])
+            item_id = r['parent']
+
+    def _children(self):
+        """:return: parent id -> {name -> id}, built once after each sync. The root is stored under None"""
+        if self.children is None:
+            self.children = {}
+            for item_id, r in self.items.items():
+                if r.get('root'):
+                    self.children[None] = {'': item_id}
+                else:
+                    self.children.setdefault(r['parent'], {})[r['name']] = item_id
+        return self.children
+
+    def get(self, path):
+        """:return: (id, record) of the item with the given path or None"""
+        children = self._children()
+        item_id = children.get(None, {}).get('')
+        for name in path.strip('/').split('/') if path.strip('/') else []:
+            item_id = children.get(item_id, {}).get(name)
+        if item_id is None:
+            return None
+        return item_id, self.items[item_id]
@@ -0,0 +1,210 @@
+"""
+Local disk cache of file contents and thumbnails, keyed by item id and the tag of its content (cTag, else eTag),
+so a changed item is never served from the cache. The cache is bounded in size, least recently used files
+are evicted. Used by api.download(), download.download_to() and the thumbnails module once configured:
+
+    from onedrive import disk_cache
+    disk_cache.configure("~/.cache/onedrive", max_bytes=2 * 1024 ** 3)
+"""
+import collections
+import hashlib
+import os
+import os.path
+import shutil
+import tempfile
+import threading
+import time
+
+import requests
+
+_cache = None
+# sec. without a write after which a temporary file is left over from an interrupted write, not one in progress
+stale_after = 3600
+
+
+def tag(meta):
+    """:return: the tag identifying the content of a driveItem (json or DriveItem)"""
+    if isinstance(meta, dict):
+        return meta.get('cTag') or meta.get('eTag')
+    return meta.ctag or meta.etag
+
+
+class DiskCache:
+    """
+    Files named by the sha1 of (variant, item id, tag) in a directory, in 256 subdirectories.
+    Writes are atomic (temporary file + rename), so concurrent processes never see partial files. Temporary files
+    are only removed (on startup) once they were not written for stale_after sec., not while another process writes.
+    The access order survives restarts through the modification time of the files.
+    """
+
+    def __init__(self, directory, max_bytes=1024 ** 3):
+        """
+        :param directory: created if missing
+        :param max_bytes: least recently used files are evicted above this size
+        """
+        self.directory = os.path.expanduser(directory)
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = collections.OrderedDict()  # key -> size, least recently used first
+        self.size = 0
+        os.makedirs(self.directory, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        found = []
+        now = time.time()
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                f = os.path.join(root, name)
+                try:
+                    st = os.stat(f)
+                    if name.startswith('.'):  # a temporary file, maybe still written by another process
+                        if now - st.st_mtime > stale_after:  # left over from an interrupted write
+                            os.remove(f)
+                        continue
+                except OSError:  # removed by another process meanwhile
+                    continue
+                found.append((st.st_mtime, name, st.st_size))
+        for _, key, size in sorted(found):
+            self.entries[key] = size
+            self.size += size
+        with self.lock:
+            self._evict()
+
+    @staticmethod
+    def key(item_id, tag, variant='content'):
+        """
+        :param variant: 'content' or e.g. the thumbnail size
+        """
+        return hashlib.sha1('\n'.join((variant, item_id, tag)).encode('utf-8')).hexdigest()
+
+    def _file(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def path(self, item_id, tag, variant='content'):
+        """:return: the file holding the cached data (marked as recently used) or None"""
+        if not item_id or not tag:
+            return None
+        key = self.key(item_id, tag, variant)
+        with self.lock:
+            if key not in self.entries:
+                return None
+            self.entries.move_to_end(key)
+        f = self._file(key)
+        try:
+            os.utime(f)
+        except OSError:  # evicted by another process
+            with self.lock:
+                self.size -= self.entries.pop(key, 0)
+            return None
+        return f
+
+    def get(self, item_id, tag, variant='content'):
+        """:return: the cached bytes or None"""
+        f = self.path(item_id, tag, variant)
+        if f is None:
+            return None
+        try:
+            with open(f, 'rb') as fp:
+                return fp.read()
+        except OSError:
+            return None
+
+    def put(self, item_id, tag, data, variant='content'):
+        """store bytes"""
+        def write(fp):
+            fp.write(data)
+        self._store(item_id, tag, variant, write)
+
+    def put_file(self, item_id, tag, src, variant='content'):
+        """store a copy of a local file"""
+        def write(fp):
+            with open(src, 'rb') as s:
+                shutil.copyfileobj(s, fp, 1024 * 1024)
+        self._store(item_id, tag, variant, write)
+
+    def put_chunks(self, item_id, tag, chunks, variant='content'):
+        """store data as it arrives, e.g. from response.iter_content()"""
+        def write(fp):
+            for chunk in chunks:
+                fp.write(chunk)
+        self._store(item_id, tag, variant, write)
+
+    def _store(self, item_id, tag, variant, write):
+        if not item_id or not tag:
+            return
+        key = self.key(item_id, tag, variant)
+        f = self._file(key)
+        os.makedirs(os.path.dirname(f), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix='.', dir=os.path.dirname(f))
+        try:
+            with os.fdopen(fd, 'wb') as fp:
+                write(fp)
+            size = os.path.getsize(tmp)
+            if size > self.max_bytes:
+                os.remove(tmp)
+                return
+            os.replace(tmp, f)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        with self.lock:
+            self.size += size - self.entries.pop(key, 0)
+            self.entries[key] = size
+            self._evict()
+
+    def _evict(self):
+        while self.size > self.max_bytes and self.entries:
+            key, size = self.entries.popitem(last=False)
+            self.size -= size
+            try:
+                os.remove(self._file(key))
+            except OSError:
+                pass
+
+    def clear(self):
+        with self.lock:
+            self.max_bytes, max_bytes = 0, self.max_bytes
+            self._evict()
+            self.max_bytes = max_bytes
+
+
+def configure(directory, max_bytes=1024 ** 3):
+    """
+    Enable the disk cache for downloads and thumbnails.
+    :param directory: where the cached files are kept
+    :param max_bytes: max. size of the cache
+    :return: the new cache
+    """
+    global _cache
+    _cache = DiskCache(directory, max_bytes)
+    return _cache
+
+
+def disable():
+    global _cache
+    _cache = None
+
+
+def get_cache(auth=None):
+    """
+    :param auth: the auth of the request, a client.Client may bring its own cache, see there
+    :return: the active cache or None if disabled
+    """
+    c = getattr(auth, 'disk_cache', None)
+    if c is not None or getattr(auth, 'base_url', None):
+        return c
+    return _cache
+
+
+def response(data, content_type=None):
+    """:return: a requests.Response with status 200 serving data from the cache"""
+    res = requests.Response()
+    res.status_code = 200
+    res._content = data
+    res.encoding = None
+    if content_type:
+        res.headers['Content-Type'] = content_type
+    res.headers['Content-Length'] = str(len(data))
+    return res
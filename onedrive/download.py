@@ -0,0 +1,134 @@
+import os
+import os.path
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+from onedrive import api
+from onedrive import disk_cache
+from onedrive import metrics
+from onedrive import session
+
+default_chunk_size = 1024 * 1024
+
+
+@metrics.operation('download_url')
+def download_url(path, auth):
+    """
+    resolve the pre-authenticated download url of a file: https://dev.onedrive.com/items/download.htm
+    :param path: file to download
+    :param auth: auth header
+    :return: the url which does NOT req. authentication or None if there is none (see Result for the reason)
+    """
+    url = api.base_url + "/drive/root:" + path + ":/content"
+    res = session.request('get', url, auth, allow_redirects=False, stream=True)
+    res.close()
+    if res.status_code in (301, 302, 303, 307):
+        return res.headers.get('Location')
+    return None
+
+
+def _get(path, auth, url, headers):
+    """get the content, either from the resolved url or (if there is none) through the api"""
+    if url:
+        return session.request('get', url, session.anonymous(auth), headers=headers, stream=True)
+    return session.request('get', api.base_url + "/drive/root:" + path + ":/content", auth, headers=headers,
+                           stream=True)
+
+
+def _copy(response, f, chunk_size):
+    written = 0
+    for chunk in response.iter_content(chunk_size):
+        f.write(chunk)
+        written += len(chunk)
+    return written
+
+
+@metrics.operation('download_to')
+def download_to(path, dst, auth, chunk_size=default_chunk_size, resume=False, segments=1):
+    """
+    download a file in chunks into a local file or file like object without holding it in memory
+    See: https://dev.onedrive.com/items/download.htm
+    :param path: file to download
+    :param dst: local file name or a binary file like object opened for writing
+    :param auth: auth header
+    :param chunk_size: bytes read from the network at once
+    :param resume: True to continue a partial local file with a range request (file names only)
+    :param segments: number of parallel range requests for one file (file names only)
+    :return: Result 200 (or 206 for range requests) with empty text, Result of the failed request otherwise
+    """
+    dc = disk_cache.get_cache(auth)  # None if disabled, see disk_cache.configure()
+    if dc is not None and isinstance(dst, str) and not resume:
+        meta = api.get_metadata(path, auth, select='id,eTag,cTag')
+        if meta.status_code == 200:
+            item_id, tag = meta.json_body().get('id'), disk_cache.tag(meta.json_body())
+            cached = dc.path(item_id, tag)
+            if cached is not None:
+                shutil.copyfile(cached, dst)
+                return api.Result(disk_cache.response(b''), '')
+            res = _download_to(path, dst, auth, chunk_size, resume, segments)
+            if res.status_code in (200, 206):
+                dc.put_file(item_id, tag, dst)
+            return res
+    return _download_to(path, dst, auth, chunk_size, resume, segments)
+
+
+def _download_to(path, dst, auth, chunk_size, resume, segments):
+    url = download_url(path, auth)
+
+    if not isinstance(dst, str):
+        with _get(path, auth, url, None) as res:  # closed on errors too, the connection goes back to the pool
+            if res.status_code != 200:
+                return api.Result(res)
+            _copy(res, dst, chunk_size)
+            return api.Result(res, '')
+
+    if segments > 1:
+        return _download_segments(path, dst, auth, url, chunk_size, segments)
+
+    offset = os.path.getsize(dst) if resume and os.path.isfile(dst) else 0
+    headers = {'Range': 'bytes={}-'.format(offset)} if offset else None
+    with _get(path, auth, url, headers) as res:
+        if res.status_code == 416:  # nothing left to download
+            return api.Result(res, '')
+        if res.status_code not in (200, 206):
+            return api.Result(res)
+
+        # a server ignoring the range answers with 200 and the whole file
+        with open(dst, 'ab' if res.status_code == 206 else 'wb') as f:
+            _copy(res, f, chunk_size)
+        return api.Result(res, '')
+
+
+def _download_segment(path, auth, url, dst, start, end, chunk_size):
+    """:return: Result 206 with empty text or the Result of the failed request"""
+    with _get(path, auth, url, {'Range': 'bytes={}-{}'.format(start, end)}) as res:
+        if res.status_code != 206:
+            return api.Result(res)
+        with open(dst, 'r+b') as f:  # each segment writes to its own position in the preallocated file
+            f.seek(start)
+            _copy(res, f, chunk_size)
+        return api.Result(res, '')
+
+
+def _download_segments(path, dst, auth, url, chunk_size, segments):
+    meta = api.get_metadata(path, auth, select='size')
+    if meta.status_code != 200:
+        return meta
+    size = meta.json_body()['size']
+
+    with open(dst, 'wb') as f:
+        f.truncate(size)
+    if size == 0:
+        with _get(path, auth, url, None) as res:
+            return api.Result(res, '')
+
+    part = -(-size // segments)
+    ranges = [(start, min(start + part, size) - 1) for start in range(0, size, part)]
+    download_segment = metrics.bind(_download_segment)
+    with ThreadPoolExecutor(max_workers=segments) as pool:
+        results = list(pool.map(lambda r: download_segment(path, auth, url, dst, r[0], r[1], chunk_size), ranges))
+
+    for res in results:
+        if res.status_code != 206:
+            return res
+    return results[-1]
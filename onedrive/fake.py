@@ -0,0 +1,224 @@
+"""
+An in-memory stand-in for the drive, for tests and benchmarks. It answers requests as a handler of
+transport.MemoryTransport (or of the local benchmark server):
+
+    drive = fake.FakeDrive()
+    c = client.Client(header, transport=transport.MemoryTransport(drive))
+    api.mkdir("/a", c)
+"""
+import hashlib
+import json
+import re
+from types import SimpleNamespace
+from urllib.parse import parse_qs, quote, unquote, urlparse
+
+
+def _select(item, query):
+    """the properties of item in the select query parameter, all without"""
+    if 'select' not in query:
+        return item
+    return {k: v for k, v in item.items() if k in query['select'][0].split(',')}
+
+
+class FakeDrive:
+    """
+    In-memory drive answering the path based requests of onedrive.api:
+    metadata, children (with paging), mkdir, upload (simple and sessions), download (with ranges),
+    delete, move/rename and copy.
+    """
+
+    def __init__(self):
+        self.items = {'/': {'id': 'root', 'name': 'root', 'root': {}, 'folder': {}}}
+        self.contents = {}
+        self.uploads = {}  # upload session id -> [path, size, {offset: bytes}]
+        self.next_id = 0
+        self.base = 'https://fake'  # for next, monitor and upload links
+
+    def _meta(self, path, is_dir, content=None):
+        self.next_id += 1
+        item = {'id': 'id' + str(self.next_id), 'name': path.rsplit('/', 1)[1], 'eTag': 'e' + str(self.next_id)}
+        if is_dir:
+            item['folder'] = {}
+        else:
+            item['file'] = {'hashes': {'sha1Hash': hashlib.sha1(content).hexdigest().upper()}}
+            item['size'] = len(content)
+            self.contents[path] = content
+        parent = path.rsplit('/', 1)[0] or '/'
+        item['parentReference'] = {'id': self.items[parent]['id'], 'path': '/drive/root:' + parent.rstrip('/')}
+        self.items[path] = item
+        return item
+
+    def mkdir(self, path):
+        return self._meta(path, True)
+
+    def put(self, path, content):
+        return self._meta(path, False, content)
+
+    def by_id(self, item_id):
+        return next(p for p, i in self.items.items() if i['id'] == item_id)
+
+    def children(self, path):
+        prefix = path.rstrip('/') + '/'
+        return [p for p in self.items if p.startswith(prefix) and '/' not in p[len(prefix):] and p != '/']
+
+    def __call__(self, request):
+        url = urlparse(request.url)
+        if '/monitor/' in url.path:  # copies are done at once, the monitor redirects to the new item
+            return 303, {'Location': self.base + '/drive/root:' + url.path[url.path.index('/monitor/') + 8:]}, ''
+        if '/upload/' in url.path:
+            return self._upload_fragment(url.path.rsplit('/', 1)[1], request)
+        if url.path.endswith('/$batch'):
+            return self._batch(request)
+        path, query = unquote(url.path), parse_qs(url.query)
+        path = path[path.index('/drive/') + len('/drive'):]
+        body = json.loads(request.body) if request.body and request.method in ('POST', 'PATCH') else None
+
+        if path.endswith('/children') and request.method == 'POST':
+            parent = '/' if path == '/root/children' else self.by_id(path.split('/')[2])
+            new = parent.rstrip('/') + '/' + body['name']
+            if new in self.items:
+                return 409, {}, {'error': {'code': 'nameAlreadyExists'}}
+            return 201, {}, self.mkdir(new)
+
+        if path == '/root/children':
+            path = '/root:/:/children'
+        if not path.startswith('/root:'):
+            return 400, {}, {'error': {'code': 'invalidRequest'}}
+        path, _, action = path[len('/root:'):].partition(':/')
+        path = path.rstrip(':').rstrip('/') or '/'
+
+        if action == 'upload.createSession':
+            self.next_id += 1
+            self.uploads[str(self.next_id)] = [path, None, {}]
+            return 200, {}, {'uploadUrl': '{}/upload/{}'.format(self.base, self.next_id), 'nextExpectedRanges': ['0-']}
+        if action == 'content' and request.method == 'PUT':
+            data = request.body or b''
+            data = data if isinstance(data, bytes) else data.encode('utf-8')
+            exists = path in self.items
+            behavior = query.get('@name.conflictBehavior', ['replace'])[0]
+            if exists and behavior == 'fail':
+                return 409, {}, {'error': {'code': 'nameAlreadyExists'}}
+            if exists and behavior == 'rename':  # a.txt -> a 1.txt
+                stem, dot, ext = path.rpartition('.') if '.' in path.rsplit('/', 1)[1] else (path, '', '')
+                path = next(p for p in ('{} {}{}{}'.format(stem, i, dot, ext) for i in range(1, 1000))
+                            if p not in self.items)
+                exists = False
+            return (200 if exists else 201), {}, self.put(path, data)
+
+        if path not in self.items:
+            return 404, {}, {'error': {'code': 'itemNotFound'}}
+
+        if action.startswith('thumbnails'):
+            return self._thumbnails(path, action)
+        if action == 'children':
+            names = sorted(self.children(path))
+            top = int(query.get('top', ['1024'])[0])
+            skip = int(query.get('skip', ['0'])[0])
+            page = {'value': [_select(self.items[p], query) for p in names[skip:skip + top]]}
+            if skip + top < len(names):
+                page['@odata.nextLink'] = '{}/drive/root:{}:/children?top={}&skip={}'.format(
+                    self.base, path, top, skip + top)
+                if 'select' in query:
+                    page['@odata.nextLink'] += '&select=' + query['select'][0]
+            return 200, {}, page
+        if action == 'content':
+            content = self.contents[path]
+            m = re.match(r'bytes=(\d+)-(\d*)', request.headers.get('Range', ''))
+            if m:
+                start = int(m.group(1))
+                end = int(m.group(2)) if m.group(2) else len(content) - 1
+                if start >= len(content):
+                    return 416, {}, ''
+                return 206, {'Content-Range': 'bytes {}-{}/{}'.format(start, end, len(content))}, \
+                    content[start:end + 1]
+            return 200, {}, content
+        if action == 'action.copy':
+            dst_dir = self._parent(body['parentReference'])
+            dst = dst_dir.rstrip('/') + '/' + body['name']
+            self._copy(path, dst)
+            return 202, {'Location': self.base + '/monitor' + quote(dst)}, ''
+        if request.method == 'DELETE':
+            for p in [p for p in self.items if p == path or p.startswith(path + '/')]:
+                del self.items[p]
+            return 204, {}, ''
+        if request.method == 'PATCH':
+            parent = path.rsplit('/', 1)[0] or '/'
+            if 'parentReference' in body:
+                parent = self._parent(body['parentReference'])
+            new = parent.rstrip('/') + '/' + body.get('name', path.rsplit('/', 1)[1])
+            if new in self.items:
+                return 409, {}, {'error': {'code': 'nameAlreadyExists'}}
+            for p in sorted([p for p in self.items if p == path or p.startswith(path + '/')]):
+                moved = new + p[len(path):]
+                self.items[moved] = self.items.pop(p)
+                self.items[moved]['name'] = moved.rsplit('/', 1)[1]
+                if p in self.contents:
+                    self.contents[moved] = self.contents.pop(p)
+            return 200, {}, self.items[new]
+        return 200, {'ETag': self.items[path].get('eTag', '')}, _select(self.items[path], query)
+
+    def _thumbnails(self, path, action):
+        """files have thumbnails, their content is '<size>:<item id>'"""
+        sizes = ('small', 'medium', 'large')
+        if path not in self.contents:
+            return (200, {}, {'value': []}) if action == 'thumbnails' else (404, {}, {'error': {'code': 'itemNotFound'}})
+        item_id = self.items[path]['id']
+        if action == 'thumbnails':
+            return 200, {}, {'value': [dict({s: {'url': '{}/thumbnails/{}/{}'.format(self.base, item_id, s)}
+                                             for s in sizes}, id='0')]}
+        size = action.split('/')[2]
+        return 200, {'Content-Type': 'image/jpeg'}, '{}:{}'.format(size, item_id).encode('utf-8')
+
+    def _parent(self, reference):
+        if 'id' in reference:
+            return self.by_id(reference['id'])
+        return reference['path'][len('/drive/root'):].lstrip(':') or '/'
+
+    def _batch(self, request):
+        """the sub requests are answered one after the other, dependent requests of failed ones with 424"""
+        responses, failed = [], set()
+        base = request.url[:request.url.index('/$batch')]
+        for r in json.loads(request.body)['requests']:
+            if any(d in failed for d in r.get('dependsOn', [])):
+                status, headers, body = 424, {}, None
+            else:
+                data = json.dumps(r['body']).encode('utf-8') if 'body' in r else None
+                sub = SimpleNamespace(method=r['method'], url=base + r['url'], headers=r.get('headers', {}),
+                                      body=data)
+                status, headers, body = self(sub)
+                if isinstance(body, bytes):
+                    body = body.decode('utf-8')
+            if status >= 400:
+                failed.add(r['id'])
+            responses.append({'id': r['id'], 'status': status, 'headers': headers, 'body': body or None})
+        return 200, {}, {'responses': responses}
+
+    def _upload_fragment(self, session_id, request):
+        if session_id not in self.uploads:
+            return 404, {}, {'error': {'code': 'itemNotFound'}}
+        upload = self.uploads[session_id]
+        path, size, received = upload
+        if request.method == 'PUT':
+            start, end, size = map(int, re.match(r'bytes (\d+)-(\d+)/(\d+)',
+                                                 request.headers['Content-Range']).groups())
+            upload[1] = size
+            received[start] = request.body
+        missing, pos = [], 0
+        for start in sorted(received):
+            if start > pos:
+                missing.append('{}-{}'.format(pos, start - 1))
+            pos = max(pos, start + len(received[start]))
+        if size is None or pos < size:
+            missing.append('{}-'.format(pos))
+        if request.method == 'PUT' and not missing:
+            del self.uploads[session_id]
+            return 201, {}, self.put(path, b''.join(received[k] for k in sorted(received)))
+        return (202 if request.method == 'PUT' else 200), {}, {'nextExpectedRanges': missing}
+
+    def _copy(self, src, dst):
+        for p in sorted([p for p in self.items if p == src or p.startswith(src + '/')]):
+            target = dst + p[len(src):]
+            if 'folder' in self.items[p]:
+                self.mkdir(target)
+            else:
+                self.put(target, self.contents[p])
@@ -0,0 +1,209 @@
+import base64
+import hashlib
+import mmap
+import os
+import os.path
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from onedrive import api
+from onedrive import json_io
+
+buffer_size = 4 * 1024 * 1024
+mmap_threshold = 64 * 1024 * 1024  # files above this size are mapped instead of read
+
+
+class QuickXorHash:
+    """
+    The hash OneDrive reports as quickXorHash: https://docs.microsoft.com/onedrive/developer/code-snippets/quickxorhash
+    Each byte is xored into a 160 bit circular register, shifted by 11 bits per byte. Bytes 160 positions apart
+    land at the same position, so a block is first folded to 160 bytes with big int xors and only these 160 bytes
+    are rotated into the register.
+    """
+    width = 160
+    shift = 11
+    mask = (1 << width) - 1
+
+    def __init__(self):
+        self.state = 0
+        self.offset = 0  # bit position of the next byte
+        self.length = 0
+
+    def update(self, data):
+        data = memoryview(data).cast('B')
+        n = len(data)
+        if n == 0:
+            return
+        row = self.width  # bytes 160 positions apart share a bit position
+        rows, rest = divmod(n, row)
+
+        # xor all complete rows of 160 bytes into one row
+        folded = 0
+        if rows:
+            folded = _fold(int.from_bytes(data[:rows * row], 'little'), rows, row * 8)
+        if rest:
+            folded ^= int.from_bytes(data[rows * row:], 'little')
+        vector = folded.to_bytes(row, 'little')
+
+        state = self.state
+        for i, b in enumerate(vector):
+            if b:
+                pos = (self.offset + i * self.shift) % self.width
+                state ^= ((b << pos) & self.mask) | (b >> (self.width - pos))
+        self.state = state
+        self.offset = (self.offset + self.shift * (n % self.width)) % self.width
+        self.length += n
+
+    def digest(self):
+        d = bytearray(self.state.to_bytes(self.width // 8, 'little'))
+        for i, b in enumerate(self.length.to_bytes(8, 'little')):
+            d[self.width // 8 - 8 + i] ^= b
+        return bytes(d)
+
+    def b64digest(self):
+        """:return: the hash base64 encoded, as reported by OneDrive"""
+        return base64.b64encode(self.digest()).decode('ascii')
+
+
+def _fold(value, rows, bits):
+    """xor the `rows` rows of `bits` bits of value into one row, halving the number of rows in each step"""
+    while rows > 1:
+        half = rows // 2
+        low = value & ((1 << (half * bits)) - 1)
+        high = value >> (half * bits)
+        odd = 0
+        if rows % 2:
+            odd = high >> (half * bits)
+            high &= (1 << (half * bits)) - 1
+        value = low ^ high
+        rows = half
+        if odd:
+            value ^= odd  # the odd row is xored into the first row
+    return value
+
+
+def file_hashes(path):
+    """
+    compute sha1 and quickXorHash of a file in one pass. Large files are mapped into memory, smaller ones
+    are read into one reused buffer.
+    :return: {'sha1Hash': upper case hex, 'quickXorHash': base64}, as in the hashes facet of OneDrive
+    """
+    sha1 = hashlib.sha1()
+    qxh = QuickXorHash()
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        if size > mmap_threshold:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                view = memoryview(m)
+                for start in range(0, size, buffer_size):
+                    block = view[start:start + buffer_size]
+                    sha1.update(block)
+                    qxh.update(block)
+                    block.release()
+                view.release()
+        else:
+            buf = bytearray(buffer_size)
+            view = memoryview(buf)
+            while True:
+                n = f.readinto(buf)
+                if not n:
+                    break
+                sha1.update(view[:n])
+                qxh.update(view[:n])
+    return {'sha1Hash': sha1.hexdigest().upper(), 'quickXorHash': qxh.b64digest()}
+
+
+class HashCache:
+    """
+    Hashes of local files keyed by (path, size, mtime), persisted in a json file.
+    A file is only hashed again if its size or modification time changed.
+    """
+
+    def __init__(self, file=None):
+        """:param file: json file to persist the hashes in, None to keep them in memory only"""
+        self.file = file
+        self.entries = {}  # abs. path -> [size, mtime_ns, hashes]
+        self.lock = threading.Lock()
+        if file and os.path.isfile(file):
+            self.entries = json_io.load(file)
+
+    def _key(self, path):
+        st = os.stat(path)
+        return os.path.abspath(path), st.st_size, st.st_mtime_ns
+
+    def get(self, path):
+        """:return: the cached hashes of the file or None if the file changed"""
+        key, size, mtime = self._key(path)
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is not None and entry[0] == size and entry[1] == mtime:
+            return entry[2]
+        return None
+
+    def put(self, path, hashes):
+        key, size, mtime = self._key(path)
+        with self.lock:
+            self.entries[key] = [size, mtime, hashes]
+
+    def save(self):
+        if self.file:
+            with self.lock:
+                json_io.save(self.entries, self.file)
+
+
+def hash_file(path, cache=None):
+    """:return: the hashes of a file (see file_hashes()), from the cache if it did not change"""
+    hashes = cache.get(path) if cache is not None else None
+    if hashes is None:
+        hashes = file_hashes(path)
+        if cache is not None:
+            cache.put(path, hashes)
+    return hashes
+
+
+def hash_files(paths, cache=None, workers=None):
+    """
+    hash many files in a process pool. Unchanged files are taken from the cache, which is saved afterwards.
+    :param paths: local files
+    :param cache: optional HashCache
+    :param workers: number of processes, default: number of cpus
+    :return: dict path -> hashes (see file_hashes())
+    """
+    result, todo = {}, []
+    for p in paths:
+        hashes = cache.get(p) if cache is not None else None
+        if hashes is None:
+            todo.append(p)
+        else:
+            result[p] = hashes
+
+    if len(todo) == 1:
+        result[todo[0]] = file_hashes(todo[0])
+    elif todo:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            result.update(zip(todo, pool.map(file_hashes, todo, chunksize=max(1, len(todo) // 64))))
+
+    if cache is not None and todo:
+        for p in todo:
+            cache.put(p, result[p])
+        cache.save()
+    return result
+
+
+def same_content(local, meta, cache=None):
+    """
+    :param local: local file
+    :param meta: driveItem of the remote file or None
+    :param cache: optional HashCache
+    :return: True if the size and the hashes the service reports (sha1 or quickXor) are the same,
+             False if the service reports no hash: the same size alone does not mean the same content
+    """
+    if meta is None or not api.is_file_meta(meta) or meta.get('size') != os.path.getsize(local):
+        return False
+    remote = meta['file'].get('hashes') or {}
+    if not (remote.get('sha1Hash') or remote.get('quickXorHash')):
+        return False
+    hashes = hash_file(local, cache)
+    if remote.get('sha1Hash'):
+        return remote['sha1Hash'].upper() == hashes['sha1Hash']
+    return remote['quickXorHash'] == hashes['quickXorHash']
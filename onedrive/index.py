@@ -0,0 +1,254 @@
+"""
+Local SQLite index of the drive's metadata, for queries without network calls:
+
+    idx = index.Index("drive.db")
+    idx.refresh(header)  # the whole drive on the first call, then only the changes (delta)
+    idx.find("/archive", min_size=1024 ** 3)  # all items larger than 1GB below /archive
+"""
+import datetime
+import sqlite3
+import threading
+
+from onedrive import api
+from onedrive import delta
+from onedrive import items
+
+_schema = """
+CREATE TABLE IF NOT EXISTS items (
+    id TEXT PRIMARY KEY,
+    parent TEXT,
+    path TEXT UNIQUE,
+    name TEXT,
+    folder INTEGER NOT NULL DEFAULT 0,
+    size INTEGER,
+    sha1 TEXT,
+    quick_xor TEXT,
+    etag TEXT,
+    ctag TEXT,
+    created TEXT,
+    modified TEXT
+);
+CREATE INDEX IF NOT EXISTS items_parent ON items (parent);
+CREATE INDEX IF NOT EXISTS items_size ON items (size);
+CREATE INDEX IF NOT EXISTS items_modified ON items (modified);
+CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+_columns = ('id', 'parent', 'path', 'name', 'folder', 'size', 'sha1', 'quick_xor', 'etag', 'ctag', 'created',
+            'modified')
+
+
+def _subtree(path):
+    """:return: sql condition and parameters for all paths below path (using the index on path)"""
+    prefix = path.rstrip('/') + '/'
+    return "path > ? AND path < ?", (prefix, prefix[:-1] + '0')  # '0' follows '/'
+
+
+def _timestamp(value):
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        return value.isoformat()
+    return value
+
+
+class Index:
+    """
+    Items (id, path, parent, size, hashes, eTag, cTag, timestamps) of a drive in a SQLite database.
+    Filled from listings (crawl(), add()) and kept fresh with the delta endpoint (refresh()).
+    Rows are returned as dicts with the keys of _columns. All methods are thread-safe.
+    """
+
+    def __init__(self, file=':memory:'):
+        """:param file: the database file, default: in memory"""
+        self.db = sqlite3.connect(file, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.lock = threading.RLock()
+        self.refreshing = threading.Lock()  # one refresh at a time, without blocking the queries
+        if file != ':memory:':
+            self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(_schema)
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    def _path(self, item):
+        """the path of a driveItem: from its parentReference or from its parent in the index"""
+        if 'root' in item:
+            return '/'
+        ref = item.get('parentReference', {})
+        if 'path' in ref:
+            parent = ref['path'].split(':', 1)[1] if ':' in ref['path'] else ''
+            return parent.rstrip('/') + '/' + item['name']
+        row = self.db.execute("SELECT path FROM items WHERE id = ?", (ref.get('id'),)).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return row[0].rstrip('/') + '/' + item['name']
+
+    def _upsert(self, item, path=None):
+        if path is None:
+            path = self._path(item)
+        hashes = item.get('file', {}).get('hashes', {})
+        folder = 'folder' in item or 'root' in item
+        old = self.db.execute("SELECT path FROM items WHERE id = ?", (item['id'],)).fetchone()
+        self.db.execute("INSERT OR REPLACE INTO items VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (item['id'], item.get('parentReference', {}).get('id'), path, item.get('name'),
+                         int(folder), None if folder else item.get('size'), hashes.get('sha1Hash'),
+                         hashes.get('quickXorHash'), item.get('eTag'), item.get('cTag'),
+                         item.get('createdDateTime'), item.get('lastModifiedDateTime')))
+        if old is not None and old[0] and path and old[0] != path and folder:  # moved: move the subtree along
+            cond, params = _subtree(old[0])
+            self.db.execute("UPDATE items SET path = ? || substr(path, ?) WHERE " + cond,
+                            (path.rstrip('/'), len(old[0].rstrip('/')) + 1) + params)
+
+    def _delete(self, path=None, item_id=None):
+        if item_id is not None:
+            row = self.db.execute("SELECT path FROM items WHERE id = ?", (item_id,)).fetchone()
+            self.db.execute("DELETE FROM items WHERE id = ?", (item_id,))
+            path = row[0] if row is not None else None
+        if path is None:
+            return
+        cond, params = _subtree(path)
+        self.db.execute("DELETE FROM items WHERE path = ? OR " + cond, (path,) + params)
+
+    def add(self, items, path=None):
+        """
+        add or update driveItems, e.g. from list_children() or get_metadata()
+        :param items: a driveItem or an iterable of them
+        :param path: path of the item if a single item is added and its path is not in its parentReference
+        :return: number of items added
+        """
+        if isinstance(items, dict):
+            items = [items]
+        n = 0
+        with self.lock, self.db:
+            for item in items:
+                self._upsert(item, path)
+                n += 1
+        return n
+
+    def remove(self, path):
+        """remove an item and everything below it"""
+        with self.lock, self.db:
+            self._delete(path)
+
+    def crawl(self, path, auth, workers=4):
+        """
+        (re)index the tree below path by listing it (see api.walk()). Items below path which are gone are removed.
+        :return: number of items indexed
+        :raise IOError: if a directory cannot be listed, the index is not changed then
+        """
+        errors = []
+        listed = []
+        for p, folders, files in api.walk(path, auth, workers=workers, onerror=errors.append, select=items.fields):
+            listed.extend((api._join(p, i['name']), i) for i in folders + files)
+        if errors:
+            raise errors[0]
+        with self.lock, self.db:
+            if path.strip('/'):
+                cond, params = _subtree(path)
+                self.db.execute("DELETE FROM items WHERE " + cond, params)
+            else:
+                self.db.execute("DELETE FROM items WHERE path != '/'")
+            for p, item in listed:
+                self._upsert(item, p)
+        return len(listed)
+
+    def refresh(self, auth):
+        """
+        Apply the changes of the drive since the last refresh (delta). The first refresh (or a refresh after the
+        service asked for a resync) indexes the whole drive. The pages are fetched first, queries are only blocked
+        while they are written.
+        :return: number of changed or deleted items
+        """
+        with self.refreshing:
+            with self.lock:
+                link = self.state('delta_link')
+            try:
+                pages, resync = list(delta.delta_pages(auth, link)), False
+            except IOError as e:
+                if len(e.args) < 2 or e.args[1].status_code != 410:
+                    raise
+                pages, resync = list(delta.delta_pages(auth)), True
+            with self.lock:
+                return self._apply(pages, resync)
+
+    def _apply(self, pages, resync=False):
+        n = 0
+        link = None
+        with self.db:  # one transaction: an interrupted refresh is repeated as a whole
+            if resync:
+                self.db.execute("DELETE FROM items")
+            for body in pages:
+                for item in body['value']:
+                    if 'deleted' in item:
+                        self._delete(item_id=item['id'])
+                    else:
+                        self._upsert(item)
+                    n += 1
+                link = delta.next_link(body) or link
+            self.db.execute("INSERT OR REPLACE INTO state VALUES ('delta_link', ?)", (link,))
+        return n
+
+    def state(self, key):
+        row = self.db.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def get(self, path):
+        """:return: the item with the given path or None"""
+        path = '/' + path.strip('/')
+        with self.lock:
+            row = self.db.execute("SELECT * FROM items WHERE path = ?", (path,)).fetchone()
+        return dict(row) if row else None
+
+    def children(self, path):
+        """:return: the items directly below path, by name"""
+        item = self.get(path)
+        if item is None:
+            return []
+        with self.lock:
+            rows = self.db.execute("SELECT * FROM items WHERE parent = ? ORDER BY name", (item['id'],)).fetchall()
+        return [dict(r) for r in rows]
+
+    def find(self, under='/', glob=None, min_size=None, max_size=None, modified_after=None, modified_before=None,
+             folders=None, order_by='path', limit=None):
+        """
+        query the index
+        :param under: only items below this path
+        :param glob: pattern the path has to match (case sensitive), e.g. '*/2016/*.jpg'
+        :param min_size: min. size in bytes (files only)
+        :param max_size: max. size in bytes (files only)
+        :param modified_after: datetime or ISO string
+        :param modified_before: datetime or ISO string
+        :param folders: True: only folders, False: only files, None: both
+        :param order_by: one of the columns, e.g. 'size DESC'
+        :param limit: max. number of items
+        :return: list of items
+        """
+        where, params = [], []
+        if under.strip('/'):
+            cond, p = _subtree(under)
+            where.append(cond)
+            params.extend(p)
+        for cond, value in (("path GLOB ?", glob), ("size >= ?", min_size), ("size <= ?", max_size),
+                            ("modified > ?", _timestamp(modified_after)),
+                            ("modified < ?", _timestamp(modified_before))):
+            if value is not None:
+                where.append(cond)
+                params.append(value)
+        if folders is not None:
+            where.append("folder = ?")
+            params.append(int(folders))
+        column, _, direction = order_by.partition(' ')
+        if column not in _columns or direction.upper() not in ('', 'ASC', 'DESC'):
+            raise ValueError("cannot order by " + order_by)
+        sql = "SELECT * FROM items"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY " + order_by
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        with self.lock:
+            return [dict(r) for r in self.db.execute(sql, params).fetchall()]
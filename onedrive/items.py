@@ -0,0 +1,100 @@
+"""
+Compact driveItems for large listings. A DriveItem keeps only the commonly used properties in slots instead of
+the full json dict, parses its timestamps on first access and shares the parent path with its siblings:
+
+    for item in api.iter_items("/photos", header):  # only the fields of DriveItem are requested ($select)
+        print(item.path, item.size, item.modified)
+"""
+import datetime
+import sys
+
+# properties requested for DriveItems, see https://dev.onedrive.com/odata/optional-query-parameters.htm
+fields = 'id,name,size,eTag,cTag,createdDateTime,lastModifiedDateTime,parentReference,file,folder,root'
+
+
+def parse_timestamp(value):
+    """
+    :param value: ISO 8601 timestamp as sent by the service, e.g. 2016-03-21T20:01:37.343Z
+    :return: timezone aware datetime in UTC or None
+    """
+    if not value:
+        return None
+    value = value.rstrip('Z')
+    date, _, fraction = value.partition('.')
+    dt = datetime.datetime.strptime(date, '%Y-%m-%dT%H:%M:%S')
+    if fraction:
+        dt = dt.replace(microsecond=int(fraction[:6].ljust(6, '0')))
+    return dt.replace(tzinfo=datetime.timezone.utc)
+
+
+def _parent_path(reference):
+    """the path of the parent from a parentReference ('/drive/root:/a/b' -> '/a/b'), interned"""
+    path = reference.get('path')
+    if path is None:
+        return None
+    path = path.split(':', 1)[1] if ':' in path else ''
+    return sys.intern(path or '/')
+
+
+class DriveItem:
+    """
+    the properties of a driveItem (https://dev.onedrive.com/resources/item.htm) listed in `fields`
+    """
+    __slots__ = ('id', 'name', 'size', 'etag', 'ctag', 'parent_id', 'parent_path', 'child_count', 'sha1',
+                 'quick_xor', 'mime_type', '_created', '_modified', '_kind')
+
+    def __init__(self, meta):
+        """:param meta: the json of a driveItem (a dict)"""
+        self.id = meta.get('id')
+        self.name = meta.get('name')
+        self.size = meta.get('size')
+        self.etag = meta.get('eTag')
+        self.ctag = meta.get('cTag')
+        ref = meta.get('parentReference', {})
+        self.parent_id = ref.get('id')
+        self.parent_path = _parent_path(ref)
+        self._created = meta.get('createdDateTime')  # str until accessed
+        self._modified = meta.get('lastModifiedDateTime')
+        folder, file = meta.get('folder'), meta.get('file')
+        self.child_count = folder.get('childCount') if folder is not None else None
+        file = file or {}
+        hashes = file.get('hashes', {})
+        self.sha1 = hashes.get('sha1Hash')
+        self.quick_xor = hashes.get('quickXorHash')
+        self.mime_type = file.get('mimeType')
+        self._kind = 'root' if 'root' in meta else 'folder' if folder is not None else \
+            'file' if 'file' in meta else None
+
+    @property
+    def is_file(self):
+        return self._kind == 'file'
+
+    @property
+    def is_dir(self):
+        return self._kind in ('folder', 'root')
+
+    @property
+    def path(self):
+        """the full path or None if the parentReference had no path"""
+        if self._kind == 'root':
+            return '/'
+        if self.parent_path is None:
+            return None
+        return self.parent_path.rstrip('/') + '/' + self.name
+
+    @property
+    def created(self):
+        """createdDateTime as datetime"""
+        if isinstance(self._created, str):  # parsed once, on first access
+            self._created = parse_timestamp(self._created)
+        return self._created
+
+    @property
+    def modified(self):
+        """lastModifiedDateTime as datetime"""
+        if isinstance(self._modified, str):
+            self._modified = parse_timestamp(self._modified)
+        return self._modified
+
+    def __repr__(self):
+        return 'DriveItem({!r}, {!r})'.format(self.id, self.path or self.name)
@@ -0,0 +1,188 @@
+import heapq
+import itertools
+import os.path
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from onedrive import api
+from onedrive import json_io
+
+
+class JobFailed(IOError):
+    """a long running action failed, args[1] is the last AsyncOperationStatus"""
+
+
+_failed = ('failed', 'deleteFailed', 'cancelled')
+
+
+class _Job:
+    def __init__(self, location, name, auth, timeout):
+        self.status = api.AsyncOperationStatus(location, auth, refresh=False)
+        self.name = name
+        self.future = Future()
+        self.delay = None  # sec. until the next poll, adapted after each poll
+        self.deadline = None if timeout is None else time.monotonic() + timeout
+
+
+class JobTracker:
+    """
+    Waits for many long running actions (e.g. api.copy()) at once: https://dev.onedrive.com/misc/long-running-actions.htm
+    The monitor urls are polled by a small thread pool, each job with its own backoff: jobs which make no progress
+    are polled less often. Jobs whose monitor answers with an error (e.g. 404 once it expired) or which do not finish
+    within timeout fail. Outstanding urls are saved in state_file (at most every save_interval sec.), so a restarted
+    process can pick them up again.
+
+        tracker = JobTracker(header, state_file="jobs.json")
+        res = api.copy("/foo", "/bar", header)
+        future = tracker.add(res.headers['Location'], name="/bar")
+        future.result()  # the completed AsyncOperationStatus, raises JobFailed if the copy failed
+    """
+
+    def __init__(self, auth, state_file=None, workers=4, min_delay=api.AsyncOperationStatus.refresh_delay,
+                 max_delay=30.0, timeout=6 * 3600.0, save_interval=1.0):
+        """
+        :param auth: auth header
+        :param state_file: file to persist the outstanding jobs in or None. Jobs found there are resumed.
+        :param workers: number of monitor urls polled in parallel
+        :param min_delay: sec. between the first polls of a job
+        :param max_delay: max. sec. between two polls of a job without progress
+        :param timeout: sec. after which a job which is not done fails with JobFailed, None to wait forever
+        :param save_interval: min. sec. between two writes of the state file
+        """
+        self.auth = auth
+        self.state_file = state_file
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.save_interval = save_interval
+        self.dirty = False  # the jobs changed since the state file was written
+        self.saved = 0.0  # time of the last write
+        self.jobs = {}  # location -> _Job
+        self.queue = []  # heap of (due time, seq, _Job)
+        self.seq = itertools.count()
+        self.cond = threading.Condition()
+        self.closed = False
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.thread = threading.Thread(target=self._schedule, name='onedrive-jobs', daemon=True)
+        self.thread.start()
+
+        if state_file and os.path.isfile(state_file):
+            for job in json_io.load(state_file):
+                self.add(job['location'], name=job.get('name'))
+
+    def add(self, location, callback=None, name=None):
+        """
+        track a long running action
+        :param location: the Location header of the action
+        :param callback: called with the future when the job is done (or failed)
+        :param name: optional name (e.g. the target path), saved with the job
+        :return: a Future with the completed AsyncOperationStatus or JobFailed
+        """
+        with self.cond:
+            job = self.jobs.get(location)
+            if job is None:
+                job = _Job(location, name, self.auth, self.timeout)
+                self.jobs[location] = job
+                self._push(job, 0)
+                self._changed()
+        if callback is not None:
+            job.future.add_done_callback(callback)
+        return job.future
+
+    def outstanding(self):
+        """:return: list of the AsyncOperationStatus of all jobs which are not done yet"""
+        with self.cond:
+            return [j.status for j in self.jobs.values()]
+
+    def wait(self, timeout=None):
+        """
+        block until all jobs are done
+        :return: True if all are done, False on timeout or if the tracker was closed before
+        """
+        end = None if timeout is None else time.monotonic() + timeout
+        with self.cond:
+            while self.jobs:
+                remaining = None if end is None else end - time.monotonic()
+                if self.closed or (remaining is not None and remaining <= 0):
+                    return False
+                self.cond.wait(remaining)
+        return True
+
+    def close(self):
+        """stop polling. The futures of outstanding jobs are cancelled, the jobs stay in the state file"""
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        self.thread.join()
+        self.pool.shutdown()
+        with self.cond:
+            if self.dirty:
+                self._save()
+            pending = [j.future for j in self.jobs.values()]
+        for future in pending:
+            future.cancel()
+
+    def _push(self, job, delay):
+        heapq.heappush(self.queue, (time.monotonic() + delay, next(self.seq), job))
+        self.cond.notify_all()
+
+    def _changed(self):
+        """the state file is written by the scheduler thread, at most every save_interval sec."""
+        if self.state_file:
+            self.dirty = True
+            self.cond.notify_all()
+
+    def _save(self):
+        json_io.save([{'location': loc, 'name': j.name} for loc, j in self.jobs.items()], self.state_file)
+        self.dirty = False
+        self.saved = time.monotonic()
+
+    def _schedule(self):
+        with self.cond:
+            while not self.closed:
+                now = time.monotonic()
+                if self.dirty and now - self.saved >= self.save_interval:
+                    self._save()
+                waits = [self.saved + self.save_interval - now] if self.dirty else []
+                if self.queue:
+                    due = self.queue[0][0] - now
+                    if due <= 0:
+                        job = heapq.heappop(self.queue)[2]
+                        self.pool.submit(self._poll, job)
+                        continue
+                    waits.append(due)
+                self.cond.wait(min(waits) if waits else None)
+
+    def _poll(self, job):
+        s = job.status
+        before = s.percentageComplete
+        try:
+            s.refresh()
+            error = None
+        except (IOError, ValueError) as e:  # e.g. the monitor is gone or returned no json
+            error = e
+
+        done = error is not None or s.status == 'completed' or s.status in _failed or s.percentageComplete >= 100
+        if not done and job.deadline is not None and time.monotonic() >= job.deadline:
+            error = JobFailed("job {} did not finish within {} sec.".format(job.name or s.location, self.timeout), s)
+        elif not done:
+            if job.delay is None or s.percentageComplete > before:
+                job.delay = self.min_delay
+            else:
+                job.delay = min(self.max_delay, job.delay * 2)
+            with self.cond:
+                if not self.closed:
+                    self._push(job, job.delay)
+            return
+
+        with self.cond:
+            del self.jobs[s.location]
+            self._changed()
+            self.cond.notify_all()
+        if error is not None:
+            job.future.set_exception(error)
+        elif s.status in _failed:
+            job.future.set_exception(JobFailed("job {} failed".format(job.name or s.location), s))
+        else:
+            job.future.set_result(s)
@@ -1,11 +1,15 @@
 import json
+import os
 from os import path
 
 
 def save(tokens, file):
-    with open(file, 'w') as f:
+    # write to a temp. file first, so that an interrupted save does not leave a broken file behind
+    tmp = file + '.tmp'
+    with open(tmp, 'w') as f:
         json.dump(tokens, f)
     f.close()
+    os.replace(tmp, file)
 
 
 def load(file):
@@ -16,5 +20,3 @@ def load(file):
         tokens = json.load(f)
     f.close()
     return tokens
-
-
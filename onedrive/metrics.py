@@ -0,0 +1,378 @@
+"""
+Instrumentation of all api calls: requests, bytes, latencies, retries and throttling per operation.
+Disabled by default, then each request only pays a check of a module variable.
+
+    from onedrive import metrics
+    stats = metrics.enable(metrics.LoggingExporter(), interval=60)
+    api.mkdir("/a/b/c", header, parents=True)
+    stats.snapshot()['mkdir']['requests']  # requests mkdir needed
+    print(metrics.prometheus_text(stats))
+"""
+import bisect
+import functools
+import inspect
+import logging
+import os
+import threading
+import time
+
+# upper bounds in sec. of the latency histogram buckets, the last bucket is +Inf
+default_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_metrics = None
+_exporter_thread = None
+_local = threading.local()  # name of the operation running in this thread
+
+
+class Histogram:
+    """cumulative counts of observations per bucket, as in Prometheus"""
+
+    def __init__(self, buckets=default_buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def merge(self, other):
+        """add the observations of a histogram with the same buckets"""
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.sum += other.sum
+        self.count += other.count
+
+    def quantile(self, q):
+        """:return: upper bound of the bucket containing the q-quantile (inf if beyond the last bucket)"""
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for bound, n in zip(self.buckets + (float('inf'),), self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+    def snapshot(self):
+        return {'buckets': self.buckets, 'counts': list(self.counts), 'sum': self.sum, 'count': self.count}
+
+
+class OperationStats:
+    """counters of one operation (e.g. mkdir) including all requests it sent"""
+
+    def __init__(self, buckets=default_buckets):
+        self.calls = 0
+        self.errors = 0  # calls which raised
+        self.requests = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.retries = 0
+        self.throttled = 0  # 429/503 answers
+        self.status = {}  # status code -> number of responses
+        self.latency = Histogram(buckets)  # per call
+        self.request_latency = Histogram(buckets)  # per request
+
+    def snapshot(self):
+        return {'calls': self.calls, 'errors': self.errors, 'requests': self.requests,
+                'bytes_sent': self.bytes_sent, 'bytes_received': self.bytes_received,
+                'retries': self.retries, 'throttled': self.throttled, 'status': dict(self.status),
+                'latency': self.latency.snapshot(), 'request_latency': self.request_latency.snapshot()}
+
+
+class Metrics:
+    """
+    In-memory stats of all operations. Requests sent outside of a named operation are counted as 'request'.
+    """
+
+    def __init__(self, exporters=(), buckets=default_buckets):
+        """
+        :param exporters: callables getting this object on export(), e.g. LoggingExporter, PrometheusExporter
+        :param buckets: upper bounds in sec. of the latency histograms
+        """
+        self.exporters = list(exporters)
+        self.buckets = buckets
+        self.operations = {}  # name -> OperationStats
+        self.lock = threading.Lock()
+
+    def _stats(self, name):
+        stats = self.operations.get(name)
+        if stats is None:
+            stats = self.operations[name] = OperationStats(self.buckets)
+        return stats
+
+    def record_call(self, name, duration, failed=False):
+        with self.lock:
+            stats = self._stats(name)
+            stats.calls += 1
+            stats.errors += failed
+            stats.latency.observe(duration)
+
+    def record_request(self, status_code, duration, sent, received):
+        with self.lock:
+            stats = self._stats(current() or 'request')
+            stats.requests += 1
+            stats.bytes_sent += sent
+            stats.bytes_received += received
+            stats.status[status_code] = stats.status.get(status_code, 0) + 1
+            stats.request_latency.observe(duration)
+
+    def record_event(self, event):
+        """:param event: 'retries' or 'throttled'"""
+        with self.lock:
+            stats = self._stats(current() or 'request')
+            setattr(stats, event, getattr(stats, event) + 1)
+
+    def snapshot(self):
+        """:return: dict operation -> counters (see OperationStats.snapshot())"""
+        with self.lock:
+            return {name: s.snapshot() for name, s in self.operations.items()}
+
+    def reset(self):
+        with self.lock:
+            self.operations = {}
+
+    def export(self):
+        """pass the stats to all exporters"""
+        for exporter in self.exporters:
+            exporter(self)
+
+
+class _Operation:
+    """see operation()"""
+    __slots__ = ('name', 'timed', 'active', 'start')
+
+    def __init__(self, name, timed=True):
+        self.name = name
+        self.timed = timed
+        self.active = False
+
+    def __enter__(self):
+        if _metrics is not None and getattr(_local, 'name', None) is None:
+            self.active = True
+            _local.name = self.name
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.active:
+            self.active = False
+            _local.name = None
+            m = _metrics
+            if self.timed and m is not None:
+                m.record_call(self.name, time.perf_counter() - self.start, exc_type is not None)
+
+    def __call__(self, f):
+        name, timed = self.name, self.timed
+
+        if inspect.isgeneratorfunction(f):
+            @functools.wraps(f)
+            def generator(*args, **kwargs):
+                if _metrics is None:  # nothing to attribute, iterated without a wrapper
+                    return f(*args, **kwargs)
+                return _steps(name, timed, f(*args, **kwargs))
+            return generator
+
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            if _metrics is None:
+                return f(*args, **kwargs)
+            with _Operation(name, timed):
+                return f(*args, **kwargs)
+        return wrapper
+
+
+def _steps(name, timed, it):
+    """
+    iterate a generator, attributing the requests of each step to the operation name (unless it runs inside another
+    operation). It counts as one call, from its first step until it is exhausted or closed
+    """
+    top = getattr(_local, 'name', None) is None
+    start = time.perf_counter()
+    failed = False
+    try:
+        while True:
+            outer = getattr(_local, 'name', None)
+            if outer is None:
+                _local.name = name
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+            finally:
+                if outer is None:
+                    _local.name = None
+            yield item
+    except Exception:
+        failed = True
+        raise
+    finally:
+        m = _metrics
+        if top and timed and m is not None:
+            m.record_call(name, time.perf_counter() - start, failed)
+
+
+def operation(name, timed=True):
+    """
+    Decorator and context manager: requests sent in this thread are counted for the operation `name`.
+    Nested operations are counted for the outermost one, e.g. the get_metadata calls of mkdir count for mkdir.
+    :param name: name of the operation
+    :param timed: False to only attribute requests, without counting a call and its latency
+                  (e.g. for worker threads of an operation)
+    """
+    return _Operation(name, timed)
+
+
+def bind(f):
+    """
+    :return: f, counting its requests for the operation running in the calling thread.
+             For functions run by worker threads of an operation.
+    """
+    name = current()
+    if name is None:
+        return f
+
+    @functools.wraps(f)
+    def bound(*args, **kwargs):
+        with _Operation(name, timed=False):
+            return f(*args, **kwargs)
+    return bound
+
+
+def current():
+    """:return: name of the operation running in this thread or None"""
+    return getattr(_local, 'name', None)
+
+
+def get_metrics():
+    """:return: the Metrics being recorded or None if disabled"""
+    return _metrics
+
+
+def enable(*exporters, interval=None, buckets=default_buckets):
+    """
+    start recording
+    :param exporters: see Metrics
+    :param interval: export every `interval` sec. in a background thread, None: only on export() / disable()
+    :param buckets: upper bounds in sec. of the latency histograms
+    :return: the new Metrics
+    """
+    global _metrics, _exporter_thread
+    disable()
+    _metrics = Metrics(exporters, buckets)
+    if interval:
+        _exporter_thread = _ExporterThread(_metrics, interval)
+        _exporter_thread.start()
+    return _metrics
+
+
+def disable():
+    """stop recording, the exporters get the final stats"""
+    global _metrics, _exporter_thread
+    m, _metrics = _metrics, None
+    if _exporter_thread is not None:
+        _exporter_thread.stop()
+        _exporter_thread = None
+    if m is not None:
+        m.export()
+
+
+def export():
+    if _metrics is not None:
+        _metrics.export()
+
+
+def record_request(response, duration):
+    """called by session.request for each response"""
+    m = _metrics
+    if m is None:
+        return
+    body = getattr(response.request, 'body', None)
+    sent = len(body) if hasattr(body, '__len__') else 0  # streamed bodies without a length are not counted
+    if response._content_consumed and isinstance(response._content, bytes):
+        received = len(response._content)
+    else:  # streamed, do not read it here
+        received = int(response.headers.get('Content-Length', 0) or 0)
+    m.record_request(response.status_code, duration, sent, received)
+
+
+def record_event(event):
+    """:param event: 'retries' or 'throttled'"""
+    m = _metrics
+    if m is not None:
+        m.record_event(event)
+
+
+class _ExporterThread(threading.Thread):
+    def __init__(self, metrics, interval):
+        super().__init__(name='onedrive-metrics', daemon=True)
+        self.metrics = metrics
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.metrics.export()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+class LoggingExporter:
+    """logs one line per operation"""
+
+    def __init__(self, logger=None, level=logging.INFO):
+        self.logger = logger or logging.getLogger('onedrive.metrics')
+        self.level = level
+
+    def __call__(self, metrics):
+        with metrics.lock:
+            operations = sorted(metrics.operations.items())
+            for name, s in operations:
+                self.logger.log(self.level, "%s: calls=%d errors=%d requests=%d sent=%d received=%d retries=%d "
+                                            "throttled=%d avg=%.3fs p95<=%ss", name, s.calls, s.errors, s.requests,
+                                s.bytes_sent, s.bytes_received, s.retries, s.throttled,
+                                s.latency.sum / s.latency.count if s.latency.count else 0.0,
+                                s.latency.quantile(0.95))
+
+
+def prometheus_text(metrics, prefix='onedrive'):
+    """:return: the stats in the Prometheus text exposition format"""
+    counters = ('calls', 'errors', 'requests', 'bytes_sent', 'bytes_received', 'retries', 'throttled')
+    snapshot = metrics.snapshot()
+    lines = []
+    for counter in counters:
+        lines.append('# TYPE {}_{}_total counter'.format(prefix, counter))
+        for name, s in sorted(snapshot.items()):
+            lines.append('{}_{}_total{{operation="{}"}} {}'.format(prefix, counter, name, s[counter]))
+    lines.append('# TYPE {}_responses_total counter'.format(prefix))
+    for name, s in sorted(snapshot.items()):
+        for code, n in sorted(s['status'].items()):
+            lines.append('{}_responses_total{{operation="{}",code="{}"}} {}'.format(prefix, name, code, n))
+    for histogram in ('latency', 'request_latency'):
+        metric = '{}_{}_seconds'.format(prefix, histogram)
+        lines.append('# TYPE {} histogram'.format(metric))
+        for name, s in sorted(snapshot.items()):
+            h, cumulative = s[histogram], 0
+            for bound, n in zip(h['buckets'] + (float('inf'),), h['counts']):
+                cumulative += n
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append('{}_bucket{{operation="{}",le="{}"}} {}'.format(metric, name, le, cumulative))
+            lines.append('{}_sum{{operation="{}"}} {}'.format(metric, name, h['sum']))
+            lines.append('{}_count{{operation="{}"}} {}'.format(metric, name, h['count']))
+    return '\n'.join(lines) + '\n'
+
+
+class PrometheusExporter:
+    """writes prometheus_text() atomically to a file, e.g. for the textfile collector of the node exporter"""
+
+    def __init__(self, file, prefix='onedrive'):
+        self.file = file
+        self.prefix = prefix
+
+    def __call__(self, metrics):
+        with open(self.file + '.tmp', 'w') as f:
+            f.write(prometheus_text(metrics, self.prefix))
+        os.replace(self.file + '.tmp', self.file)
@@ -0,0 +1,481 @@
+"""
+Two-way synchronisation of a local directory with a folder of the drive:
+
+    m = mirror.Mirror("./photos", "/photos", header)
+    for action in m.plan():  # what sync() would do
+        print(action)
+    print(m.sync())  # 3 done, 0 failed, 0 conflicts
+
+The state after the last sync (size, mtime and hashes of each file, id and eTag of the remote item) is kept in a
+journal. A file changed on one side only is transferred in that direction, a file deleted on one side is deleted
+on the other, a file moved on one side is moved on the other instead of being transferred again.
+Files changed on both sides are conflicts, resolved with the conflictBehavior of the service (see Mirror).
+The journal belongs to one remote folder: a sync with another (or a deleted and recreated) folder is refused, as is
+a sync whose remote folder disappeared, instead of taking all files as deleted remotely.
+Only files are synchronised: folders are created as needed but empty folders are neither created nor deleted.
+"""
+import os
+import os.path
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from onedrive import api
+from onedrive import batch
+from onedrive import download
+from onedrive import hashes
+from onedrive import items
+from onedrive import json_io
+from onedrive import metrics
+from onedrive import transfer
+
+journal_name = '.onedrive-mirror.json'  # default journal, in the local directory
+_part = ('.onedrive-', '.part')  # prefix and suffix of the temporary files of downloads, next to their target
+
+
+class Action:
+    """
+    one step of a plan. kind is one of
+    upload, download, delete_local, delete_remote, move_local, move_remote (path -> target),
+    conflict (changed on both sides), record (same content on both sides), forget (gone on both sides)
+    """
+    __slots__ = ('kind', 'path', 'target', 'item')
+
+    def __init__(self, kind, path, target=None, item=None):
+        self.kind = kind
+        self.path = path  # relative to both roots, separated by /
+        self.target = target
+        self.item = item  # the remote items.DriveItem if there is one
+
+    def __eq__(self, other):
+        return isinstance(other, Action) and (self.kind, self.path, self.target) == \
+            (other.kind, other.path, other.target)
+
+    def __repr__(self):
+        if self.target is not None:
+            return '{} {} -> {}'.format(self.kind, self.path, self.target)
+        return '{} {}'.format(self.kind, self.path)
+
+
+class Summary:
+    """the outcome of Mirror.sync()"""
+
+    def __init__(self):
+        self.done = []  # Actions
+        self.failed = []  # (Action, Result or exception)
+        self.conflicts = []  # paths left alone (conflict='fail')
+
+    def __str__(self):
+        return "{} done, {} failed, {} conflicts".format(len(self.done), len(self.failed), len(self.conflicts))
+
+
+class Journal:
+    """
+    relative path -> state of the file after its last sync, persisted in a json file together with
+    the remote folder (path and id) it was written for
+    """
+
+    def __init__(self, file):
+        self.file = file
+        data = json_io.load(file) if os.path.isfile(file) else {}
+        self.root = data.get('root')  # {'path': ..., 'id': ...} or None
+        self.entries = data.get('entries', {})
+        self.lock = threading.Lock()
+
+    def get(self, path):
+        with self.lock:
+            return self.entries.get(path)
+
+    def put(self, path, entry):
+        with self.lock:
+            self.entries[path] = entry
+
+    def remove(self, path):
+        with self.lock:
+            self.entries.pop(path, None)
+
+    def save(self):
+        with self.lock:
+            json_io.save({'root': self.root, 'entries': self.entries}, self.file)
+
+
+def _same_hashes(a, b):
+    """compare the sha1 if both have one, else the quickXorHash"""
+    if a.get('sha1') and b.get('sha1'):
+        return a['sha1'].upper() == b['sha1'].upper()
+    if a.get('quickXor') and b.get('quickXor'):
+        return a['quickXor'] == b['quickXor']
+    return False
+
+
+def _remote_hashes(item):
+    return {'sha1': item.sha1, 'quickXor': item.quick_xor}
+
+
+class Mirror:
+    """
+    Keeps a local directory and a remote folder in sync, see the module doc.
+    Conflicts (changed on both sides) are resolved with conflict:
+    rename: keep both, the local version is uploaded under a new name chosen by the service, the remote one
+    is downloaded. replace: the local version wins. fail: nothing is done, the path is reported in the Summary.
+    """
+
+    def __init__(self, local, remote, auth, journal=None, conflict='rename', workers=8, hash_cache=None,
+                 max_deletes=100):
+        """
+        :param local: local directory
+        :param remote: remote folder
+        :param auth: auth header
+        :param journal: journal file, default: journal_name in the local directory
+        :param conflict: rename, replace or fail
+        :param workers: number of parallel transfers
+        :param hash_cache: optional hashes.HashCache for the local hashes
+        :param max_deletes: sync() refuses plans deleting more files (local and remote), None for no limit
+        """
+        if conflict not in ('rename', 'replace', 'fail'):
+            raise ValueError("conflict must be rename, replace or fail")
+        self.local = local
+        self.remote = '/' + remote.strip('/')
+        self.auth = auth
+        self.journal = Journal(journal or os.path.join(local, journal_name))
+        self.conflict = conflict
+        self.workers = workers
+        self.hash_cache = hash_cache if hash_cache is not None else hashes.HashCache()
+        self.max_deletes = max_deletes
+        self.root_id = None  # of the remote folder, see _check_root()
+
+    def _local_path(self, path):
+        return os.path.join(self.local, *path.split('/'))
+
+    def _remote_path(self, path):
+        return api._join(self.remote, path)
+
+    def _scan(self, synced):
+        """
+        :param synced: True if the journal has entries
+        :return: relative path -> (size, mtime_ns) of the local files
+        :raise IOError: if the local directory is missing although files were synced
+        """
+        if synced and not os.path.isdir(self.local):
+            raise IOError("{} does not exist, but files were synced with it".format(self.local))
+        files = {}
+        journal = os.path.abspath(self.journal.file)
+        own = {journal, journal + '.tmp'}  # the journal and its temporary file, see json_io.save()
+        for root, _, names in os.walk(self.local):
+            rel = os.path.relpath(root, self.local).replace(os.sep, '/')
+            for name in names:
+                f = os.path.join(root, name)
+                if os.path.abspath(f) in own or (name.startswith(_part[0]) and name.endswith(_part[1])):
+                    continue  # also downloads left over from an interrupted sync
+                st = os.stat(f)
+                files[name if rel == '.' else rel + '/' + name] = (st.st_size, st.st_mtime_ns)
+        return files
+
+    def _root(self):
+        """
+        :return: the id of the remote folder, None if it does not exist
+        :raise IOError: if its metadata cannot be read
+        """
+        res = api.get_metadata(self.remote, self.auth, select='id')
+        if res.status_code == 404:
+            return None
+        if res.status_code != 200:
+            raise IOError("reading {} failed with {}".format(self.remote, res.status_code), res)
+        return res.json_body().get('id')
+
+    def _check_root(self, synced):
+        """
+        make sure the journal was written for the remote folder
+        :param synced: True if the journal has entries
+        :return: the id of the remote folder, None if it does not exist (yet)
+        :raise ValueError: if the journal belongs to another folder
+        :raise IOError: if the remote folder is missing although files were synced with it
+        """
+        root_id = self._root()
+        known = self.journal.root
+        if synced and known is not None and (known['path'].lower() != self.remote.lower() or
+                                             (root_id is not None and known.get('id') not in (None, root_id))):
+            raise ValueError("the journal {} was written for {} ({}), not for {} ({})".format(
+                self.journal.file, known['path'], known.get('id'), self.remote, root_id))
+        if synced and root_id is None:
+            raise IOError("{} does not exist, but files were synced with it".format(self.remote))
+        self.root_id = root_id
+        return root_id
+
+    def _list(self, root_id):
+        """
+        :param root_id: see _check_root()
+        :return: relative path -> DriveItem of the remote files, empty if the remote folder does not exist
+        :raise IOError: if a folder cannot be listed. Syncing an incomplete listing would delete local files
+        """
+        if root_id is None:
+            return {}
+        errors = []
+        files = {}
+        for p, _, fs in api.walk(self.remote, self.auth, workers=self.workers, onerror=errors.append, compact=True):
+            rel = p[len(self.remote.rstrip('/')):].strip('/')
+            files.update(((rel + '/' if rel else '') + f.name, f) for f in fs)
+        if errors:
+            raise errors[0]
+        return files
+
+    def _hashes(self, path):
+        h = hashes.hash_file(self._local_path(path), self.hash_cache)
+        return {'sha1': h['sha1Hash'], 'quickXor': h['quickXorHash']}
+
+    def _local_changed(self, path, stat, entry):
+        if entry is None:
+            return True
+        if stat == (entry['size'], entry['mtime']):
+            return False
+        return stat[0] != entry['size'] or not _same_hashes(self._hashes(path), entry)
+
+    @staticmethod
+    def _remote_changed(item, entry):
+        if entry is None:
+            return True
+        if item.etag == entry.get('eTag'):
+            return False
+        return item.size != entry['size'] or not _same_hashes(_remote_hashes(item), entry)
+
+    def _same_content(self, path, stat, item):
+        return stat[0] == item.size and _same_hashes(self._hashes(path), _remote_hashes(item))
+
+    def plan(self):
+        """
+        compare both sides with the journal
+        :return: list of Actions, moves first
+        :raise IOError: if the remote folder cannot be listed completely or one of the folders is missing
+        although files were synced with it
+        :raise ValueError: if the journal belongs to another remote folder
+        """
+        with self.journal.lock:
+            journal = dict(self.journal.entries)
+        local, remote = self._scan(bool(journal)), self._list(self._check_root(bool(journal)))
+        moves, actions = [], []
+        new_local, new_remote, gone_local, gone_remote = [], [], [], []
+        for p in sorted(set(local) | set(remote) | set(journal)):
+            stat, item, entry = local.get(p), remote.get(p), journal.get(p)
+            if stat is not None and item is not None:
+                local_changed = self._local_changed(p, stat, entry)
+                remote_changed = self._remote_changed(item, entry)
+                if entry is None or (local_changed and remote_changed):
+                    same = self._same_content(p, stat, item)
+                    actions.append(Action('record' if same else 'conflict', p, item=item))
+                elif local_changed:
+                    actions.append(Action('upload', p, item=item))
+                elif remote_changed:
+                    actions.append(Action('download', p, item=item))
+                elif stat != (entry['size'], entry['mtime']) or item.etag != entry.get('eTag'):
+                    actions.append(Action('record', p, item=item))  # touched or renamed, the content is the same
+            elif stat is not None:  # not on the drive
+                if entry is None:
+                    new_local.append(p)
+                elif self._local_changed(p, stat, entry):
+                    actions.append(Action('upload', p))
+                else:
+                    gone_remote.append(p)
+            elif item is not None:  # not local
+                if entry is None:
+                    new_remote.append(p)
+                elif self._remote_changed(item, entry):
+                    actions.append(Action('download', p, item=item))
+                else:
+                    gone_local.append(p)
+            else:
+                actions.append(Action('forget', p))
+
+        # moved on the drive: the item keeps its id
+        by_id = {journal[p].get('id'): p for p in gone_remote if journal[p].get('id')}
+        for p in list(new_remote):
+            source = by_id.pop(remote[p].id, None)
+            if source is not None:
+                moves.append(Action('move_local', source, p, item=remote[p]))
+                new_remote.remove(p)
+                gone_remote.remove(source)
+
+        # moved locally: a new file with the content of a vanished one, only new files of a matching size are hashed
+        by_size = {}
+        for p in gone_local:
+            by_size.setdefault(journal[p]['size'], []).append(p)
+        for p in list(new_local):
+            candidates = by_size.get(local[p][0])
+            if not candidates:
+                continue
+            h = self._hashes(p)
+            source = next((c for c in candidates if _same_hashes(h, journal[c])), None)
+            if source is not None:
+                candidates.remove(source)
+                moves.append(Action('move_remote', source, p, item=remote[source]))
+                new_local.remove(p)
+                gone_local.remove(source)
+
+        actions += [Action('upload', p) for p in new_local]
+        actions += [Action('download', p, item=remote[p]) for p in new_remote]
+        actions += [Action('delete_remote', p, item=remote[p]) for p in gone_local]
+        actions += [Action('delete_local', p) for p in gone_remote]
+        return moves + sorted(actions, key=lambda a: a.path)
+
+    def _record(self, path, item, local_hashes=None):
+        """remember the state of a file which is the same on both sides now"""
+        st = os.stat(self._local_path(path))
+        entry = {'size': st.st_size, 'mtime': st.st_mtime_ns, 'id': item.id, 'eTag': item.etag}
+        h = _remote_hashes(item)
+        if not (h['sha1'] or h['quickXor']):
+            h = local_hashes or self._hashes(path)
+        entry.update(h)
+        self.journal.put(path, entry)
+
+    def _upload(self, path, conflict='replace'):
+        res = transfer.put_file(self._local_path(path), self._remote_path(path), self.auth, conflict,
+                                skip_unchanged=False, hash_cache=self.hash_cache)
+        if res.status_code not in (200, 201):
+            raise IOError("uploading {} failed with {}".format(path, res.status_code), res)
+        return items.DriveItem(res.json_body())
+
+    def _download(self, path, item):
+        dst = self._local_path(path)
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=_part[0], suffix=_part[1], dir=os.path.dirname(dst))
+        os.close(fd)
+        try:
+            res = download.download_to(self._remote_path(path), tmp, self.auth)
+            if res.status_code not in (200, 206):
+                raise IOError("downloading {} failed with {}".format(path, res.status_code), res)
+            os.replace(tmp, dst)  # the local file is replaced at once, never left half written
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        self._record(path, item)
+
+    def _move_remote(self, action):
+        src, dst = self._remote_path(action.path), self._remote_path(action.target)
+        parent, name = os.path.split(dst)
+        res = None
+        if parent != os.path.dirname(src):
+            res = api.move(src, parent, self.auth)
+            if res.status_code != 200:
+                raise IOError("moving {} failed with {}".format(action.path, res.status_code), res)
+            src = api._join(parent, os.path.basename(src))
+        if name != os.path.basename(src):
+            res = api.rename(src, name, self.auth)
+            if res.status_code != 200:
+                raise IOError("renaming {} failed with {}".format(action.path, res.status_code), res)
+        self.journal.remove(action.path)
+        self._record(action.target, items.DriveItem(res.json_body()))
+
+    def _move_local(self, action):
+        dst = self._local_path(action.target)
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        os.replace(self._local_path(action.path), dst)
+        self.journal.remove(action.path)
+        self._record(action.target, action.item)
+
+    def _resolve(self, action, summary):
+        """a conflict, see Mirror"""
+        if self.conflict == 'fail':
+            summary.conflicts.append(action.path)
+            return False
+        if self.conflict == 'replace':
+            self._record(action.path, self._upload(action.path))
+            return True
+        local_hashes = self._hashes(action.path)
+        item = self._upload(action.path, conflict='rename')  # stored by the service under a new name
+        parent = os.path.dirname(action.path)
+        copy = parent + '/' + item.name if parent else item.name
+        shutil.copy2(self._local_path(action.path), self._local_path(copy))
+        self._record(copy, item, local_hashes)
+        self._download(action.path, action.item)
+        return True
+
+    def _run(self, action, summary):
+        """:return: True if the action was done"""
+        kind, path = action.kind, action.path
+        if kind == 'upload':
+            self._record(path, self._upload(path))
+        elif kind == 'download':
+            self._download(path, action.item)
+        elif kind == 'delete_local':
+            os.remove(self._local_path(path))
+            self.journal.remove(path)
+        elif kind == 'move_local':
+            self._move_local(action)
+        elif kind == 'move_remote':
+            self._move_remote(action)
+        elif kind == 'record':
+            self._record(path, action.item)
+        elif kind == 'forget':
+            self.journal.remove(path)
+        elif kind == 'conflict':
+            return self._resolve(action, summary)
+        return True
+
+    def _delete_remote(self, actions, summary):
+        b = batch.Batch(self.auth)
+        for a in actions:
+            b.delete(self._remote_path(a.path))
+        for a, res in zip(actions, b.execute()):
+            if res.status_code in (204, 404):
+                self.journal.remove(a.path)
+                summary.done.append(a)
+            else:
+                summary.failed.append((a, res))
+
+    @metrics.operation('mirror')
+    def sync(self, actions=None):
+        """
+        Execute a plan: moves first, then transfers and deletes, `workers` at a time. The journal is saved at
+        the end, also if some actions failed (they are planned again in the next sync).
+        :param actions: the result of plan(), default: a new plan
+        :return: Summary
+        :raise ValueError: if the journal belongs to another remote folder or the plan deletes more than
+        max_deletes files, nothing is done then
+        """
+        if actions is None:
+            actions = self.plan()
+        else:
+            with self.journal.lock:
+                synced = bool(self.journal.entries)
+            self._check_root(synced)
+        deleting = sum(a.kind in ('delete_local', 'delete_remote') for a in actions)
+        if self.max_deletes is not None and deleting > self.max_deletes:
+            raise ValueError("the plan deletes {} files, more than max_deletes={}".format(deleting, self.max_deletes))
+        summary = Summary()
+        remote_dirs = {os.path.dirname(self._remote_path(a.target if a.kind == 'move_remote' else a.path))
+                       for a in actions if a.kind in ('upload', 'move_remote', 'conflict')}
+        lock = threading.Lock()
+
+        def run(action):
+            try:
+                done = self._run(action, summary)
+            except (IOError, OSError, ValueError) as e:
+                with lock:
+                    summary.failed.append((action, e))
+                return
+            if done:
+                with lock:
+                    summary.done.append(action)
+
+        run = metrics.bind(run)
+        try:
+            if remote_dirs:
+                api.makedirs(remote_dirs, self.auth, self.workers)
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                moves = [a for a in actions if a.kind in ('move_local', 'move_remote')]
+                list(pool.map(run, moves))  # before anything is written to their targets
+                list(pool.map(run, [a for a in actions if a.kind not in ('move_local', 'move_remote',
+                                                                            'delete_remote')]))
+            deletes = [a for a in actions if a.kind == 'delete_remote']
+            if deletes:  # in batches
+                self._delete_remote(deletes, summary)
+        finally:
+            if self.root_id is None and remote_dirs:  # created by this sync
+                try:
+                    self.root_id = self._root()
+                except IOError:
+                    pass
+            self.journal.root = {'path': self.remote, 'id': self.root_id}
+            self.journal.save()
+            self.hash_cache.save()
+        return summary
@@ -0,0 +1,222 @@
+"""
+Copy or move many items at once, e.g. to reorganise a large archive:
+
+    summary = relocate.relocate([("/inbox/2016", "/archive/2016"), ("/inbox/a.txt", "/archive/2016/a.txt")],
+                                header, mode='move')
+    print(summary)  # 2 done, 0 failed, 0 skipped
+"""
+import itertools
+import json
+import os.path
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from onedrive import api
+from onedrive import cache
+from onedrive import jobs
+from onedrive import metrics
+from onedrive import session
+
+
+class Summary:
+    """the outcome of relocate()"""
+
+    def __init__(self):
+        self.done = []  # (src, dst)
+        self.failed = []  # ((src, dst), Result or exception)
+        self.skipped = []  # ((src, dst), the failed pair it depends on)
+
+    def __str__(self):
+        return "{} done, {} failed, {} skipped".format(len(self.done), len(self.failed), len(self.skipped))
+
+
+class _Op:
+    def __init__(self, src, dst):
+        self.src = src
+        self.dst = dst
+        self.waits_for = set()  # _Ops which have to be done before this one
+        self.blocks = []  # _Ops waiting for this one
+
+    @property
+    def pair(self):
+        return self.src, self.dst
+
+
+def _norm(path):
+    return '/' + path.strip('/')
+
+
+def _ancestors(path):
+    """path, its parent, ... up to /"""
+    while True:
+        yield path
+        if path == '/':
+            return
+        path = os.path.dirname(path)
+
+
+def plan(pairs, mode='move'):
+    """
+    order the operations: a destination below the destination of another pair waits for that one,
+    with mode move a source waits for the pairs moving items out of it.
+    :param pairs: (src, dst) full paths
+    :param mode: move or copy
+    :return: list of _Ops with their dependencies
+    :raise ValueError: if the pairs depend on each other in a cycle
+    """
+    ops = [_Op(_norm(src), _norm(dst)) for src, dst in pairs]
+    by_src, by_dst = {}, {}
+    for op in ops:
+        by_src.setdefault(op.src, []).append(op)
+        by_dst.setdefault(op.dst, []).append(op)
+    for op in ops:
+        for folder in _ancestors(os.path.dirname(op.dst)):  # target folder comes with the other item
+            op.waits_for.update(other for other in by_dst.get(folder, ()) if other is not op)
+        if mode == 'move':  # move children out first
+            for folder in itertools.islice(_ancestors(op.src), 1, None):
+                for other in by_src.get(folder, ()):
+                    if other is not op:
+                        other.waits_for.add(op)
+    for op in ops:
+        for other in op.waits_for:
+            other.blocks.append(op)
+
+    # detect cycles (Kahn)
+    remaining = {op: len(op.waits_for) for op in ops}
+    ready = [op for op, n in remaining.items() if n == 0]
+    seen = 0
+    while ready:
+        op = ready.pop()
+        seen += 1
+        for other in op.blocks:
+            remaining[other] -= 1
+            if remaining[other] == 0:
+                ready.append(other)
+    if seen != len(ops):
+        raise ValueError("the pairs depend on each other in a cycle")
+    return ops
+
+
+def _body(parent_id, name, conflict):
+    body = {"parentReference": {"id": parent_id} if parent_id else {"path": "/drive/root"}, "name": name}
+    if conflict:
+        body["@name.conflictBehavior"] = conflict
+    return json.dumps(body)
+
+
+def _move(op, parent_id, auth, conflict):
+    res = api.Result(session.request('patch', api.base_url + '/drive/root:' + op.src, auth,
+                                     headers={'Content-Type': 'application/json'},
+                                     data=_body(parent_id, os.path.basename(op.dst), conflict)))
+    cache.invalidate(op.src, op.dst, auth=auth)
+    return res
+
+
+def _copy(op, parent_id, auth, conflict):
+    res = api.Result(session.request('post', api.base_url + '/drive/root:' + op.src + ':/action.copy', auth,
+                                     headers={'Content-Type': 'application/json', 'Prefer': 'respond-async'},
+                                     data=_body(parent_id, os.path.basename(op.dst), conflict)))
+    cache.invalidate(op.dst, auth=auth)
+    return res
+
+
+@metrics.operation('relocate')
+def relocate(pairs, auth, mode='move', workers=8, conflict=None, tracker=None):
+    """
+    Copy or move many items on the server. The target folders are resolved (and created) once, up front.
+    Pairs whose target folder is the destination of another pair run after that one, the others run concurrently
+    (all requests are rate limited, see throttle.configure()). Copies are tracked until their jobs completed.
+    :param pairs: list of (src, dst), dst is the full new path of the item
+    :param auth: auth header
+    :param mode: move or copy
+    :param workers: number of concurrent requests
+    :param conflict: None (service default), fail, replace or rename
+    :param tracker: optional jobs.JobTracker for the copy jobs, default: a new one
+    :return: Summary of the done, failed and skipped pairs
+    :raise ValueError: if mode is unknown or the pairs depend on each other in a cycle
+    """
+    if mode not in ('move', 'copy'):
+        raise ValueError("mode must be move or copy")
+    ops = plan(pairs, mode)
+    summary = Summary()
+    if not ops:
+        return summary
+
+    # target folders which are not the result of another pair exist before anything is sent
+    dsts = {op.dst for op in ops}
+    parents = {os.path.dirname(op.dst) for op in ops
+               if not any(folder in dsts for folder in _ancestors(os.path.dirname(op.dst)))}
+    ids = api.makedirs(parents, auth, workers) if parents else {}
+    lock = threading.Lock()
+
+    def parent_id(op):
+        parent = os.path.dirname(op.dst)
+        with lock:
+            if parent in ids:
+                return ids[parent]
+        found = api.makedirs([parent], auth, workers=1)  # below the result of another pair
+        with lock:
+            ids.update(found)
+        return found[parent]
+
+    own_tracker = tracker is None and mode == 'copy'
+    if own_tracker:
+        tracker = jobs.JobTracker(auth, workers=max(1, workers // 2))
+
+    def run(op):
+        pid = parent_id(op)
+        if mode == 'move':
+            res = _move(op, pid, auth, conflict)
+            if res.status_code != 200:
+                raise IOError("moving {} failed with {}".format(op.src, res.status_code), res)
+            return None
+        res = _copy(op, pid, auth, conflict)
+        if res.status_code != 202:
+            raise IOError("copying {} failed with {}".format(op.src, res.status_code), res)
+        return tracker.add(res.headers['Location'], name=op.dst)
+
+    run = metrics.bind(run)
+    waiting = {op: len(op.waits_for) for op in ops}
+    ready = [op for op in ops if not op.waits_for]
+    running = {}  # future -> _Op
+
+    def finish(op, error):
+        if error is None:
+            summary.done.append(op.pair)
+            for other in op.blocks:
+                if other not in waiting:  # skipped, another of its dependencies failed
+                    continue
+                waiting[other] -= 1
+                if waiting[other] == 0:
+                    ready.append(other)
+            return
+        summary.failed.append((op.pair, error))
+        skip = list(op.blocks)
+        while skip:
+            other = skip.pop()
+            if waiting.pop(other, None) is not None:
+                summary.skipped.append((other.pair, op.pair))
+                skip.extend(other.blocks)
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            while ready or running:
+                while ready:
+                    op = ready.pop()
+                    running[pool.submit(run, op)] = op
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    op = running.pop(future)
+                    try:
+                        result = future.result()
+                    except (IOError, ValueError, KeyError) as e:
+                        finish(op, e)
+                        continue
+                    if isinstance(result, Future):  # the copy job, done when the job is
+                        running[result] = op
+                    else:
+                        finish(op, None)
+    finally:
+        if own_tracker:
+            tracker.close()
+    return summary
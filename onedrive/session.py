@@ -0,0 +1,97 @@
+import time
+
+from onedrive import metrics
+from onedrive import throttle
+from onedrive import transport as transports
+
+_transport = None
+_timeout = None
+
+
+def configure(pool_connections=10, pool_maxsize=10, timeout=None, keep_alive=True, transport=None):
+    """
+    (Re)create the default transport which is shared by all api calls (except those of a client.Client
+    with its own transport). Connections are pooled and kept alive, so consecutive calls do not pay
+    TCP+TLS handshakes again.
+    :param pool_connections: number of hosts to keep connection pools for
+    :param pool_maxsize: max. number of connections kept per host (set to the number of worker threads)
+    :param timeout: default timeout in sec. for each request, either a float or a (connect, read) tuple. None = wait forever
+    :param keep_alive: False closes the connection after each request
+    :param transport: use this transport (see onedrive.transport) instead of requests, the pool settings are ignored
+    :return: the new requests session, or the given transport
+    """
+    global _transport, _timeout
+    if _transport is not None:
+        _transport.close()
+
+    _transport = transport or transports.RequestsTransport(pool_connections, pool_maxsize, keep_alive)
+    _timeout = timeout
+    return _transport if transport else _transport.session
+
+
+def get_transport():
+    """
+    :return: the default transport. It is created with default settings on first use.
+    """
+    if _transport is None:
+        configure()
+    return _transport
+
+
+def get_session():
+    """
+    :return: the requests session of the default transport (a transport.RequestsTransport)
+    """
+    return get_transport().session
+
+
+def close():
+    """close all pooled connections. The next request creates a new transport"""
+    global _transport
+    if _transport is not None:
+        _transport.close()
+        _transport = None
+
+
+def anonymous(auth):
+    """:return: the auth for pre-authenticated urls: no header, but the transport of a client.Client"""
+    return auth.anonymous() if hasattr(auth, 'anonymous') else None
+
+
+def request(method, url, auth, headers=None, **kwargs):
+    """
+    Send a request through the transport of the client (or the default transport).
+    Throttled and failed requests are retried, see throttle.configure().
+    :param method: get, post, put, patch, delete
+    :param url: absolute url
+    :param auth: auth header, auth.TokenProvider or client.Client. With a provider, a 401 refreshes the token and
+                 is retried once. A client sends the request through its transport and rate limiter to its base url
+    :param headers: additional headers for this request
+    :param kwargs: passed on to the transport (data, stream, allow_redirects, timeout, ...)
+    :return: the requests response
+    """
+    h = dict(auth) if auth else {}
+    if headers:
+        h.update(headers)
+    t = getattr(auth, 'transport', None) or get_transport()
+    if hasattr(auth, 'route'):
+        url = auth.route(url)
+    kwargs.setdefault('timeout', _timeout)
+    limiter = getattr(auth, 'limiter', None)  # None: the shared one
+    res = throttle.call(lambda: _send(t, method, url, h, kwargs), method, kwargs.get('data'), limiter)
+
+    refresh = getattr(auth, 'refresh', None)
+    if res.status_code == 401 and refresh is not None:  # the token expired: refresh (see auth.TokenProvider)
+        refresh(h.get('Authorization'))
+        h.update(auth)
+        res = throttle.call(lambda: _send(t, method, url, h, kwargs), method, kwargs.get('data'), limiter)
+    return res
+
+
+def _send(transport, method, url, headers, kwargs):
+    if metrics.get_metrics() is None:
+        return transport.request(method, url, headers=headers, **kwargs)
+    start = time.perf_counter()
+    res = transport.request(method, url, headers=headers, **kwargs)
+    metrics.record_request(res, time.perf_counter() - start)
+    return res
@@ -0,0 +1,155 @@
+"""
+Request bodies which are streamed instead of being held in memory. Files are read with mmap (large files) or
+readinto() into one reused buffer, memory is sent as memoryview slices, so no intermediate copies are made.
+"""
+import io
+import mmap
+import os
+import stat
+
+buffer_size = 1024 * 1024
+mmap_threshold = 64 * 1024 * 1024  # files above this size are mapped instead of read
+
+
+class Body:
+    """
+    A request body with a known length, sent in chunks (requests sets the Content-Length from len()).
+    Iterating again starts over, so replayable bodies can be sent again on a retry.
+    """
+
+    def __init__(self, chunks, size, progress=None, replayable=True):
+        """
+        :param chunks: function returning a new iterator over the chunks
+        :param size: number of bytes the chunks add up to
+        :param progress: optional callback, called with (bytes sent, size) after each chunk
+        :param replayable: False if the chunks can only be iterated once
+        """
+        self.chunks = chunks
+        self.size = size
+        self.progress = progress
+        self.replayable = replayable
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        sent = 0
+        for chunk in self.chunks():
+            yield chunk
+            sent += len(chunk)
+            if self.progress is not None:
+                self.progress(sent, self.size)
+
+
+def _memory_chunks(data, chunk_size):
+    view = memoryview(data).cast('B')
+    for start in range(0, len(view), chunk_size):
+        yield view[start:start + chunk_size]
+
+
+def _file_chunks(f, offset, size, chunk_size):
+    """read size bytes from offset of a binary file: mapped if large, else into one buffer"""
+    fileno = _fileno(f)
+    if fileno is not None and size > mmap_threshold:
+        with mmap.mmap(fileno, 0, access=mmap.ACCESS_READ) as m:
+            view = memoryview(m)
+            try:
+                for start in range(offset, offset + size, chunk_size):
+                    chunk = view[start:min(start + chunk_size, offset + size)]
+                    yield chunk
+                    chunk.release()
+            finally:
+                view.release()
+        return
+
+    f.seek(offset)
+    buf = bytearray(min(chunk_size, size) or 1)
+    view = memoryview(buf)
+    remaining = size
+    while remaining > 0:
+        n = f.readinto(view[:min(len(buf), remaining)])
+        if not n:
+            raise IOError("file is shorter than expected")
+        remaining -= n
+        yield view[:n]  # sent before the buffer is filled again
+
+
+def _stream_chunks(f, size, chunk_size):
+    """read a file which cannot seek (pipe, socket, stdin) once, in order, up to size bytes if given"""
+    buf = bytearray(chunk_size)
+    view = memoryview(buf)
+    remaining = size
+    while remaining is None or remaining > 0:
+        n = f.readinto(view if remaining is None else view[:min(chunk_size, remaining)])
+        if not n:
+            if remaining:
+                raise IOError("stream is shorter than expected")
+            return
+        if remaining is not None:
+            remaining -= n
+        yield view[:n]
+
+
+def _seekable(f):
+    try:
+        return f.seekable()
+    except (AttributeError, OSError, ValueError):
+        return False
+
+
+def _fileno(f):
+    """:return: the file descriptor if f is a regular file, else None"""
+    try:
+        fileno = f.fileno()
+        return fileno if stat.S_ISREG(os.fstat(fileno).st_mode) else None
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+
+
+def body(data, size=None, progress=None, chunk_size=buffer_size):
+    """
+    Wrap upload data so that it is streamed.
+    :param data: bytes, bytearray, memoryview, a binary file object (sent from its current position, pipes,
+                 sockets and stdin are read once) or an iterable of bytes chunks
+    :param size: number of bytes of an iterable or a file which cannot seek, default: unknown, then it is sent
+                 chunked
+    :param progress: optional callback, called with (bytes sent, size) after each chunk
+    :param chunk_size: bytes per chunk
+    :return: something requests can send: bytes and str without progress are returned as they are
+    """
+    if data is None or (isinstance(data, (bytes, str)) and progress is None):
+        return data
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return Body(lambda: _memory_chunks(data, chunk_size), memoryview(data).nbytes, progress)
+    if hasattr(data, 'readinto') and not _seekable(data):
+        data = _stream_chunks(data, size, chunk_size)
+    elif hasattr(data, 'readinto'):
+        offset = data.tell()
+        if size is None:
+            size = os.fstat(data.fileno()).st_size - offset if _fileno(data) is not None else \
+                data.seek(0, io.SEEK_END) - offset
+        return Body(lambda: _file_chunks(data, offset, size, chunk_size), size, progress)
+    if size is not None:
+        it = iter(data)
+        return Body(lambda: it, size, progress, replayable=False)
+
+    def chunked():  # no length: Transfer-Encoding chunked
+        sent = 0
+        for chunk in data:
+            yield chunk
+            sent += len(chunk)
+            if progress is not None:
+                progress(sent, None)
+    return chunked()
+
+
+def file_range(path, offset, size, progress=None, chunk_size=buffer_size):
+    """
+    a part of a file as Body. The file is opened on each iteration, so ranges of one file can be sent concurrently.
+    """
+    def chunks():
+        with open(path, 'rb') as f:
+            yield from _file_chunks(f, offset, size, chunk_size)
+    return Body(chunks, size, progress)
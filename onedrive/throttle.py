@@ -0,0 +1,236 @@
+import collections
+import email.utils
+import random
+import threading
+import time
+
+import requests
+
+from onedrive import metrics
+
+# requests which can be sent again after a connection error or a 5xx without side effects
+idempotent_methods = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}
+# the service asks us to slow down, nothing was processed
+throttle_codes = {429, 503}
+retry_codes = {500, 502, 503, 504}
+
+
+class RateLimiter:
+    """
+    Token bucket shared by all threads. The rate adapts to throttling (AIMD): it is halved on a 429/503
+    and increases slowly with each successful request. Requests sent before the last reduction do not halve it
+    again, so many threads hitting the same throttling window slow down once. All threads pause until
+    Retry-After has passed.
+    """
+
+    def __init__(self, rate=None, min_rate=1.0, increase=0.1):
+        """
+        :param rate: max. requests per sec. or None for unlimited until the service throttles
+        :param min_rate: the rate never drops below this
+        :param increase: requests per sec. the rate grows with each successful request
+        """
+        self.rate = rate
+        self.max_rate = rate
+        self.min_rate = min_rate
+        self.increase = increase
+        self.tokens = 1.0
+        self.last = time.monotonic()
+        self.blocked_until = 0.0
+        self.locked_until = 0.0  # see lock_out()
+        self.reduced = 0.0  # time of the last reduction of the rate
+        self.recent = collections.deque(maxlen=100)  # send times, to estimate the rate when unlimited
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        block until a request may be sent
+        :return: the time it may be sent (time.monotonic()), see throttled()
+        """
+        while True:
+            wait, now = self.try_acquire()
+            if wait <= 0:
+                return now
+            time.sleep(wait)
+
+    def try_acquire(self):
+        """
+        acquire() without blocking, e.g. for asyncio
+        :return: (0, the time it may be sent) if a request may be sent now,
+                 else (sec. to wait before trying again, None)
+        """
+        with self.lock:
+            now = time.monotonic()
+            wait = self.blocked_until - now
+            if wait <= 0 and self.rate is not None:
+                self.tokens = min(1.0, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                wait = (1.0 - self.tokens) / self.rate if self.tokens < 1.0 else 0
+            if wait > 0:
+                return wait, None
+            if self.rate is not None:
+                self.tokens -= 1.0
+            self.recent.append(now)
+            return 0, now
+
+    def throttled(self, retry_after=None, sent=None):
+        """
+        the service throttled a request: slow down and pause all threads for retry_after sec.
+        :param sent: when the request was sent (the result of acquire()), None: now
+        """
+        with self.lock:
+            now = time.monotonic()
+            if sent is None or sent >= self.reduced:  # else: answered from the window already slowed down for
+                if self.rate is None:
+                    window = now - self.recent[0] if len(self.recent) > 1 else 0
+                    observed = len(self.recent) / window if window > 0 else self.min_rate * 2
+                    self.rate = observed
+                self.rate = max(self.min_rate, self.rate / 2)
+                self.reduced = now
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+
+    def lock_out(self, seconds):
+        """the service asked to wait longer than max_retry_after: fail all requests for so long"""
+        with self.lock:
+            self.locked_until = max(self.locked_until, time.monotonic() + seconds)
+
+    def locked_out(self):
+        """:return: sec. until the lock out (see lock_out()) ends, 0 if there is none"""
+        with self.lock:
+            return max(0.0, self.locked_until - time.monotonic())
+
+    def succeeded(self):
+        with self.lock:
+            if self.rate is not None:
+                self.rate += self.increase
+                if self.max_rate is not None:
+                    self.rate = min(self.rate, self.max_rate)
+
+
+class RetryPolicy:
+    def __init__(self, max_retries=5, backoff=0.5, max_backoff=30.0, max_retry_after=120.0):
+        """
+        :param max_retries: retries per request, 0 disables retrying
+        :param backoff: base delay in sec. for the exponential backoff
+        :param max_backoff: max. delay in sec. between two retries (without Retry-After)
+        :param max_retry_after: give up (and return the 429) if the service asks us to wait longer, until then
+                                all requests fail with 429 without being sent
+        """
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_retry_after = max_retry_after
+
+    def delay(self, attempt):
+        """exponential backoff with full jitter"""
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+
+_policy = RetryPolicy()
+_limiter = RateLimiter()
+
+
+def configure(max_retries=5, backoff=0.5, max_backoff=30.0, max_retry_after=120.0, rate=None, min_rate=1.0):
+    """
+    Configure retrying and rate limiting of all api calls.
+    429 and 503 are retried for all requests after Retry-After (or the backoff) and slow down all threads.
+    Connection errors and other 5xx are only retried for idempotent requests.
+    :param max_retries: retries per request, 0 disables retrying
+    :param backoff: base delay in sec. for the exponential backoff
+    :param max_backoff: max. delay in sec. between two retries (without Retry-After)
+    :param max_retry_after: give up (and return the 429) if the service asks us to wait longer, until then
+                            all requests fail with 429 without being sent
+    :param rate: max. requests per sec. or None for unlimited until the service throttles
+    :param min_rate: the adaptive rate never drops below this
+    """
+    global _policy, _limiter
+    _policy = RetryPolicy(max_retries, backoff, max_backoff, max_retry_after)
+    _limiter = RateLimiter(rate, min_rate)
+
+
+def get_limiter():
+    return _limiter
+
+
+def get_policy():
+    return _policy
+
+
+def retry_after(response):
+    """:return: the Retry-After header in sec. or None"""
+    value = response.headers.get('Retry-After')
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def locked_out_response(seconds):
+    """:return: a 429 for requests which are not sent during a lock out"""
+    res = requests.Response()
+    res.status_code = 429
+    res.reason = 'Too Many Requests'
+    res.headers['Retry-After'] = str(int(seconds) + 1)
+    res.headers['Content-Type'] = 'application/json'
+    res._content = b'{"error": {"code": "activityLimitReached", "message": "locked out, not sent"}}'
+    return res
+
+
+def _replayable(data):
+    return data is None or isinstance(data, (bytes, str, dict)) or getattr(data, 'replayable', False)
+
+
+def call(send, method, data=None, limiter=None):
+    """
+    Send a request with retries and rate limiting.
+    :param send: function sending the request and returning the response
+    :param method: http method, to decide if a request may be repeated
+    :param data: the request body, streams cannot be sent twice
+    :param limiter: the RateLimiter to use (e.g. of a client.Client), None: the shared one
+    :return: the response. After the last retry the last (failed) response
+    """
+    policy, limiter = _policy, limiter or _limiter
+    idempotent = method.upper() in idempotent_methods
+    replayable = _replayable(data)
+    attempt = 0
+    while True:
+        locked = limiter.locked_out()
+        if locked > 0:
+            return locked_out_response(locked)
+        sent = limiter.acquire()
+        try:
+            res = send()
+        except (requests.ConnectionError, requests.Timeout):
+            if not (idempotent and replayable) or attempt >= policy.max_retries:
+                raise
+            metrics.record_event('retries')
+            time.sleep(policy.delay(attempt))
+            attempt += 1
+            continue
+
+        if res.status_code in throttle_codes:
+            metrics.record_event('throttled')
+            wait = retry_after(res)
+            if wait is not None and wait > policy.max_retry_after:
+                limiter.throttled(sent=sent)
+                limiter.lock_out(wait)
+                return res
+            limiter.throttled(wait, sent)
+        elif res.status_code in retry_codes and idempotent:
+            wait = None
+        else:
+            limiter.succeeded()
+            return res
+
+        if not replayable or attempt >= policy.max_retries:
+            return res
+        res.close()
+        metrics.record_event('retries')
+        time.sleep(wait if wait is not None else policy.delay(attempt))
+        attempt += 1
@@ -0,0 +1,135 @@
+"""
+Thumbnails of images, videos and documents: https://dev.onedrive.com/items/thumbnails.htm
+With a disk cache (see disk_cache.configure()) each thumbnail is fetched once per version of the item:
+
+    disk_cache.configure("~/.cache/onedrive")
+    thumbnails.prefetch("/photos/2016", header, sizes=('small', 'large'))
+    image = thumbnails.get_thumbnail("/photos/2016/a.jpg", header, 'large').content
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from onedrive import api
+from onedrive import disk_cache
+from onedrive import metrics
+from onedrive import session
+
+sizes = ('small', 'medium', 'large')
+
+
+def custom_size(width, height, crop=False):
+    """:return: the name of a custom thumbnail size, scaled (or cropped) to width x height"""
+    return 'c{}x{}'.format(width, height) + ('_Crop' if crop else '')
+
+
+def _url(path, size):
+    return api.base_url + "/drive/root:" + path + ":/thumbnails/0/" + size + "/content"
+
+
+@metrics.operation('thumbnails')
+def thumbnails(path, auth):
+    """
+    list the thumbnail sets of an item
+    :return: Result, json: value -> list of thumbnail sets, each mapping the size -> {url, width, height}
+    """
+    return api.Result(session.request('get', api.base_url + "/drive/root:" + path + ":/thumbnails", auth))
+
+
+def _fetch(path, item_id, tag, size, auth, dc):
+    """:return: (Result, True if it came from the cache)"""
+    if dc is not None:
+        data = dc.get(item_id, tag, 'thumbnail:' + size)
+        if data is not None:
+            return api.Result(disk_cache.response(data)), True
+    res = session.request('get', _url(path, size), auth)
+    if res.status_code == 200 and dc is not None:
+        dc.put(item_id, tag, res.content, 'thumbnail:' + size)
+    return api.Result(res), False
+
+
+@metrics.operation('get_thumbnail')
+def get_thumbnail(path, auth, size='medium'):
+    """
+    get a thumbnail image, from the disk cache if it is configured and has it
+    :param path: the item
+    :param auth: auth header
+    :param size: small, medium, large or a custom_size()
+    :return: Result 200 with the image as content, 404 if there is no thumbnail
+    """
+    dc = disk_cache.get_cache(auth)  # None if disabled, see disk_cache.configure()
+    item_id = tag = None
+    if dc is not None:
+        meta = api.get_metadata(path, auth, select='id,eTag,cTag')
+        if meta.status_code != 200:
+            return meta
+        item_id, tag = meta.json_body().get('id'), disk_cache.tag(meta.json_body())
+    return _fetch(path, item_id, tag, size, auth, dc)[0]
+
+
+class Prefetched:
+    """the outcome of prefetch()"""
+
+    def __init__(self):
+        self.fetched = 0
+        self.cached = 0  # were in the cache already
+        self.missing = 0  # items without thumbnail
+        self.failed = []  # (path, Result or exception)
+
+    def __str__(self):
+        return "{} fetched, {} cached, {} missing, {} failed".format(self.fetched, self.cached, self.missing,
+                                                                      len(self.failed))
+
+
+@metrics.operation('prefetch')
+def prefetch(path, auth, sizes=('medium',), content=False, workers=8, recursive=False):
+    """
+    Warm the disk cache with the thumbnails of the files in a folder, concurrently.
+    :param path: the folder
+    :param auth: auth header
+    :param sizes: thumbnail sizes to fetch
+    :param content: True to cache the files themselves as well (for api.download() / download.download_to())
+    :param workers: number of concurrent requests
+    :param recursive: True to include the files of all subfolders
+    :return: Prefetched
+    :raise ValueError: if no disk cache is configured
+    :raise IOError: if the folder cannot be listed
+    """
+    dc = disk_cache.get_cache(auth)
+    if dc is None:
+        raise ValueError("prefetching needs a disk cache, see disk_cache.configure()")
+    if recursive:
+        files = [f for _, _, fs in api.walk(path, auth, workers=workers, compact=True) for f in fs]
+    else:
+        files = [i for i in api.iter_items(path, auth) if i.is_file]
+
+    def fetch(item, size):
+        tag = disk_cache.tag(item)
+        if size is not None:
+            return _fetch(item.path, item.id, tag, size, auth, dc)
+        if dc.path(item.id, tag) is not None:
+            return None, True
+        res = session.request('get', api.base_url + "/drive/root:" + item.path + ":/content", auth, stream=True)
+        if res.status_code == 200:
+            dc.put_chunks(item.id, tag, res.iter_content(1024 * 1024))
+        res.close()
+        return api.Result(res, ''), False
+
+    fetch = metrics.bind(fetch)
+    result = Prefetched()
+    tasks = [(item, size) for item in files for size in list(sizes) + ([None] if content else [])]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [(item, pool.submit(fetch, item, size)) for item, size in tasks]
+        for item, future in futures:
+            try:
+                res, cached = future.result()
+            except (IOError, ValueError) as e:
+                result.failed.append((item.path, e))
+                continue
+            if cached:
+                result.cached += 1
+            elif res.status_code == 200:
+                result.fetched += 1
+            elif res.status_code == 404:
+                result.missing += 1
+            else:
+                result.failed.append((item.path, res))
+    return result
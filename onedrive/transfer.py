@@ -0,0 +1,206 @@
+import hashlib
+import os
+import os.path
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from onedrive import api
+from onedrive import download
+from onedrive import hashes
+from onedrive import upload
+
+# files above this size are transferred in chunks / segments, smaller ones in one request
+large_file_size = 8 * 1024 * 1024
+_file_fields = 'name,size,file'  # what is needed to compare remote files with local ones
+
+
+class Progress:
+    """aggregated progress of a tree transfer, shared by all workers"""
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.files_total = 0
+        self.bytes_total = 0
+        self.files_done = 0
+        self.bytes_done = 0
+        self.skipped = 0
+        self.failed = []  # (path, Result or exception)
+        self.started = time.time()
+        self.lock = threading.Lock()
+
+    def add(self, size):
+        with self.lock:
+            self.files_total += 1
+            self.bytes_total += size
+
+    def done(self, size, skipped=False, error=None, path=None):
+        with self.lock:
+            self.files_done += 1
+            self.bytes_done += size
+            if skipped:
+                self.skipped += 1
+            if error is not None:
+                self.failed.append((path, error))
+        if self.callback is not None:
+            self.callback(self)
+
+    def throughput(self):
+        """:return: bytes per sec. since the start, skipped files included"""
+        elapsed = time.time() - self.started
+        return self.bytes_done / elapsed if elapsed > 0 else 0.0
+
+    def __str__(self):
+        return "{}/{} files, {}/{} bytes, {} skipped, {} failed, {:.0f} bytes/s".format(
+            self.files_done, self.files_total, self.bytes_done, self.bytes_total, self.skipped, len(self.failed),
+            self.throughput())
+
+
+def put_file(src, dst, auth, conflict='replace', skip_unchanged=True, meta=None, hash_cache=None,
+             fragment_size=upload.default_fragment_size, progress=None, state_file=None):
+    """
+    upload a file, through an upload session if it is larger than large_file_size. The file is streamed.
+    :param src: local file
+    :param dst: upload path
+    :param auth: auth header
+    :param conflict: fail, replace, or rename
+    :param skip_unchanged: do not upload if size and hash of the remote file match
+    :param meta: driveItem of dst if already known, otherwise it is fetched if skip_unchanged is set
+    :param hash_cache: optional hashes.HashCache for the local hashes
+    :param fragment_size: fragment size for large files
+    :param progress: optional callback, called with (bytes sent, size) while uploading
+    :param state_file: file to keep the upload session of a large file in, an interrupted upload is resumed
+    :return: None if the file was skipped, otherwise the Result of the upload
+    """
+    if skip_unchanged:
+        if meta is None:
+            res = api.get_metadata(dst, auth, select='file,size')
+            meta = res.json_body() if res.status_code == 200 else None
+        if hashes.same_content(src, meta, hash_cache):
+            return None
+    if os.path.getsize(src) > large_file_size:
+        return upload.upload_large(src, dst, auth, conflict, fragment_size=fragment_size, state_file=state_file,
+                                   progress=progress)
+    with open(src, 'rb') as f:
+        return api.upload_simple(f, dst, auth, conflict, progress=progress)
+
+
+def _remote_files(path, auth):
+    """:return: name -> driveItem of the files in a remote folder, empty if it does not exist (yet)"""
+    try:
+        return {i['name']: i for i in api.iter_children(path, auth, select=_file_fields)
+                if api.is_file_meta(i)}
+    except IOError:
+        return {}
+
+
+def _join(path, name):
+    return path.rstrip('/') + '/' + name
+
+
+def _state_file(state_dir, src, dst):
+    """:return: the file in state_dir the upload session of src to dst is kept in"""
+    key = hashlib.sha1((os.path.abspath(src) + '\n' + dst).encode('utf-8')).hexdigest()
+    return os.path.join(state_dir, 'onedrive-upload-' + key + '.json')
+
+
+def put_tree(src, dst, auth, workers=8, skip_unchanged=True, fragment_size=upload.default_fragment_size,
+             progress=None, hash_cache=None, state_dir=None):
+    """
+    Upload a local directory tree. Remote directories are created first (level by level), then the files are
+    uploaded by `workers` threads. Files above large_file_size go through upload sessions.
+    :param src: local directory
+    :param dst: remote directory, created if necessary
+    :param auth: auth header
+    :param workers: number of parallel transfers
+    :param skip_unchanged: do not upload files whose size and hash match the remote file
+    :param fragment_size: fragment size for large files
+    :param progress: optional callback, called with the Progress after each file
+    :param hash_cache: optional hashes.HashCache for the local hashes, saved at the end
+    :param state_dir: directory to keep the upload sessions of large files in, interrupted uploads are resumed
+    :return: the Progress with the summary and the failed files
+    """
+    p = Progress(progress)
+    dirs, files = [], []
+    for root, _, names in os.walk(src):
+        rel = os.path.relpath(root, src).replace(os.sep, '/')
+        remote = dst.rstrip('/') if rel == '.' else _join(dst, rel)
+        dirs.append(remote)
+        for name in names:
+            local = os.path.join(root, name)
+            size = os.path.getsize(local)
+            files.append((local, _join(remote, name), size))
+            p.add(size)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        created = set()
+        api.makedirs(dirs, auth, workers, created)
+
+        remote_meta = {}
+        if skip_unchanged:  # new directories are empty, no need to list them
+            listings = pool.map(lambda d: (d, _remote_files(d, auth)), [d for d in dirs if d not in created])
+            remote_meta = {_join(d, name): meta for d, metas in listings for name, meta in metas.items()}
+
+        def put(local, remote, size):
+            try:
+                # the listing above already tells which files exist, no need to ask for each file
+                res = put_file(local, remote, auth, skip_unchanged=skip_unchanged and remote in remote_meta,
+                               meta=remote_meta.get(remote), hash_cache=hash_cache, fragment_size=fragment_size,
+                               state_file=_state_file(state_dir, local, remote) if state_dir else None)
+                if res is None:
+                    p.done(size, skipped=True)
+                    return
+                p.done(size, error=None if res.status_code in (200, 201) else res, path=local)
+            except Exception as e:
+                p.done(size, error=e, path=local)
+
+        for f in files:
+            pool.submit(put, *f)
+    if hash_cache is not None:
+        hash_cache.save()
+    return p
+
+
+def get_tree(src, dst, auth, workers=8, skip_unchanged=True, segments=4, progress=None, hash_cache=None,
+             resume=False):
+    """
+    Download a remote directory tree. The tree is listed with api.walk(), files are downloaded by
+    `workers` threads. Files above large_file_size are downloaded in `segments` parallel range requests.
+    :param src: remote directory
+    :param dst: local directory, created if necessary
+    :param auth: auth header
+    :param workers: number of parallel transfers
+    :param skip_unchanged: do not download files whose size and hash match the local file
+    :param segments: number of range requests for large files
+    :param progress: optional callback, called with the Progress after each file
+    :param hash_cache: optional hashes.HashCache for the local hashes, saved at the end
+    :param resume: continue partial local files with a range request instead of downloading them again,
+                   such files are not split into segments
+    :return: the Progress with the summary and the failed files
+    """
+    p = Progress(progress)
+    ok = (200, 206, 416) if resume else (200, 206)  # 416: nothing was missing
+
+    def get(meta, remote, local):
+        size = meta.get('size', 0)
+        try:
+            if skip_unchanged and os.path.isfile(local) and hashes.same_content(local, meta, hash_cache):
+                p.done(size, skipped=True)
+                return
+            res = download.download_to(remote, local, auth, resume=resume,
+                                       segments=segments if size > large_file_size and not resume else 1)
+            p.done(size, error=None if res.status_code in ok else res, path=remote)
+        except Exception as e:
+            p.done(size, error=e, path=remote)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for path, folders, files in api.walk(src, auth, workers=workers, select=_file_fields):
+            rel = path[len(src.rstrip('/')):].lstrip('/')
+            local_dir = os.path.join(dst, *rel.split('/')) if rel else dst
+            os.makedirs(local_dir, exist_ok=True)
+            for meta in files:
+                p.add(meta.get('size', 0))
+                pool.submit(get, meta, _join(path, meta['name']), os.path.join(local_dir, meta['name']))
+    if hash_cache is not None:
+        hash_cache.save()
+    return p
@@ -0,0 +1,180 @@
+"""
+The HTTP backends requests are sent through. Every api call goes through session.request(), which hands the
+request to the transport of the client it is made for (see client.Client) or to the default transport:
+
+    session.configure(transport=transport.Http2Transport())  # pip install onedrive[http2]
+
+A transport has request(method, url, headers, **kwargs), taking the keyword arguments of requests
+(data, stream, allow_redirects, timeout) and returning a requests.Response, and close().
+"""
+import json
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+_redirects = (301, 302, 303, 307, 308)
+
+
+class RequestsTransport:
+    """requests with pooled keep-alive connections (HTTP/1.1), the default"""
+
+    def __init__(self, pool_connections=10, pool_maxsize=10, keep_alive=True):
+        """
+        :param pool_connections: number of hosts to keep connection pools for
+        :param pool_maxsize: max. number of connections kept per host (set to the number of worker threads)
+        :param keep_alive: False closes the connection after each request
+        """
+        s = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        s.mount('https://', adapter)
+        s.mount('http://', adapter)
+        if not keep_alive:
+            s.headers['Connection'] = 'close'
+        self.session = s
+
+    def request(self, method, url, headers=None, **kwargs):
+        return self.session.request(method, url, headers=headers, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+class _Stream:
+    """file like view of a streamed httpx response, the raw of a requests.Response"""
+
+    def __init__(self, response):
+        self.response = response
+        self.chunks = response.iter_bytes()
+        self.buffer = bytearray()
+
+    def read(self, n=-1, **kwargs):
+        while n < 0 or len(self.buffer) < n:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                break
+            self.buffer += chunk
+        if n < 0:
+            n = len(self.buffer)
+        data = bytes(self.buffer[:n])
+        del self.buffer[:n]
+        return data
+
+    def close(self):
+        self.response.close()
+
+
+class Http2Transport:
+    """
+    httpx with HTTP/2: concurrent requests to a host are multiplexed over one connection instead of opening
+    a connection each. Requires httpx (pip install onedrive[http2]).
+    """
+
+    def __init__(self, max_connections=10, http2=True):
+        """
+        :param max_connections: max. number of connections, with HTTP/2 one per host is usually enough
+        :param http2: False for HTTP/1.1, e.g. to compare both with the same client
+        """
+        import httpx  # optional dependency
+        self.httpx = httpx
+        self.client = httpx.Client(http2=http2, limits=httpx.Limits(max_connections=max_connections), timeout=None)
+
+    def _timeout(self, timeout):
+        if isinstance(timeout, tuple):
+            return self.httpx.Timeout(None, connect=timeout[0], read=timeout[1])
+        return self.httpx.Timeout(timeout)
+
+    def request(self, method, url, headers=None, data=None, stream=False, allow_redirects=True, timeout=None):
+        headers = dict(headers or {})
+        content = data
+        if isinstance(data, str):
+            content = data.encode('utf-8')
+        elif data is not None and not isinstance(data, bytes):  # streamed, see streams.body()
+            if hasattr(data, '__len__'):
+                headers.setdefault('Content-Length', str(len(data)))
+            content = (bytes(chunk) for chunk in data)
+        req = self.client.build_request(method.upper(), url, headers=headers, content=content,
+                                        timeout=self._timeout(timeout))
+        res = self.client.send(req, stream=True, follow_redirects=allow_redirects)
+
+        r = self._response(res, _request(method, url, headers, data))
+        # the redirects which were followed, read already (e.g. a finished copy, see api.AsyncOperationStatus)
+        r.history = [self._response(h, _request(h.request.method, str(h.request.url), dict(h.request.headers), None),
+                                    h.read()) for h in res.history]
+        if stream:
+            r.raw = _Stream(res)
+        else:
+            r._content = res.read()
+            r._content_consumed = True
+            res.close()
+        return r
+
+    @staticmethod
+    def _response(res, request, content=None):
+        r = requests.Response()
+        r.status_code = res.status_code
+        r.reason = res.reason_phrase
+        r.headers = CaseInsensitiveDict(res.headers.items())
+        r.url = str(res.url)
+        r.encoding = res.charset_encoding
+        r.request = request
+        if content is not None:
+            r._content = content
+            r._content_consumed = True
+        return r
+
+    def close(self):
+        self.client.close()
+
+
+def _request(method, url, headers, body):
+    """the request a response answers, as requests keeps it in response.request"""
+    r = requests.PreparedRequest()
+    r.method, r.url, r.headers, r.body = method.upper(), url, CaseInsensitiveDict(headers or {}), body
+    return r
+
+
+class MemoryTransport:
+    """
+    Answers requests in memory from a handler instead of the network, e.g. a stand-in of the service in tests.
+    The handler gets the request (method, url, headers and the body as bytes or str) and returns
+    (status_code, headers, body), a dict or list body is sent as json.
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.requests = []  # all requests received
+
+    def request(self, method, url, headers=None, data=None, allow_redirects=True, **kwargs):
+        if data is not None and not isinstance(data, (bytes, str)):  # streamed
+            data = b''.join(bytes(chunk) for chunk in data)
+        history = []  # the redirects which were followed, as requests keeps them in response.history
+        for _ in range(30):
+            req = _request(method, url, headers, data)
+            self.requests.append(req)
+            r = self._response(req, *self.handler(req))
+            if not (allow_redirects and r.status_code in _redirects and 'Location' in r.headers):
+                break
+            history.append(r)
+            method, url, data = 'GET', r.headers['Location'], None
+        r.history = history
+        return r
+
+    @staticmethod
+    def _response(req, status, headers, body):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body).encode('utf-8')
+        elif isinstance(body, str):
+            body = body.encode('utf-8')
+        r = requests.Response()
+        r.status_code = status
+        r.headers = CaseInsensitiveDict(headers or {})
+        r._content = body or b''
+        r._content_consumed = True
+        r.url = req.url
+        r.request = req
+        r.encoding = 'utf-8'
+        return r
+
+    def close(self):
+        pass
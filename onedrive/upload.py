@@ -0,0 +1,175 @@
+import os
+import os.path
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from onedrive import api
+from onedrive import cache
+from onedrive import json_io
+from onedrive import metrics
+from onedrive import session
+from onedrive import streams
+
+# fragments must be a multiple of 320 KiB: https://dev.onedrive.com/items/upload_large_files.htm
+fragment_unit = 320 * 1024
+default_fragment_size = 32 * fragment_unit  # 10 MiB
+
+
+def parse_ranges(next_expected_ranges, size):
+    """
+    :param next_expected_ranges: list of "start-end" or "start-" strings as returned by the service
+    :param size: total size of the file
+    :return: list of (start, end) tuples, end inclusive
+    """
+    ranges = []
+    for r in next_expected_ranges:
+        start, _, end = r.partition('-')
+        ranges.append((int(start), int(end) if end else size - 1))
+    return ranges
+
+
+def fragments(ranges, fragment_size):
+    """
+    split the missing ranges into fragments of at most fragment_size bytes
+    :return: generator of (start, end) tuples, end inclusive
+    """
+    for start, end in ranges:
+        while start <= end:
+            stop = min(start + fragment_size, end + 1)
+            yield start, stop - 1
+            start = stop
+
+
+def _load_state(state_file, src, dst, size, mtime):
+    if not state_file or not os.path.isfile(state_file):
+        return None
+    state = json_io.load(state_file)
+    if (state.get('src'), state.get('dst'), state.get('size'), state.get('mtime')) != (src, dst, size, mtime):
+        return None  # the file changed, start from scratch
+    return state
+
+
+def _save_state(state_file, state):
+    if state_file:
+        json_io.save(state, state_file)
+
+
+def _remove_state(state_file):
+    if state_file and os.path.isfile(state_file):
+        os.remove(state_file)
+
+
+def _put_fragment(upload_url, data, start, end, size, auth):
+    # the upload url is pre-authenticated, the auth header must not be sent
+    headers = {'Content-Range': 'bytes {}-{}/{}'.format(start, end, size)}
+    return session.request('put', upload_url, session.anonymous(auth), headers=headers, data=data)
+
+
+def _missing_ranges(state, size, auth):
+    """ask the service which ranges are still missing. None if the session is gone"""
+    res = session.request('get', state['uploadUrl'], session.anonymous(auth))
+    if res.status_code != 200:
+        return None
+    return parse_ranges(api.Result(res).json_body().get('nextExpectedRanges', []), size)
+
+
+class _Progress:
+    """adds up the progress of the fragments sent concurrently"""
+
+    def __init__(self, callback, size, done):
+        self.callback = callback
+        self.size = size
+        self.done = done
+        self.lock = threading.Lock()
+
+    def fragment(self):
+        """:return: the progress callback for the Body of a fragment or None"""
+        if self.callback is None:
+            return None
+        last = [0]
+
+        def update(sent, total):
+            with self.lock:
+                self.done += sent - last[0]  # a retried fragment starts over
+                last[0] = sent
+                done = self.done
+            self.callback(done, self.size)
+        return update
+
+
+@metrics.operation('upload_large')
+def upload_large(src, dst, auth, conflict='replace', fragment_size=default_fragment_size, workers=1,
+                 state_file=None, progress=None):
+    """ Upload a (large) file from disk through an upload session.
+    see: https://dev.onedrive.com/items/upload_large_files.htm
+    The file is streamed in fragments, at most `workers` fragments are sent at once. Only a read buffer per fragment
+    is held in memory.
+    If state_file is given, the session url is saved there so that an interrupted upload is resumed
+    with the ranges that are still missing instead of starting all over.
+    :param src: local file
+    :param dst: upload path
+    :param auth: auth header
+    :param conflict: fail, replace, or rename
+    :param fragment_size: bytes per request, must be a multiple of 320 KiB
+    :param workers: number of fragments uploaded in parallel. The service may require fragments
+                    in order, so only use more than 1 if your drive accepts it.
+    :param state_file: file to persist the session in, or None to not persist anything
+    :param progress: optional callback, called with (bytes uploaded, size) while sending
+    :return: Result of the final fragment: 201 Created or 200 Ok + json of the item.
+             On error the Result of the failing request. Then the state file is kept for a retry.
+    """
+    if fragment_size <= 0 or fragment_size % fragment_unit:
+        raise ValueError("fragment_size must be a multiple of 320 KiB")
+
+    stat = os.stat(src)
+    size, mtime = stat.st_size, stat.st_mtime
+    if size == 0:  # sessions cannot handle empty files
+        return api.upload_simple(b'', dst, auth, conflict)
+
+    state = _load_state(state_file, src, dst, size, mtime)
+    missing = _missing_ranges(state, size, auth) if state else None
+    if missing is None:
+        res = api.create_upload_session(dst, auth, conflict)
+        if res.status_code != 200:
+            return res
+        body = res.json_body()
+        state = {'src': src, 'dst': dst, 'size': size, 'mtime': mtime, 'uploadUrl': body['uploadUrl'],
+                 'ranges': []}
+        _save_state(state_file, state)
+        missing = parse_ranges(body.get('nextExpectedRanges', ['0-']), size)
+
+    upload_url = state['uploadUrl']
+    put_fragment = metrics.bind(_put_fragment)
+    counter = _Progress(progress, size, size - sum(end - start + 1 for start, end in missing))
+    last = None
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = {}
+        todo = fragments(missing, fragment_size)
+        while True:
+            for start, end in todo:  # fill the window, the fragments are streamed from the file
+                data = streams.file_range(src, start, end - start + 1, counter.fragment())
+                pending[pool.submit(put_fragment, upload_url, data, start, end, size, auth)] = (start, end)
+                if len(pending) >= workers:
+                    break
+            if not pending:
+                break
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                acked = pending.pop(future)
+                res = future.result()
+                if res.status_code not in (200, 201, 202):
+                    for p in pending:
+                        p.cancel()
+                    wait(pending)
+                    return api.Result(res)
+                if res.status_code in (200, 201):
+                    last = res
+                state['ranges'].append(acked)
+                _save_state(state_file, state)
+
+    _remove_state(state_file)
+    cache.invalidate(dst, auth=auth)
+    if last is None:  # nothing left to upload, but not completed -> ask for the item
+        return api.get_metadata(dst, auth)
+    return api.Result(last)
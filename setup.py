@@ -2,10 +2,12 @@ from setuptools import setup
 
 setup(
    name='onedrive',
-   version='0.9.0',
+   version='0.10.0',
    description='My personal OneDrive API',
    author='Franz',
    author_email='code@locked.de',
    packages=['onedrive'],
-   install_requires=['requests']
+   install_requires=['requests'],
+   extras_require={'aio': ['aiohttp'], 'http2': ['httpx[http2]']},
+   entry_points={'console_scripts': ['onedrive=onedrive.cli:main']}
 )
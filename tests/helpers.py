@@ -0,0 +1,89 @@
+import json
+import re
+from requests.adapters import BaseAdapter
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+from onedrive.fake import FakeDrive  # noqa: F401 (used by the tests through this module)
+
+
+class FakeAdapter(BaseAdapter):
+    """
+    Transport adapter which answers requests from a handler function instead of the network.
+    The handler gets the PreparedRequest and returns (status_code, headers, body).
+    """
+
+    def __init__(self, handler):
+        super().__init__()
+        self.handler = handler
+        self.requests = []
+
+    def send(self, request, **kwargs):
+        if request.body is not None and not isinstance(request.body, (bytes, str)):  # streamed
+            request.body = b''.join(bytes(chunk) for chunk in request.body)
+        self.requests.append(request)
+        status, headers, body = self.handler(request)
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body).encode('utf-8')
+        elif isinstance(body, str):
+            body = body.encode('utf-8')
+
+        r = Response()
+        r.status_code = status
+        r.headers = CaseInsensitiveDict(headers or {})
+        r._content = body or b''
+        r._content_consumed = True
+        r.url = request.url
+        r.request = request
+        r.encoding = 'utf-8'
+        return r
+
+    def close(self):
+        pass
+
+
+def mount(session, handler):
+    """mount a FakeAdapter for all urls on the given requests session"""
+    adapter = FakeAdapter(handler)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return adapter
+
+
+def delta_item(item_id, name, parent, folder=False, **kw):
+    """a driveItem as the delta endpoint returns it, files with a sha1 and size 1 unless given"""
+    i = {'id': item_id, 'name': name, 'parentReference': {'id': parent}}
+    i.update({'folder': {}} if folder else {'file': {'hashes': {'sha1Hash': 'S' + item_id}}, 'size': 1})
+    i.update(kw)
+    return i
+
+
+class FakeDelta:
+    """
+    Handler for the delta endpoint: the pages of the whole drive without a token, afterwards the pages
+    of the changes after token 't1'. Pages are linked with @odata.nextLink, the last one ends with the next token.
+    Once expired is set, requests with a token are answered with 410 (resync required).
+    """
+
+    def __init__(self, initial, changes):
+        """
+        :param initial: list of pages (lists of items), the last one ends with token 't1'
+        :param changes: list of pages, the last one ends with token 't2'
+        """
+        self.initial = initial
+        self.changes = changes
+        self.expired = False
+
+    def __call__(self, request):
+        if self.expired and 'token=' in request.url:
+            return 410, {}, {'error': {'code': 'resyncRequired'}}
+        m = re.search(r'page=(\d+)', request.url)
+        page = int(m.group(1)) if m else 0
+        changes = 'token=t1' in request.url
+        pages, token = (self.changes, 't2') if changes else (self.initial, 't1')
+        body = {'value': pages[page]}
+        if page + 1 < len(pages):
+            body['@odata.nextLink'] = 'https://api.example/view.delta?{}page={}'.format(
+                'token=t1&' if changes else '', page + 1)
+        else:
+            body['@delta.token'] = token
+        return 200, {}, body
@@ -0,0 +1,102 @@
+import asyncio
+import io
+import unittest
+from aiohttp import web
+from onedrive import aio
+from onedrive import throttle
+from helpers import FakeDrive
+
+auth = {'Authorization': 'bearer xyz'}
+
+
+class _Request:
+    """the parts of an aiohttp request FakeDrive looks at"""
+
+    def __init__(self, request, body):
+        self.url = str(request.url)
+        self.method = request.method
+        self.headers = request.headers
+        self.body = body
+
+
+class TestAio(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.drive = FakeDrive()
+
+        self.throttle = 0  # the next n requests are answered with 429
+
+        async def handle(request):
+            if request.headers.get('Authorization') == 'bearer expired':
+                return web.json_response({'error': {'code': 'unauthenticated'}}, status=401)
+            if self.throttle:
+                self.throttle -= 1
+                return web.json_response({'error': {'code': 'activityLimitReached'}}, status=429,
+                                         headers={'Retry-After': '0.01'})
+            status, headers, body = self.drive(_Request(request, await request.read() or None))
+            if isinstance(body, (dict, list)):
+                return web.json_response(body, status=status, headers=headers)
+            return web.Response(status=status, headers=headers, body=body or b'')
+
+        app = web.Application()
+        app.router.add_route('*', '/{tail:.*}', handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        port = self.runner.addresses[0][1]
+        self.drive.base = 'http://127.0.0.1:{}/v1.0'.format(port)
+        self.client = aio.Client(base_url=self.drive.base)
+
+    async def asyncTearDown(self):
+        await self.client.close()
+        await self.runner.cleanup()
+
+    async def test_operations(self):
+        c = self.client
+        self.assertEqual((await c.mkdir('/a/b', auth, parents=True)).status_code, 201)
+        self.assertTrue(await c.exists('/a/b', auth))
+        self.assertEqual((await c.upload_simple(b'123', '/a/f.txt', auth)).status_code, 201)
+        self.assertEqual((await c.download('/a/f.txt', auth)).content, b'123')
+        buf = io.BytesIO()
+        await c.download_to('/a/f.txt', buf, auth)
+        self.assertEqual(buf.getvalue(), b'123')
+
+        self.assertEqual((await c.rename('/a/f.txt', 'g.txt', auth)).status_code, 200)
+        self.assertEqual((await c.move('/a/g.txt', '/a/b', auth)).status_code, 200)
+        res = await c.copy('/a/b/g.txt', '/a/h.txt', auth)
+        self.assertEqual(res.status_code, 202)
+        status = await c.wait_for(res.headers['Location'], auth)
+        self.assertEqual(status['status'], 'completed')
+        self.assertEqual((await c.delete('/a/b', auth)).status_code, 204)
+        self.assertFalse(await c.exists('/a/b/g.txt', auth))
+        self.assertIsNotNone(await c.get_sha1('/a/h.txt', auth))
+
+    async def test_download_to_retries_and_refreshes(self):
+        class Provider(dict):
+            def refresh(self, stale):
+                self['Authorization'] = 'bearer new'
+
+        self.drive.put('/f.txt', b'content')
+        self.throttle = 1
+        self.addCleanup(throttle.configure)  # the shared limiter slowed down
+        buf = io.BytesIO()
+        res = await self.client.download_to('/f.txt', buf, Provider({'Authorization': 'bearer expired'}))
+        self.assertEqual((res.status_code, buf.getvalue()), (200, b'content'))
+        self.assertEqual(self.throttle, 0)
+
+    async def test_concurrent_listing(self):
+        for i in range(5):
+            self.drive.mkdir('/d' + str(i))
+            for j in range(3):
+                self.drive.put('/d{}/f{}'.format(i, j), b'x')
+        results = await asyncio.gather(*[self.client.list_children('/d' + str(i), auth, max_results=2)
+                                         for i in range(5)])
+        self.assertEqual([len(r.json_body()['value']) for r in results], [3] * 5)
+        names = [i['name'] async for i in self.client.iter_children('/', auth)]
+        self.assertEqual(names, ['d0', 'd1', 'd2', 'd3', 'd4'])
+        self.assertEqual((await self.client.list_children('/missing', auth)).status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+from onedrive import api
+from onedrive import auth
+from onedrive import session
+from helpers import mount
+
+
+def tokens(access='a1', created=None, expires_in=3600):
+    return {'access_token': access, 'refresh_token': 'r', 'expires_in': expires_in,
+            'created': int(time.time()) if created is None else created}
+
+
+class TestTokenProvider(unittest.TestCase):
+
+    def tearDown(self):
+        session.close()
+
+    def test_header(self):
+        p = auth.TokenProvider(tokens(), 'id', 'secret', background=False)
+        self.assertEqual(dict(p), {'Authorization': 'bearer a1'})
+
+    def test_expired_refreshes_on_access(self):
+        with mock.patch.object(auth, 'refresh_tokens', return_value=tokens('a2')) as refresh:
+            p = auth.TokenProvider(tokens(created=0), 'id', 'secret', background=False)
+            self.assertEqual(p['Authorization'], 'bearer a2')
+            self.assertEqual(p['Authorization'], 'bearer a2')
+        self.assertEqual(refresh.call_count, 1)
+
+    def test_background_refresh(self):
+        with mock.patch.object(auth, 'refresh_tokens', return_value=tokens('a2')) as refresh:
+            p = auth.TokenProvider(tokens(expires_in=0), 'id', 'secret')
+            self.addCleanup(p.close)
+            for _ in range(100):
+                if p.header['Authorization'] == 'bearer a2':
+                    break
+                time.sleep(0.01)
+        self.assertEqual(p.header['Authorization'], 'bearer a2')
+        self.assertEqual(refresh.call_count, 1)
+
+    def test_concurrent_refreshes_coalesce(self):
+        def slow_refresh(*args):
+            time.sleep(0.05)
+            return tokens('a2')
+
+        with mock.patch.object(auth, 'refresh_tokens', side_effect=slow_refresh) as refresh:
+            p = auth.TokenProvider(tokens(), 'id', 'secret', background=False)
+            threads = [threading.Thread(target=p.refresh, args=('bearer a1',)) for _ in range(8)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        self.assertEqual(refresh.call_count, 1)
+        self.assertEqual(p['Authorization'], 'bearer a2')
+
+    def test_retry_once_on_401(self):
+        seen = []
+
+        def handler(request):
+            seen.append(request.headers['Authorization'])
+            if request.headers['Authorization'] == 'bearer a1':
+                return 401, {}, {'error': {'code': 'unauthenticated'}}
+            return 200, {}, {'id': '1'}
+
+        mount(session.get_session(), handler)
+        with mock.patch.object(auth, 'refresh_tokens', return_value=tokens('a2')):
+            p = auth.TokenProvider(tokens(), 'id', 'secret', background=False)
+            res = api.get_metadata('/foo', p)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(seen, ['bearer a1', 'bearer a2'])
+
+    def test_401_with_plain_header(self):
+        mount(session.get_session(), lambda request: (401, {}, {}))
+        res = api.get_metadata('/foo', {'Authorization': 'bearer a1'})
+        self.assertEqual(res.status_code, 401)
+
+
+if __name__ == '__main__':
+    unittest.main()
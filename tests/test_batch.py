@@ -0,0 +1,74 @@
+import json
+import unittest
+from onedrive import batch
+from onedrive import session
+from helpers import mount
+
+auth = {'Authorization': 'bearer xyz'}
+
+
+def service(request):
+    """answers each sub request: paths containing 'missing' do not exist"""
+    assert request.url.endswith('/$batch')
+    responses = []
+    failed = set()
+    for r in json.loads(request.body)['requests']:
+        if any(d in failed for d in r.get('dependsOn', [])):
+            status, body = 424, None
+        elif 'missing' in r['url']:
+            status, body = 404, {'error': {'code': 'itemNotFound'}}
+        elif r['method'] == 'DELETE':
+            status, body = 204, None
+        else:
+            status, body = 200, {'id': r['id'], 'request': r}
+        if status >= 400:
+            failed.add(r['id'])
+        responses.append({'id': r['id'], 'status': status, 'headers': {}, 'body': body})
+    return 200, {}, {'responses': list(reversed(responses))}
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.adapter = mount(session.get_session(), service)
+
+    def tearDown(self):
+        session.close()
+
+    def test_results_in_order(self):
+        b = batch.Batch(auth)
+        b.exists("/foo")
+        b.exists("/missing")
+        b.delete("/bar")
+        b.rename("/foo", "baz")
+        results = b.execute()
+        self.assertEqual([r.status_code for r in results], [200, 404, 204, 200])
+        self.assertEqual(results[3].json_body()['request']['body'], {'name': 'baz'})
+        self.assertEqual(results[3].json_body()['request']['headers']['Content-Type'], 'application/json')
+        self.assertEqual(b.requests, [])
+
+    def test_chunks(self):
+        b = batch.Batch(auth)
+        for i in range(45):
+            b.delete("/foo" + str(i))
+        results = b.execute()
+        self.assertEqual(len(results), 45)
+        self.assertEqual(len(self.adapter.requests), 3)
+
+    def test_depends_on(self):
+        b = batch.Batch(auth)
+        for i in range(batch.max_batch_size - 1):
+            b.delete("/foo" + str(i))
+        first = b.move("/missing", "/dst")
+        second = b.rename("/dst/missing", "x", depends_on=first)  # in the next round trip
+        b.delete("/dst/missing", depends_on=second)
+        ok = b.get_metadata("/bar")
+        b.delete("/bar", depends_on=ok)
+        results = b.execute()
+        self.assertEqual([r.status_code for r in results[-5:]], [404, 424, 424, 200, 204])
+        sent = json.loads(self.adapter.requests[-1].body)['requests']
+        self.assertEqual(sent[-1]['dependsOn'], [ok])
+
+
+if __name__ == '__main__':
+    unittest.main()
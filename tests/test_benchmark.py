@@ -0,0 +1,28 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+import bench  # noqa: E402
+
+
+class TestBenchmark(unittest.TestCase):
+    """smoke test: the benchmarks run against the mock server"""
+
+    def test_quick_run(self):
+        with tempfile.TemporaryDirectory() as d:
+            output = os.path.join(d, 'results.json')
+            results = bench.main(['--quick', '--output', output] + list(bench.scenarios))
+            with open(output) as f:
+                saved = json.load(f)
+            self.assertEqual(saved['results'], results)
+            lines = bench.compare(results, saved)
+        self.assertEqual(set(results), set(bench.scenarios))
+        self.assertGreater(results['throttled']['throttled'], 0)
+        self.assertEqual(len(lines), len(results) + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
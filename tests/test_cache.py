@@ -0,0 +1,108 @@
+import time
+import unittest
+from onedrive import api
+from onedrive import cache
+from onedrive import session
+from helpers import mount
+
+auth = {'Authorization': 'bearer xyz'}
+
+
+class FakeDrive:
+    """folders with ids and eTags, answers If-None-Match with 304"""
+
+    def __init__(self):
+        self.items = {'/': 'root', '/a': 'id-a'}
+        self.etag = 'v1'
+
+    def __call__(self, request):
+        if request.method == 'POST':
+            name = 'new'
+            self.items['/a/' + name] = 'id-' + name
+            return 201, {'ETag': 'v1'}, {'id': 'id-' + name, 'name': name, 'folder': {}}
+        if request.method == 'DELETE':
+            return 204, {}, ''
+        path = request.url.split('/drive/root:', 1)[1].split('?')[0] or '/'
+        if path not in self.items:
+            return 404, {}, {'error': {'code': 'itemNotFound'}}
+        if request.headers.get('If-None-Match') == self.etag:
+            return 304, {}, ''
+        return 200, {'ETag': self.etag}, {'id': self.items[path], 'folder': {}}
+
+
+class TestCache(unittest.TestCase):
+
+    def setUp(self):
+        self.drive = FakeDrive()
+        self.adapter = mount(session.get_session(), self.drive)
+        cache.configure(max_entries=3, ttl=60)
+
+    def tearDown(self):
+        cache.disable()
+        session.close()
+
+    def test_cached(self):
+        self.assertEqual(api.get_metadata('/a', auth).json_body()['id'], 'id-a')
+        self.assertTrue(api.exists('/a', auth))  # served from the full metadata
+        self.assertEqual(len(self.adapter.requests), 1)
+
+    def test_disabled(self):
+        cache.disable()
+        api.get_metadata('/a', auth)
+        api.get_metadata('/a', auth)
+        self.assertEqual(len(self.adapter.requests), 2)
+
+    def test_revalidate(self):
+        cache.get_cache().ttl = 0
+        first = api.get_metadata('/a', auth)
+        self.assertIs(api.get_metadata('/a', auth), first)
+        self.assertEqual(self.adapter.requests[-1].headers['If-None-Match'], 'v1')
+
+        self.drive.etag = 'v2'
+        second = api.get_metadata('/a', auth)
+        self.assertIsNot(second, first)
+        self.assertEqual(second.status_code, 200)
+
+    def test_lru(self):
+        for p in ('/', '/a', '/x', '/y'):
+            cache.store(p, None, api.get_metadata('/a', auth))
+        self.assertIsNone(cache.lookup('/'))
+        self.assertIsNotNone(cache.lookup('/y'))
+
+    def test_invalidate_on_delete(self):
+        api.get_metadata('/a', auth)
+        api.delete('/a', auth)
+        self.assertIsNone(cache.lookup('/a'))
+
+    def test_mkdir_reuses_parent(self):
+        api.mkdir('/a/new', auth)
+        self.assertEqual(api.get_metadata('/a/new', auth).json_body()['id'], 'id-new')
+        methods = [r.method for r in self.adapter.requests]
+        self.assertEqual(methods, ['GET', 'POST'])
+
+    def test_invalidate_subtree(self):
+        cache.configure()
+        res = api.get_metadata('/a', auth)
+        for p in ('/a', '/a/b', '/A/b/c', '/a-b', '/a0', '/ab'):
+            cache.store(p, None, res)
+            cache.store(p, 'id', res)
+        self.assertIsNotNone(cache.lookup('/a/B', 'id'))  # case insensitive
+        cache.invalidate('/a/b/c/d')
+        self.assertIsNone(cache.lookup('/a/b/c'))  # the parent
+        self.assertIsNotNone(cache.lookup('/a/b'))
+        cache.invalidate('/A')
+        self.assertEqual([p for p in ('/a', '/a/b/c', '/a-b', '/a0', '/ab') if cache.lookup(p) is not None],
+                         ['/a-b', '/a0', '/ab'])
+        self.assertEqual(cache.get_cache().paths, ['/a-b', '/a0', '/ab'])
+        cache.invalidate('/a0')
+        self.assertEqual(cache.get_cache().paths, ['/a-b', '/ab'])
+
+    def test_ttl(self):
+        cache.get_cache().ttl = 0.01
+        api.get_metadata('/a', auth)
+        time.sleep(0.02)
+        self.assertFalse(cache.lookup('/a')[2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from onedrive import cli
+from onedrive import session
+from helpers import FakeDrive, mount
+
+auth = {'Authorization': 'bearer xyz'}
+
+
+class TestCli(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.drive = FakeDrive()
+        mount(session.get_session(), self.drive)
+        self.drive.mkdir('/docs')
+        self.drive.put('/docs/a.txt', b'aaa')
+
+    def tearDown(self):
+        session.close()
+        self.dir.cleanup()
+
+    def run_cli(self, *argv):
+        out, err = io.StringIO(), io.StringIO()
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+            code = cli.main(list(argv), header=auth)
+        return code, out.getvalue(), err.getvalue()
+
+    def test_ls_and_stat(self):
+        self.assertEqual(self.run_cli('ls', '/'), (0, 'docs/\n', ''))
+        code, out, _ = self.run_cli('ls', '-l', '-R', '/')
+        self.assertIn('/docs/a.txt', out)
+        code, out, _ = self.run_cli('stat', '/docs/a.txt')
+        self.assertIn('"size": 3', out)
+        code, _, err = self.run_cli('ls', '/missing')
+        self.assertEqual(code, 1)
+        self.assertIn('no such file', err)
+
+    def test_mkdir_cp_mv_rm(self):
+        self.assertEqual(self.run_cli('mkdir', '-p', '/x/y', '/x/z')[0], 0)
+        self.assertIn('/x/z', self.drive.items)
+        self.assertEqual(self.run_cli('cp', '/docs/a.txt', '/x')[0], 0)
+        self.assertEqual(self.drive.contents['/x/a.txt'], b'aaa')
+        self.assertEqual(self.run_cli('mv', '/x/a.txt', '/x/y/b.txt')[0], 0)
+        self.assertEqual(self.drive.contents['/x/y/b.txt'], b'aaa')
+        self.assertEqual(self.run_cli('rm', '--dry-run', '/x'), (0, 'rm /x\n', ''))
+        self.assertEqual(self.run_cli('rm', '/x', '/docs/a.txt')[0], 0)
+        self.assertNotIn('/x', self.drive.items)
+        self.assertEqual(self.run_cli('rm', '/x')[0], 1)
+        self.assertEqual(self.run_cli('rm', '-f', '/x')[0], 0)
+
+    def test_put_get_sync(self):
+        src = os.path.join(self.dir.name, 'src')
+        os.makedirs(os.path.join(src, 'sub'))
+        for name, content in (('f1', b'1'), ('sub/f2', b'22')):
+            with open(os.path.join(src, name), 'wb') as f:
+                f.write(content)
+
+        code, out, _ = self.run_cli('sync', '--dry-run', src, '/up')
+        self.assertEqual(out.count('put '), 2)
+        self.assertEqual(self.run_cli('put', '-j', '2', src, '/up')[0], 0)
+        self.assertEqual(self.drive.contents['/up/sub/f2'], b'22')
+        self.assertEqual(self.run_cli('sync', '--dry-run', src, '/up')[1], '')
+
+        dst = os.path.join(self.dir.name, 'dst')
+        self.assertEqual(self.run_cli('get', '/up', dst)[0], 0)
+        with open(os.path.join(dst, 'sub', 'f2'), 'rb') as f:
+            self.assertEqual(f.read(), b'22')
+        self.assertEqual(self.run_cli('get', '--resume', '/docs/a.txt', dst)[0], 0)
+        with open(os.path.join(dst, 'a.txt'), 'rb') as f:
+            self.assertEqual(f.read(), b'aaa')
+
+        with open(os.path.join(dst, 'sub', 'f2'), 'wb') as f:
+            f.write(b'2')  # an interrupted download of a tree
+        self.assertEqual(self.run_cli('get', '--resume', '/up', dst)[0], 0)
+        with open(os.path.join(dst, 'sub', 'f2'), 'rb') as f:
+            self.assertEqual(f.read(), b'22')
+        self.assertEqual(self.run_cli('put', '--resume', src, '/up2')[0], 0)
+        self.assertEqual(self.drive.contents['/up2/sub/f2'], b'22')
+
+    def test_sync_both(self):
+        local = os.path.join(self.dir.name, 'local')
+        os.makedirs(local)
+        with open(os.path.join(local, 'b.txt'), 'wb') as f:
+            f.write(b'bb')
+        code, out, _ = self.run_cli('sync', '--both', '--dry-run', local, '/docs')
+        self.assertEqual(sorted(out.splitlines()), ['download a.txt', 'upload b.txt'])
+        code, out, _ = self.run_cli('sync', '--both', local, '/docs')
+        self.assertEqual((code, out), (0, 'sync: 2 done, 0 failed, 0 conflicts\n'))
+        self.assertEqual(self.drive.contents['/docs/b.txt'], b'bb')
+        self.assertTrue(os.path.isfile(os.path.join(local, 'a.txt')))
+
+    def test_size(self):
+        self.assertEqual(cli._size('10M'), 10 * 1024 * 1024)
+        self.assertEqual(cli._size('320KiB'), 320 * 1024)
+        self.assertEqual(cli._size('1000'), 1000)
+
+    def test_lazy_imports(self):
+        code = "import sys; from onedrive import cli; print('requests' in sys.modules)"
+        out = subprocess.check_output([sys.executable, '-c', code],
+                                      cwd=os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+        self.assertEqual(out.strip(), b'False')
+
+
+if __name__ == '__main__':
+    unittest.main()
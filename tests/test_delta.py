@@ -0,0 +1,53 @@
+import os
+import tempfile
+import unittest
+from onedrive import delta
+from onedrive import session
+from helpers import FakeDelta, delta_item as item, mount
+
+auth = {'Authorization': 'bearer xyz'}
+
+
+def service():
+    """the whole drive in two pages, then b is deleted and c renamed"""
+    return FakeDelta([[{'id': 'r', 'root': {}, 'folder': {}}, item('a', 'a', 'r', True), item('b', 'b.txt', 'r')],
+                      [item('c', 'c.txt', 'a')]],
+                     [[{'id': 'b', 'deleted': {}}, item('c', 'd.txt', 'a', size=5)]])
+
+
+class TestDelta(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.state = os.path.join(self.dir.name, 'index.json')
+        self.service = service()
+        self.adapter = mount(session.get_session(), self.service)
+
+    def tearDown(self):
+        session.close()
+        self.dir.cleanup()
+
+    def test_initial_and_incremental(self):
+        d = delta.DeltaSync(self.state, auth)
+        self.assertEqual(len(d.sync()), 4)
+        self.assertEqual(d.path('c'), '/a/c.txt')
+        self.assertEqual(d.link, 't1')
+
+        d = delta.DeltaSync(self.state, auth)  # reloaded from disk
+        self.assertEqual(d.sync(), [('deleted', 'b'), ('changed', 'c')])
+        self.assertEqual(d.path('c'), '/a/d.txt')
+        self.assertEqual(d.get('/a/d.txt')[1]['size'], 5)
+        self.assertIsNone(d.get('/b.txt'))
+        self.assertEqual(d.get('/')[0], 'r')
+        self.assertTrue(self.adapter.requests[-1].url.endswith('token=t1'))
+
+    def test_resync(self):
+        d = delta.DeltaSync(self.state, auth)
+        d.sync()
+        self.service.expired = True
+        self.assertEqual(len(d.sync()), 4)
+        self.assertEqual(d.link, 't1')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import io
+import os
+import re
+import tempfile
+import unittest
+from unittest import mock
+
+import requests
+from onedrive import download
+from onedrive import session
+from onedrive import throttle
+from helpers import mount
+
+auth = {'Authorization': 'bearer xyz'}
+content = os.urandom(100000)
+
+
+def service(request):
+    """the api redirects to a pre-authenticated url which supports ranges"""
+    if request.url.endswith(':/content'):
+        return 302, {'Location': 'https://dl.example/file'}, ''
+    if '/drive/root:' in request.url:
+        return 200, {}, {'size': len(content)}
+    assert 'Authorization' not in request.headers
+    rng = request.headers.get('Range')
+    if not rng:
+        return 200, {}, content
+    start, end = re.match(r'bytes=(\d+)-(\d*)', rng).groups()
+    start, end = int(start), int(end) if end else len(content) - 1
+    if start >= len(content):
+        return 416, {}, ''
+    return 206, {}, content[start:end + 1]
+
+
+class TestDownload(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.dst = os.path.join(self.dir.name, 'file.bin')
+        self.adapter = mount(session.get_session(), service)
+
+    def tearDown(self):
+        session.close()
+        self.dir.cleanup()
+
+    def read(self):
+        with open(self.dst, 'rb') as f:
+            return f.read()
+
+    def test_download_url(self):
+        self.assertEqual(download.download_url('/file.bin', auth), 'https://dl.example/file')
+
+    def test_file_object(self):
+        buf = io.BytesIO()
+        res = download.download_to('/file.bin', buf, auth, chunk_size=4096)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(buf.getvalue(), content)
+
+    def test_resume(self):
+        with open(self.dst, 'wb') as f:
+            f.write(content[:30000])
+        res = download.download_to('/file.bin', self.dst, auth, resume=True)
+        self.assertEqual(res.status_code, 206)
+        self.assertEqual(self.read(), content)
+
+        res = download.download_to('/file.bin', self.dst, auth, resume=True)
+        self.assertEqual(res.status_code, 416)
+        self.assertEqual(self.read(), content)
+
+    def test_segments(self):
+        res = download.download_to('/file.bin', self.dst, auth, segments=7)
+        self.assertEqual(res.status_code, 206)
+        self.assertEqual(self.read(), content)
+        ranges = [r.headers['Range'] for r in self.adapter.requests if 'Range' in r.headers]
+        self.assertEqual(len(ranges), 7)
+
+    def test_responses_are_closed_on_errors(self):
+        throttle.configure(max_retries=0)
+        self.addCleanup(throttle.configure)
+        closed = []
+        with mock.patch.object(requests.Response, 'close', autospec=True, side_effect=closed.append):
+            def failing(request):  # one segment fails
+                if request.headers.get('Range', '').startswith('bytes=0-'):
+                    return 500, {}, {'error': {'code': 'generalException'}}
+                return service(request)
+
+            mount(session.get_session(), failing)
+            res = download.download_to('/file.bin', self.dst, auth, segments=4)
+            self.assertEqual(res.status_code, 500)
+
+            class Full(io.BytesIO):
+                def write(self, data):
+                    raise OSError('disk full')
+
+            mount(session.get_session(), service)
+            with self.assertRaises(OSError):
+                download.download_to('/file.bin', Full(), auth)
+        downloads = [r for r in closed if r.url == 'https://dl.example/file']
+        self.assertEqual(len(downloads), 4 + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import base64
+import hashlib
+import os
+import tempfile
+import unittest
+from onedrive import hashes
+from onedrive import session
+from onedrive import transfer
+from helpers import FakeDrive, mount
+
+auth = {'Authorization': 'bearer xyz'}
+
+
+def reference_quick_xor(data):
+    """straight port of the reference implementation, one byte at a time"""
+    cells = [0, 0, 0]
+    shift_so_far = 0
+    vector_index, vector_offset = 0, 0
+    for i, b in enumerate(data):
+        is_last = vector_index == 2
+        bits = 32 if is_last else 64
+        if vector_offset <= bits - 8:
+            cells[vector_index] ^= b << vector_offset
+        else:
+            cells[vector_index] ^= (b << vector_offset) & ((1 << 64) - 1)
+            cells[0 if is_last else vector_index + 1] ^= b >> (bits - vector_offset)
+        vector_offset += 11
+        while vector_offset >= bits:
+            vector_index = 0 if is_last else vector_index + 1
+            vector_offset -= bits
+            is_last = vector_index == 2
+            bits = 32 if is_last else 64
+    out = bytearray(cells[0].to_bytes(8, 'little') + cells[1].to_bytes(8, 'little')
+                    + (cells[2] & 0xFFFFFFFF).to_bytes(4, 'little'))
+    for i, b in enumerate(len(data).to_bytes(8, 'little')):
+        out[12 + i] ^= b
+    return base64.b64encode(bytes(out)).decode('ascii')
+
+
+class TestHashes(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        session.close()
+        self.dir.cleanup()
+
+    def write(self, name, content):
+        path = os.path.join(self.dir.name, name)
+        with open(path, 'wb') as f:
+            f.write(content)
+        return path
+
+    def test_quick_xor(self):
+        self.assertEqual(hashes.QuickXorHash().b64digest(), 'AAAAAAAAAAAAAAAAAAAAAAAAAAA=')
+        for n in (1, 159, 160, 161, 320, 1000, 5003):
+            data = os.urandom(n)
+            h = hashes.QuickXorHash()
+            h.update(data)
+            self.assertEqual(h.b64digest(), reference_quick_xor(data), n)
+
+    def test_quick_xor_blocks(self):
+        data = os.urandom(10000)
+        h = hashes.QuickXorHash()
+        for start in range(0, len(data), 777):
+            h.update(data[start:start + 777])
+        self.assertEqual(h.b64digest(), reference_quick_xor(data))
+
+    def test_file_hashes(self):
+        data = os.urandom(300000)
+        path = self.write('a.bin', data)
+        h = hashes.file_hashes(path)
+        self.assertEqual(h['sha1Hash'], hashlib.sha1(data).hexdigest().upper())
+        self.assertEqual(h['quickXorHash'], reference_quick_xor(data))
+
+        old = hashes.mmap_threshold
+        hashes.mmap_threshold = 0
+        try:
+            self.assertEqual(hashes.file_hashes(path), h)
+        finally:
+            hashes.mmap_threshold = old
+
+    def test_cache_and_pool(self):
+        paths = [self.write('f{}'.format(i), os.urandom(1000 + i)) for i in range(4)]
+        cache = hashes.HashCache(os.path.join(self.dir.name, 'hashes.json'))
+        result = hashes.hash_files(paths, cache, workers=2)
+        self.assertEqual(result[paths[0]], hashes.file_hashes(paths[0]))
+
+        cache = hashes.HashCache(os.path.join(self.dir.name, 'hashes.json'))  # reloaded
+        self.assertEqual(cache.get(paths[1]), result[paths[1]])
+        self.write('f1', b'changed')
+        self.assertIsNone(cache.get(paths[1]))
+
+    def test_put_file_skips_unchanged(self):
+        drive = FakeDrive()
+        adapter = mount(session.get_session(), drive)
+        path = self.write('a.txt', b'abc')
+        self.assertEqual(transfer.put_file(path, '/a.txt', auth).status_code, 201)
+        self.assertIsNone(transfer.put_file(path, '/a.txt', auth))
+        self.write('a.txt', b'abd')
+        self.assertEqual(transfer.put_file(path, '/a.txt', auth).status_code, 200)
+        self.assertEqual(sum(1 for r in adapter.requests if r.method == 'PUT'), 2)
+
+        self.write('a.txt', b'abe')  # same size, the service reports no hash: uploaded
+        del drive.items['/a.txt']['file']['hashes']
+        self.assertEqual(transfer.put_file(path, '/a.txt', auth).status_code, 200)
+        self.assertFalse(hashes.same_content(path, {'size': 3, 'file': {'hashes': {'sha1Hash': None}}}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import datetime
+import os
+import tempfile
+import threading
+import unittest
+from onedrive import index
+from onedrive import session
+from helpers import FakeDelta, FakeDrive, delta_item as item, mount
+
+auth = {'Authorization': 'bearer xyz'}
+
+
+def service():
+    """the whole drive, then a is renamed, b deleted and d added"""
+    return FakeDelta([[{'id': 'r', 'root': {}, 'folder': {}}, item('a', 'a', 'r', True), item('b', 'b.txt', 'r', size=3),
+                       item('c', 'c.txt', 'a', size=2 ** 31, lastModifiedDateTime='2017-01-02T03:04:05Z')]],
+                     [[item('a', 'renamed', 'r', True), {'id': 'b', 'deleted': {}}, item('d', 'new.txt', 'a', size=7)]])
+
+
+class TestIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.idx = index.Index(os.path.join(self.dir.name, 'drive.db'))
+
+    def tearDown(self):
+        self.idx.close()
+        session.close()
+        self.dir.cleanup()
+
+    def test_refresh(self):
+        fake = service()
+        mount(session.get_session(), fake)
+        self.assertEqual(self.idx.refresh(auth), 4)
+        self.assertEqual(self.idx.get('/a/c.txt')['size'], 2 ** 31)
+        self.assertEqual(self.idx.get('/b.txt')['sha1'], 'Sb')
+        self.assertEqual([i['path'] for i in self.idx.find('/', min_size=1024 ** 3)], ['/a/c.txt'])
+        self.assertEqual([i['name'] for i in self.idx.children('/')], ['a', 'b.txt'])
+
+        self.assertEqual(self.idx.refresh(auth), 3)
+        self.assertIsNone(self.idx.get('/b.txt'))
+        self.assertEqual(self.idx.get('/renamed/c.txt')['id'], 'c')  # moved along with its folder
+        self.assertEqual(self.idx.get('/renamed/new.txt')['size'], 7)
+        self.assertEqual(self.idx.state('delta_link'), 't2')
+
+        fake.expired = True
+        self.idx.refresh(auth)
+        self.assertEqual(self.idx.get('/a/c.txt')['id'], 'c')
+        self.assertIsNone(self.idx.get('/renamed'))
+
+    def test_queries_during_refresh(self):
+        mount(session.get_session(), service())
+        self.idx.refresh(auth)
+        answers = []
+
+        def slow(request):  # another thread queries while the changes are fetched
+            t = threading.Thread(target=lambda: answers.append(self.idx.get('/b.txt')))
+            t.start()
+            t.join(5)
+            return service()(request)
+
+        mount(session.get_session(), slow)
+        self.assertEqual(self.idx.refresh(auth), 3)
+        self.assertEqual([a['id'] for a in answers], ['b'])
+        self.assertIsNone(self.idx.get('/b.txt'))
+
+    def test_persistent(self):
+        mount(session.get_session(), service())
+        self.idx.refresh(auth)
+        self.idx.close()
+        self.idx = index.Index(os.path.join(self.dir.name, 'drive.db'))
+        self.assertEqual(self.idx.get('/a')['folder'], 1)
+        self.assertEqual(self.idx.state('delta_link'), 't1')
+
+    def test_crawl_and_find(self):
+        drive = FakeDrive()
+        mount(session.get_session(), drive)
+        drive.mkdir('/archive')
+        drive.mkdir('/archive/2016')
+        drive.put('/archive/2016/big.jpg', b'x' * 100)
+        drive.put('/archive/2016/small.jpg', b'x')
+        drive.put('/archive/notes.txt', b'xx')
+        drive.put('/other.jpg', b'x' * 200)
+        self.assertEqual(self.idx.crawl('/', auth), 6)
+
+        find = lambda **kw: [i['path'] for i in self.idx.find(**kw)]  # noqa: E731
+        self.assertEqual(find(under='/archive', min_size=50), ['/archive/2016/big.jpg'])
+        self.assertEqual(find(glob='*.jpg', order_by='size DESC'),
+                         ['/other.jpg', '/archive/2016/big.jpg', '/archive/2016/small.jpg'])
+        self.assertEqual(find(under='/archive', folders=True), ['/archive/2016'])
+        self.assertEqual(find(under='/arch'), [])
+        self.assertEqual(len(find(limit=2)), 2)
+        with self.assertRaises(ValueError):
+            self.idx.find(order_by='size; DROP TABLE items')
+
+        del drive.items['/archive/notes.txt']
+        self.idx.crawl('/archive', auth)
+        self.assertIsNone(self.idx.get('/archive/notes.txt'))
+        self.assertIsNotNone(self.idx.get('/other.jpg'))
+        self.idx.remove('/archive')
+        self.assertEqual(find(), ['/other.jpg'])
+
+    def test_modified(self):
+        self.idx.add([item('x', 'x', 'r', lastModifiedDateTime='2016-05-01T00:00:00Z',
+                           parentReference={'id': 'r', 'path': '/drive/root:/docs'})])
+        self.assertEqual(self.idx.get('/docs/x')['id'], 'x')
+        after = datetime.datetime(2016, 1, 1, tzinfo=datetime.timezone.utc)
+        self.assertEqual(len(self.idx.find(modified_after=after)), 1)
+        self.assertEqual(len(self.idx.find(modified_before='2016-02-01')), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import datetime
+import unittest
+from onedrive import api
+from onedrive import items
+from onedrive import session
+from helpers import FakeDrive, mount
+
+auth = {'Authorization': 'bearer xyz'}
+
+meta = {'id': 'F1', 'name': 'a.jpg', 'size': 12, 'eTag': 'e1', 'cTag': 'c1',
+        'createdDateTime': '2016-03-21T20:01:37.343Z', 'lastModifiedDateTime': '2016-03-22T08:00:00Z',
+        'parentReference': {'id': 'P', 'path': '/drive/root:/photos/2016'},
+        'file': {'mimeType': 'image/jpeg', 'hashes': {'sha1Hash': 'ABC', 'quickXorHash': 'q=='}},
+        'image': {'width': 100, 'height': 100}, '@content.downloadUrl': 'https://x'}
+
+
+class TestDriveItem(unittest.TestCase):
+
+    def test_from_json(self):
+        item = items.DriveItem(meta)
+        self.assertEqual((item.id, item.name, item.size, item.etag, item.ctag), ('F1', 'a.jpg', 12, 'e1', 'c1'))
+        self.assertEqual((item.sha1, item.quick_xor, item.mime_type), ('ABC', 'q==', 'image/jpeg'))
+        self.assertEqual((item.parent_id, item.path), ('P', '/photos/2016/a.jpg'))
+        self.assertTrue(item.is_file)
+        self.assertFalse(item.is_dir)
+        self.assertFalse(hasattr(item, '__dict__'))
+        self.assertTrue(api.is_file_meta(item))
+
+    def test_timestamps(self):
+        item = items.DriveItem(meta)
+        utc = datetime.timezone.utc
+        self.assertEqual(item.created, datetime.datetime(2016, 3, 21, 20, 1, 37, 343000, tzinfo=utc))
+        self.assertIs(item.created, item.created)  # parsed once
+        self.assertEqual(item.modified, datetime.datetime(2016, 3, 22, 8, tzinfo=utc))
+        self.assertIsNone(items.DriveItem({'id': 'x'}).modified)
+        self.assertEqual(items.parse_timestamp('2016-03-21T20:01:37.1234567Z').microsecond, 123456)
+
+    def test_folders(self):
+        root = items.DriveItem({'id': 'r', 'name': 'root', 'root': {}, 'folder': {'childCount': 2}})
+        self.assertEqual((root.path, root.child_count), ('/', 2))
+        self.assertTrue(root.is_dir and api.is_dir_meta(root))
+        sub = items.DriveItem({'id': 'd', 'name': 'd', 'folder': {}, 'parentReference': {'path': '/drive/root:'}})
+        self.assertEqual(sub.path, '/d')
+
+    def test_parent_paths_interned(self):
+        ref = lambda: {'path': ''.join(['/drive/root:/photos', '/2016'])}  # equal, not identical strings
+        a = items.DriveItem({'name': 'a', 'parentReference': ref()})
+        b = items.DriveItem({'name': 'b', 'parentReference': ref()})
+        self.assertIs(a.parent_path, b.parent_path)
+
+
+class TestProjection(unittest.TestCase):
+
+    def setUp(self):
+        self.drive = FakeDrive()
+        self.adapter = mount(session.get_session(), self.drive)
+        self.drive.mkdir('/photos')
+        for i in range(5):
+            self.drive.put('/photos/{}.jpg'.format(i), b'x' * i)
+        self.drive.mkdir('/photos/sub')
+
+    def tearDown(self):
+        session.close()
+
+    def test_get_item(self):
+        item = api.get_item('/photos/3.jpg', auth)
+        self.assertEqual((item.path, item.size), ('/photos/3.jpg', 3))
+        self.assertIn('select=' + items.fields, self.adapter.requests[-1].url)
+        self.assertIsNone(api.get_item('/nothing', auth))
+
+    def test_iter_items(self):
+        children = list(api.iter_items('/photos', auth, max_results=2))
+        self.assertEqual([c.name for c in children], ['0.jpg', '1.jpg', '2.jpg', '3.jpg', '4.jpg', 'sub'])
+        self.assertTrue(all(isinstance(c, items.DriveItem) for c in children))
+        self.assertTrue(all('select=' in r.url for r in self.adapter.requests))
+
+    def test_select(self):
+        value = api.list_children('/photos', auth, select='name,size').json_body()['value']
+        self.assertEqual(value[0], {'name': '0.jpg', 'size': 0})
+
+        tree = {p: (folders, files) for p, folders, files in api.walk('/', auth, select='size')}
+        self.assertEqual([f['name'] for f in tree['/photos'][0]], ['sub'])
+        self.assertEqual(set(tree['/photos'][1][1]), {'name', 'size'})
+
+        tree = {p: (folders, files) for p, folders, files in api.walk('/', auth, compact=True)}
+        self.assertEqual(sorted(tree), ['/', '/photos', '/photos/sub'])
+        self.assertEqual(tree['/photos'][1][4].path, '/photos/4.jpg')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import os
+import tempfile
+import threading
+import unittest
+from concurrent.futures import CancelledError
+from onedrive import jobs
+from onedrive import json_io
+from onedrive import session
+from helpers import mount
+
+auth = {'Authorization': 'bearer xyz'}
+
+
+class FakeMonitor:
+    """job n completes after n polls, jobs named 'fail' fail, 'gone' is 404, 'done' completes without percentage"""
+
+    def __init__(self):
+        self.polls = {}
+        self.lock = threading.Lock()
+
+    def __call__(self, request):
+        name = request.url.rsplit('/', 1)[1]
+        with self.lock:
+            self.polls[name] = self.polls.get(name, 0) + 1
+            polls = self.polls[name]
+        if name == 'gone':
+            return 404, {}, {'error': {'code': 'itemNotFound'}}
+        if name == 'done':
+            return 200, {}, {'status': 'completed'}
+        if name == 'stuck':
+            return 202, {}, {'status': 'inProgress', 'percentageComplete': 10.0}
+        if name == 'fail':
+            return 200, {}, {'status': 'failed', 'percentageComplete': 10.0}
+        if polls >= int(name):
+            return 200, {}, {'status': 'completed', 'percentageComplete': 100.0}
+        return 202, {}, {'status': 'inProgress', 'percentageComplete': 10.0 * polls}
+
+
+class TestJobs(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.state = os.path.join(self.dir.name, 'jobs.json')
+        self.monitor = FakeMonitor()
+        mount(session.get_session(), self.monitor)
+
+    def tearDown(self):
+        session.close()
+        self.dir.cleanup()
+
+    def test_many_jobs(self):
+        tracker = jobs.JobTracker(auth, workers=8, min_delay=0.001)
+        done = []
+        futures = [tracker.add('https://mon/{}'.format(n), callback=done.append) for n in (1, 3, 2, 4) * 25]
+        self.assertTrue(tracker.wait(timeout=10))
+        tracker.close()
+        self.assertEqual(len(done), 100)
+        self.assertTrue(all(f.result().status == 'completed' for f in futures))
+        self.assertEqual(self.monitor.polls['4'], 4)  # the same location is tracked once
+
+    def test_failed(self):
+        tracker = jobs.JobTracker(auth, min_delay=0.001)
+        future = tracker.add('https://mon/fail', name='/dst')
+        with self.assertRaises(jobs.JobFailed):
+            future.result(timeout=5)
+        tracker.close()
+
+    def test_gone_done_and_stuck(self):
+        tracker = jobs.JobTracker(auth, min_delay=0.001, max_delay=0.01, timeout=0.2)
+        gone, done, stuck = (tracker.add('https://mon/' + n) for n in ('gone', 'done', 'stuck'))
+        with self.assertRaises(IOError):
+            gone.result(timeout=5)
+        self.assertEqual(done.result(timeout=5).status, 'completed')
+        with self.assertRaises(jobs.JobFailed):
+            stuck.result(timeout=5)
+        tracker.close()
+        self.assertEqual(self.monitor.polls['gone'], 1)
+
+    def test_resume(self):
+        json_io.save([{'location': 'https://mon/2', 'name': '/x'}], self.state)
+        tracker = jobs.JobTracker(auth, state_file=self.state, min_delay=0.001)
+        self.assertTrue(tracker.wait(timeout=5))
+        tracker.close()
+        self.assertEqual(json_io.load(self.state), [])
+
+    def test_state_kept_on_close(self):
+        tracker = jobs.JobTracker(auth, state_file=self.state, min_delay=60)
+        future = tracker.add('https://mon/5', name='/y')
+        tracker.close()
+        self.assertEqual(json_io.load(self.state), [{'location': 'https://mon/5', 'name': '/y'}])
+        self.assertTrue(future.cancelled())  # nobody waits forever for it
+        with self.assertRaises(CancelledError):
+            future.result(timeout=1)
+        self.assertFalse(tracker.wait())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import re
+import unittest
+from urllib.parse import unquote
+from onedrive import api
+from onedrive import session
+from helpers import mount
+
+auth = {'Authorization': 'bearer xyz'}
+
+tree = {
+    '/': ['a/', 'b/', 'f1'],
+    '/a': ['c/', 'f2', 'f3'],
+    '/a/c': ['f4'],
+    '/b': [],
+}
+
+
+def service(request):
+    """serves the tree above, one child per page"""
+    url = unquote(request.url)
+    m = re.search(r'/drive/root(?::(.*):)?/children\?top=\d+(?:&skip=(\d+))?', url)
+    path = m.group(1) or '/'
+    if path not in tree:
+        return 404, {}, {'error': {'code': 'itemNotFound'}}
+    skip = int(m.group(2) or 0)
+    names = tree[path]
+    value = [{'name': n.rstrip('/'), 'folder': {}} if n.endswith('/') else {'name': n, 'file': {}}
+             for n in names[skip:skip + 1]]
+    body = {'value': value}
+    if skip + 1 < len(names):
+        body['@odata.nextLink'] = re.sub(r'&skip=\d+', '', url) + '&skip=' + str(skip + 1)
+    return 200, {}, body
+
+
+class TestListing(unittest.TestCase):
+
+    def setUp(self):
+        self.adapter = mount(session.get_session(), service)
+
+    def tearDown(self):
+        session.close()
+
+    def test_iter_children_is_lazy(self):
+        it = api.iter_children('/a', auth)
+        self.assertEqual(next(it)['name'], 'c')
+        self.assertEqual(len(self.adapter.requests), 1)
+        self.assertEqual([i['name'] for i in it], ['f2', 'f3'])
+        self.assertEqual(len(self.adapter.requests), 3)
+
+    def test_iter_children_error(self):
+        with self.assertRaises(IOError):
+            list(api.iter_children('/missing', auth))
+        self.assertEqual(api.list_children('/missing', auth).status_code, 404)
+
+    def test_list_children(self):
+        res = api.list_children('/', auth)
+        self.assertEqual([i['name'] for i in res.json_body()['value']], ['a', 'b', 'f1'])
+
+    def test_walk(self):
+        result = {p: ([d['name'] for d in dirs], [f['name'] for f in files])
+                  for p, dirs, files in api.walk('/', auth, workers=3)}
+        self.assertEqual(result, {
+            '/': (['a', 'b'], ['f1']),
+            '/a': (['c'], ['f2', 'f3']),
+            '/a/c': ([], ['f4']),
+            '/b': ([], []),
+        })
+
+    def test_walk_prune(self):
+        paths = []
+        for p, dirs, files in api.walk('/', auth):
+            paths.append(p)
+            dirs[:] = [d for d in dirs if d['name'] != 'a']
+        self.assertEqual(sorted(paths), ['/', '/b'])
+
+    def test_walk_onerror(self):
+        errors = []
+        self.assertEqual(list(api.walk('/missing', auth, onerror=errors.append)), [])
+        self.assertEqual(len(errors), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+from onedrive import api
+from onedrive import session
+from helpers import FakeDrive, mount
+
+auth = {'Authorization': 'bearer xyz'}
+
+
+class TestMakedirs(unittest.TestCase):
+
+    def setUp(self):
+        self.drive = FakeDrive()
+        self.adapter = mount(session.get_session(), self.drive)
+
+    def tearDown(self):
+        session.close()
+
+    def methods(self):
+        return [r.method for r in self.adapter.requests]
+
+    def test_new_tree(self):
+        paths = ['/a/b/c', '/a/b/d', '/a/e', '/x/']
+        created = set()
+        ids = api.makedirs(paths, auth, created=created)
+        for p in ('/a', '/a/b', '/a/b/c', '/a/b/d', '/a/e', '/x'):
+            self.assertEqual(ids[p], self.drive.items[p]['id'])
+            self.assertIn('folder', self.drive.items[p])
+        self.assertEqual(created, {'/a', '/a/b', '/a/b/c', '/a/b/d', '/a/e', '/x'})
+        # the two top level dirs are probed in one batch, everything below a missing dir is created without probing
+        self.assertEqual(self.methods().count('GET'), 0)
+        self.assertEqual(self.methods().count('POST'), 1 + 6)
+        self.assertTrue(self.adapter.requests[0].url.endswith('/$batch'))
+
+    def test_partly_existing(self):
+        self.drive.mkdir('/a')
+        self.drive.mkdir('/a/b')
+        created = set()
+        ids = api.makedirs(['/a/b/c/d', '/a/b'], auth, created=created)
+        self.assertEqual(created, {'/a/b/c', '/a/b/c/d'})
+        self.assertEqual(ids['/a/b'], self.drive.items['/a/b']['id'])
+        self.assertEqual(self.methods().count('GET'), 3)  # /a, /a/b, /a/b/c
+
+        self.adapter.requests.clear()
+        api.makedirs(['/a/b/c/d'], auth)
+        self.assertEqual(self.methods(), ['GET'] * 4)
+
+    def test_siblings_are_probed_in_one_batch(self):
+        self.drive.mkdir('/p')
+        self.drive.mkdir('/p/d1')
+        self.drive.put('/p/f', b'1')
+        paths = ['/p/d{}'.format(i) for i in range(api._list_threshold - 1)]
+        ids = api.makedirs(paths, auth)
+        self.assertEqual(ids['/p/d1'], self.drive.items['/p/d1']['id'])
+        # probe /p, probe its children in one batch, create the missing ones
+        self.assertEqual(self.methods(), ['GET', 'POST'] + ['POST'] * (len(paths) - 1))
+        with self.assertRaises(IOError):
+            api.makedirs(['/p/d1', '/p/f'], auth)
+
+    def test_many_siblings_are_listed(self):
+        self.drive.mkdir('/p')
+        self.drive.mkdir('/p/d0')
+        paths = ['/p/d{}'.format(i) for i in range(api._list_threshold)]
+        ids = api.makedirs(paths, auth)
+        self.assertEqual(len(ids), len(paths) + 2)
+        # probe /p, list /p once, create the missing siblings
+        self.assertEqual(self.methods().count('GET'), 2)
+        self.assertEqual(self.methods().count('POST'), len(paths) - 1)
+
+    def test_file_in_the_way(self):
+        self.drive.put('/f', b'1')
+        with self.assertRaises(IOError):
+            api.makedirs(['/f/g'], auth)
+
+    def test_mkdir_parents(self):
+        res = api.mkdir('/m/n/o', auth, parents=True)
+        self.assertEqual(res.status_code, 201)
+        self.assertIn('/m/n/o', self.drive.items)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import logging
+import os
+import tempfile
+import unittest
+from onedrive import api
+from onedrive import metrics
+from onedrive import session
+from onedrive import throttle
+from helpers import FakeDrive, mount
+
+auth = {'Authorization': 'bearer xyz'}
+
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.drive = FakeDrive()
+        self.adapter = mount(session.get_session(), self.drive)
+        self.stats = metrics.enable()
+        self.addCleanup(metrics.disable)
+
+    def tearDown(self):
+        session.close()
+
+    def test_disabled(self):
+        metrics.disable()
+        api.mkdir('/a', auth)
+        self.assertIsNone(metrics.get_metrics())
+        self.assertEqual(self.stats.snapshot(), {})
+
+    def test_nested_requests_count_for_outer_operation(self):
+        api.mkdir('/a/b/c', auth, parents=True)
+        s = self.stats.snapshot()
+        self.assertEqual(list(s), ['mkdir'])
+        self.assertEqual(s['mkdir']['calls'], 1)
+        self.assertEqual(s['mkdir']['requests'], len(self.adapter.requests))
+        self.assertEqual(s['mkdir']['latency']['count'], 1)
+        self.assertEqual(s['mkdir']['request_latency']['count'], len(self.adapter.requests))
+
+    def test_bytes_and_pages(self):
+        api.upload_simple(b'12345', '/f', auth)
+        for i in range(5):
+            self.drive.mkdir('/d' + str(i))
+        api.list_children('/', auth, max_results=2)
+        list(api.iter_children('/', auth, max_results=2))
+        s = self.stats.snapshot()
+        self.assertEqual(s['upload_simple']['bytes_sent'], 5)
+        self.assertGreater(s['upload_simple']['bytes_received'], 0)
+        self.assertEqual(s['list_children']['requests'], 3)
+        self.assertEqual(s['iter_children']['requests'], 3)
+        self.assertEqual(s['iter_children']['calls'], 1)  # the whole iteration
+        metrics.disable()
+        self.assertEqual(api.iter_children('/', auth).gi_code.co_name, 'iter_children')  # not wrapped
+        self.assertEqual(s['list_children']['status'], {200: 3})
+
+    def test_retries_and_throttling(self):
+        throttle.configure(max_retries=3, backoff=0.001, min_rate=1000)
+        self.addCleanup(throttle.configure)
+        codes = [429, 500]
+        mount(session.get_session(), lambda r: (codes.pop(0), {}, '') if codes else (200, {}, {'id': '1'}))
+        api.get_metadata('/x', auth)
+        s = self.stats.snapshot()['get_metadata']
+        self.assertEqual((s['requests'], s['retries'], s['throttled']), (3, 2, 1))
+
+    def test_errors(self):
+        mount(session.get_session(), lambda r: (200, {}, 'no json'))
+        with self.assertRaises(Exception):
+            api.mkdir('/a', auth)
+        self.assertEqual(self.stats.snapshot()['mkdir']['errors'], 1)
+
+    def test_exporters(self):
+        api.get_metadata('/', auth)
+        text = metrics.prometheus_text(self.stats)
+        self.assertIn('onedrive_requests_total{operation="get_metadata"} 1', text)
+        self.assertIn('onedrive_latency_seconds_bucket{operation="get_metadata",le="+Inf"} 1', text)
+
+        with tempfile.TemporaryDirectory() as d:
+            file = os.path.join(d, 'onedrive.prom')
+            self.stats.exporters.append(metrics.PrometheusExporter(file))
+            with self.assertLogs('onedrive.metrics', logging.INFO) as logs:
+                self.stats.exporters.append(metrics.LoggingExporter())
+                metrics.export()
+            self.stats.exporters.clear()
+            with open(file) as f:
+                self.assertEqual(f.read(), text)
+        self.assertIn('get_metadata: calls=1', logs.output[0])
+
+    def test_histogram(self):
+        h = metrics.Histogram((0.1, 1.0))
+        for v in (0.05, 0.5, 0.5, 5):
+            h.observe(v)
+        self.assertEqual(h.counts, [1, 2, 1])
+        self.assertEqual(h.quantile(0.5), 1.0)
+        self.assertEqual(h.quantile(1), float('inf'))
+
+
+if __name__ == '__main__':
+    unittest.main()
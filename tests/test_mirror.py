@@ -0,0 +1,148 @@
+import os
+import tempfile
+import unittest
+from onedrive import mirror
+from onedrive import session
+from helpers import FakeDrive, mount
+
+auth = {'Authorization': 'bearer xyz'}
+
+
+class TestMirror(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.local = os.path.join(self.dir.name, 'local')
+        os.makedirs(os.path.join(self.local, 'sub'))
+        self.drive = FakeDrive()
+        self.adapter = mount(session.get_session(), self.drive)
+        self.drive.mkdir('/m')
+        self.write('a.txt', b'local a')
+        self.write('sub/c.txt', b'same')
+        self.drive.mkdir('/m/sub')
+        self.drive.put('/m/sub/c.txt', b'same')
+        self.drive.mkdir('/m/r')
+        self.drive.put('/m/r/b.txt', b'remote b')
+
+    def tearDown(self):
+        session.close()
+        self.dir.cleanup()
+
+    def write(self, path, content):
+        f = os.path.join(self.local, *path.split('/'))
+        os.makedirs(os.path.dirname(f), exist_ok=True)
+        with open(f, 'wb') as fp:
+            fp.write(content)
+
+    def read(self, path):
+        with open(os.path.join(self.local, *path.split('/')), 'rb') as f:
+            return f.read()
+
+    def sync(self, **kw):
+        m = mirror.Mirror(self.local, '/m', auth, workers=4, **kw)
+        summary = m.sync()
+        self.assertEqual(summary.failed, [])
+        return summary
+
+    def kinds(self, summary):
+        return sorted(str(a) for a in summary.done)
+
+    def test_first_sync(self):
+        summary = self.sync()
+        self.assertEqual(self.kinds(summary), ['download r/b.txt', 'record sub/c.txt', 'upload a.txt'])
+        self.assertEqual(self.drive.contents['/m/a.txt'], b'local a')
+        self.assertEqual(self.read('r/b.txt'), b'remote b')
+        self.assertTrue(os.path.isfile(os.path.join(self.local, mirror.journal_name)))
+        self.assertEqual(mirror.Mirror(self.local, '/m', auth).plan(), [])
+
+    def test_left_over_temporary_files(self):
+        self.sync()
+        self.write('r/.onedrive-x1y2.part', b'half of b')  # the sync was killed while downloading
+        self.write(mirror.journal_name + '.tmp', b'{')  # or while writing the journal
+        self.assertEqual(mirror.Mirror(self.local, '/m', auth).plan(), [])
+
+    def test_changes_and_deletes(self):
+        self.sync()
+        self.write('a.txt', b'local a, changed')
+        self.drive.put('/m/r/b.txt', b'remote b, changed')
+        os.remove(os.path.join(self.local, 'sub', 'c.txt'))
+        self.assertEqual(self.kinds(self.sync()), ['delete_remote sub/c.txt', 'download r/b.txt', 'upload a.txt'])
+        self.assertEqual(self.drive.contents['/m/a.txt'], b'local a, changed')
+        self.assertEqual(self.read('r/b.txt'), b'remote b, changed')
+        self.assertNotIn('/m/sub/c.txt', self.drive.items)
+
+        del self.drive.items['/m/a.txt']
+        self.assertEqual(self.kinds(self.sync()), ['delete_local a.txt'])
+        self.assertFalse(os.path.exists(os.path.join(self.local, 'a.txt')))
+        self.assertEqual(mirror.Mirror(self.local, '/m', auth).plan(), [])
+
+    def test_moves(self):
+        self.sync()
+        os.rename(os.path.join(self.local, 'a.txt'), os.path.join(self.local, 'sub', 'moved.txt'))
+        sent = len(self.adapter.requests)
+        self.assertEqual(self.kinds(self.sync()), ['move_remote a.txt -> sub/moved.txt'])
+        self.assertEqual(self.drive.contents['/m/sub/moved.txt'], b'local a')
+        self.assertFalse(any(r.method == 'PUT' for r in self.adapter.requests[sent:]))
+
+        self.drive.mkdir('/m/new')
+        self.drive.items['/m/new/b2.txt'] = self.drive.items.pop('/m/r/b.txt')  # moved by another client
+        self.drive.items['/m/new/b2.txt']['name'] = 'b2.txt'
+        self.drive.contents['/m/new/b2.txt'] = self.drive.contents.pop('/m/r/b.txt')
+        sent = len(self.adapter.requests)
+        self.assertEqual(self.kinds(self.sync()), ['move_local r/b.txt -> new/b2.txt'])
+        self.assertEqual(self.read('new/b2.txt'), b'remote b')
+        self.assertFalse(any('/content' in r.url for r in self.adapter.requests[sent:]))
+        self.assertEqual(mirror.Mirror(self.local, '/m', auth).plan(), [])
+
+    def test_conflicts(self):
+        self.sync()
+        self.write('a.txt', b'mine')
+        self.drive.put('/m/a.txt', b'theirs')
+        summary = self.sync(conflict='fail')
+        self.assertEqual((summary.conflicts, summary.done), (['a.txt'], []))
+
+        self.assertEqual(self.kinds(self.sync()), ['conflict a.txt'])  # rename: keep both
+        self.assertEqual(self.read('a.txt'), b'theirs')
+        self.assertEqual(self.read('a 1.txt'), b'mine')
+        self.assertEqual(self.drive.contents['/m/a 1.txt'], b'mine')
+        self.assertEqual(mirror.Mirror(self.local, '/m', auth).plan(), [])
+
+        self.write('a.txt', b'mine again')
+        self.drive.put('/m/a.txt', b'theirs again')
+        self.sync(conflict='replace')
+        self.assertEqual(self.drive.contents['/m/a.txt'], b'mine again')
+        self.assertRaises(ValueError, mirror.Mirror, self.local, '/m', auth, conflict='newest')
+
+    def test_remote_missing(self):
+        m = mirror.Mirror(self.local, '/nothing/here', auth)
+        self.assertEqual(sorted(str(a) for a in m.plan()), ['upload a.txt', 'upload sub/c.txt'])
+        m.sync()
+        self.assertEqual(self.drive.contents['/nothing/here/sub/c.txt'], b'same')
+
+    def test_other_or_missing_remote_folder(self):
+        self.sync()
+        self.drive.mkdir('/other')
+        self.assertRaises(ValueError, mirror.Mirror(self.local, '/other', auth).plan)
+        self.assertRaises(ValueError, mirror.Mirror(self.local, '/other', auth).sync)
+
+        moved = {p: self.drive.items.pop(p) for p in list(self.drive.items) if p.startswith('/m')}
+        self.assertRaises(IOError, mirror.Mirror(self.local, '/m', auth).sync)  # not: everything deleted remotely
+        self.assertEqual(self.read('a.txt'), b'local a')
+
+        self.drive.mkdir('/m')  # recreated, with another id
+        self.assertRaises(ValueError, mirror.Mirror(self.local, '/m', auth).plan)
+        self.drive.items.update(moved)
+        self.assertEqual(mirror.Mirror(self.local, '/m', auth).plan(), [])
+
+    def test_max_deletes(self):
+        self.sync()
+        del self.drive.items['/m/a.txt']
+        del self.drive.items['/m/sub/c.txt']
+        m = mirror.Mirror(self.local, '/m', auth, max_deletes=1)
+        self.assertRaises(ValueError, m.sync)
+        self.assertEqual(self.read('a.txt'), b'local a')
+        self.assertEqual(self.kinds(self.sync(max_deletes=2)), ['delete_local a.txt', 'delete_local sub/c.txt'])
+
+
+if __name__ == '__main__':
+    unittest.main()
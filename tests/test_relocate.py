@@ -0,0 +1,87 @@
+import time
+import unittest
+from onedrive import relocate
+from onedrive import session
+from helpers import FakeDrive, mount
+
+auth = {'Authorization': 'bearer xyz'}
+
+
+class TestRelocate(unittest.TestCase):
+
+    def setUp(self):
+        self.drive = FakeDrive()
+        self.adapter = mount(session.get_session(), self.drive)
+        self.drive.mkdir('/inbox')
+        self.drive.mkdir('/inbox/2016')
+        self.drive.put('/inbox/2016/x.txt', b'x')
+        for name in ('a', 'b', 'c'):
+            self.drive.put('/inbox/' + name + '.txt', name.encode())
+
+    def tearDown(self):
+        session.close()
+
+    def test_plan_order(self):
+        ops = relocate.plan([('/a', '/new/a'), ('/b', '/new/a/b'), ('/a/c', '/c')])
+        by_src = {op.src: op for op in ops}
+        self.assertEqual(by_src['/b'].waits_for, {by_src['/a']})  # target folder is the moved /a
+        self.assertEqual(by_src['/a'].waits_for, {by_src['/a/c']})  # /a/c is moved out first
+        with self.assertRaises(ValueError):
+            relocate.plan([('/p', '/q/p'), ('/p/c', '/q/p/c')])
+
+        ops = relocate.plan([('/x', '/t'), ('/y', '/t/u/v/y'), ('/s', '/w'), ('/s/1/2', '/z')])
+        by_src = {op.src: op for op in ops}
+        self.assertEqual(by_src['/y'].waits_for, {by_src['/x']})  # deeper below the target
+        self.assertEqual(by_src['/s'].waits_for, {by_src['/s/1/2']})
+        self.assertEqual([op.waits_for for op in relocate.plan([('/s', '/w'), ('/s/1', '/z')], 'copy')], [set(), set()])
+
+    def test_move(self):
+        pairs = [('/inbox/a.txt', '/archive/2017/a.txt'), ('/inbox/b.txt', '/archive/2017/renamed.txt'),
+                 ('/inbox/2016', '/archive/2016'), ('/inbox/c.txt', '/archive/2016/old/c.txt'),
+                 ('/inbox/2016/x.txt', '/x.txt')]
+        summary = relocate.relocate(pairs, auth, mode='move', workers=4)
+        self.assertEqual((len(summary.done), summary.failed, summary.skipped), (5, [], []))
+        self.assertEqual(self.drive.contents['/archive/2017/renamed.txt'], b'b')
+        self.assertEqual(self.drive.contents['/archive/2016/old/c.txt'], b'c')
+        self.assertEqual(self.drive.contents['/x.txt'], b'x')
+        self.assertNotIn('/archive/2016/x.txt', self.drive.items)
+        # the target folders are created once, before anything is moved
+        posts = [r for r in self.adapter.requests if r.method == 'POST']
+        self.assertEqual(len(posts), 3)  # /archive, /archive/2017, /archive/2016/old
+
+    def test_copy(self):
+        pairs = [('/inbox/2016', '/copy/2016'), ('/inbox/a.txt', '/copy/2016/a.txt')]
+        summary = relocate.relocate(pairs, auth, mode='copy')
+        self.assertEqual(len(summary.done), 2, str(summary))
+        self.assertEqual(self.drive.contents['/copy/2016/x.txt'], b'x')
+        self.assertEqual(self.drive.contents['/copy/2016/a.txt'], b'a')
+        self.assertIn('/inbox/a.txt', self.drive.items)
+
+    def test_failures_skip_dependents(self):
+        pairs = [('/missing', '/new/m'), ('/inbox/a.txt', '/new/m/a.txt'), ('/inbox/b.txt', '/new/b.txt')]
+        summary = relocate.relocate(pairs, auth)
+        self.assertEqual(summary.done, [('/inbox/b.txt', '/new/b.txt')])
+        self.assertEqual([pair for pair, _ in summary.failed], [('/missing', '/new/m')])
+        self.assertEqual(summary.skipped, [(('/inbox/a.txt', '/new/m/a.txt'), ('/missing', '/new/m'))])
+        self.assertEqual(str(summary), '1 done, 1 failed, 1 skipped')
+
+    def test_failure_and_success_of_dependencies(self):
+        self.drive.mkdir('/p')
+
+        def slow(request):  # /a is moved after /p/child failed
+            if request.method == 'PATCH' and request.url.endswith(':/a'):
+                time.sleep(0.2)
+            return self.drive(request)
+
+        mount(session.get_session(), slow)
+        self.drive.mkdir('/a')
+        pairs = [('/a', '/t'), ('/p/child', '/q/child'), ('/p', '/t/p')]
+        summary = relocate.relocate(pairs, auth, mode='move')
+        self.assertEqual(summary.done, [('/a', '/t')])
+        self.assertEqual([pair for pair, _ in summary.failed], [('/p/child', '/q/child')])
+        self.assertEqual(summary.skipped, [(('/p', '/t/p'), ('/p/child', '/q/child'))])
+        self.assertIn('/p', self.drive.items)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+from onedrive import api
+from onedrive import session
+from helpers import mount
+
+auth = {'Authorization': 'bearer xyz'}
+
+
+def pages(request):
+    if 'skiptoken' in request.url:
+        return 200, {}, {'value': [{'name': 'c', 'file': {}}]}
+    return 200, {}, {'value': [{'name': 'a', 'file': {}}, {'name': 'b', 'folder': {}}],
+                     '@odata.nextLink': 'https://api.example/children?skiptoken=1'}
+
+
+class TestResult(unittest.TestCase):
+
+    def tearDown(self):
+        session.close()
+
+    def test_json_body_is_parsed_once(self):
+        mount(session.get_session(), lambda r: (200, {}, {'id': 'x'}))
+        res = api.get_metadata("/foo", auth)
+        self.assertIs(res.json_body(), res.json_body())
+        self.assertEqual(res.json_body(), {'id': 'x'})
+        self.assertEqual(res.text, '{"id": "x"}')
+
+    def test_binary_content(self):
+        data = bytes(range(256))
+        mount(session.get_session(), lambda r: (200, {}, data))
+        res = api.download("/foo.bin", auth)
+        self.assertEqual(res.content, data)
+        self.assertEqual(res.json_body(), res.text)
+
+    def test_slots(self):
+        mount(session.get_session(), lambda r: (204, {}, ''))
+        res = api.delete("/foo", auth)
+        with self.assertRaises(AttributeError):
+            res.foo = 1
+
+    def test_list_children_keeps_parsed_items(self):
+        mount(session.get_session(), pages)
+        res = api.list_children("/foo", auth)
+        self.assertEqual([i['name'] for i in res.json_body()['value']], ['a', 'b', 'c'])
+        self.assertIn('"name": "c"', res.text)
+        self.assertIn('status_code: 200', res.to_string())
+
+
+if __name__ == '__main__':
+    unittest.main()
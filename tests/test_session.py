@@ -0,0 +1,46 @@
+import unittest
+from onedrive import api
+from onedrive import session
+from helpers import mount
+
+auth = {'Authorization': 'bearer xyz'}
+
+
+class TestSession(unittest.TestCase):
+
+    def tearDown(self):
+        session.close()
+
+    def test_session_is_shared(self):
+        self.assertIs(session.get_session(), session.get_session())
+
+    def test_configure_replaces_session(self):
+        s1 = session.get_session()
+        s2 = session.configure(pool_maxsize=32, keep_alive=False)
+        self.assertIsNot(s1, s2)
+        self.assertIs(session.get_session(), s2)
+        self.assertEqual(s2.get_adapter('https://').__dict__['_pool_maxsize'], 32)
+        self.assertEqual(s2.headers['Connection'], 'close')
+
+    def test_api_calls_use_shared_session(self):
+        adapter = mount(session.get_session(), lambda r: (200, {}, {'id': 'abc', 'folder': {}}))
+
+        self.assertTrue(api.exists("/foo", auth))
+        res = api.mkdir("/foo/bar", auth)
+        self.assertEqual(res.status_code, 200)
+
+        self.assertEqual(len(adapter.requests), 3)
+        post = adapter.requests[-1]
+        self.assertEqual(post.method, 'POST')
+        self.assertTrue(post.url.endswith('/drive/items/abc/children'))
+        self.assertEqual(post.headers['Authorization'], 'bearer xyz')
+        self.assertEqual(post.headers['Content-Type'], 'application/json')
+
+    def test_auth_is_not_modified(self):
+        mount(session.get_session(), lambda r: (202, {'Location': 'x'}, ''))
+        api.copy("/a", "/b", auth)
+        self.assertEqual(auth, {'Authorization': 'bearer xyz'})
+
+
+if __name__ == '__main__':
+    unittest.main()
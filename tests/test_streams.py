@@ -0,0 +1,118 @@
+import io
+import os
+import tempfile
+import threading
+import unittest
+from onedrive import api
+from onedrive import session
+from onedrive import streams
+from onedrive import throttle
+from onedrive import upload
+from helpers import FakeDrive, mount
+
+auth = {'Authorization': 'bearer xyz'}
+
+
+class TestStreams(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.content = os.urandom(3 * 1024 + 17)
+        self.file = os.path.join(self.dir.name, 'f.bin')
+        with open(self.file, 'wb') as f:
+            f.write(self.content)
+        self.drive = FakeDrive()
+        self.adapter = mount(session.get_session(), self.drive)
+
+    def tearDown(self):
+        session.close()
+        self.dir.cleanup()
+
+    def test_body_sources(self):
+        progress = []
+        b = streams.body(memoryview(self.content), progress=lambda n, t: progress.append((n, t)), chunk_size=1024)
+        self.assertEqual(len(b), len(self.content))
+        self.assertEqual(b''.join(bytes(c) for c in b), self.content)
+        self.assertEqual(progress[-1], (len(self.content), len(self.content)))
+        self.assertEqual(len(progress), 4)
+        self.assertTrue(b.replayable)
+
+        with open(self.file, 'rb') as f:
+            f.seek(17)
+            b = streams.body(f, chunk_size=1024)
+            self.assertEqual(len(b), 3 * 1024)
+            for _ in range(2):  # replayable
+                self.assertEqual(b''.join(bytes(c) for c in b), self.content[17:])
+
+        b = streams.body(io.BytesIO(self.content))
+        self.assertEqual(len(b), len(self.content))
+
+        b = streams.body(iter([b'ab', b'c']), size=3)
+        self.assertEqual((len(b), b.replayable), (3, False))
+        self.assertEqual(list(streams.body(iter([b'ab', b'c']))), [b'ab', b'c'])
+        self.assertEqual(streams.body(b'xyz'), b'xyz')
+
+    def test_mmap(self):
+        mmap_threshold = streams.mmap_threshold
+        streams.mmap_threshold = 1024
+        self.addCleanup(setattr, streams, 'mmap_threshold', mmap_threshold)
+        b = streams.file_range(self.file, 100, 2048, chunk_size=1000)
+        self.assertEqual(b''.join(bytes(c) for c in b), self.content[100:2148])
+
+    def test_upload_simple_streams(self):
+        progress = []
+        with open(self.file, 'rb') as f:
+            res = api.upload_simple(f, '/f.bin', auth, progress=lambda n, t: progress.append(n))
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(self.drive.contents['/f.bin'], self.content)
+        self.assertEqual(progress[-1], len(self.content))
+
+        api.upload_simple((bytes([i]) * 10 for i in range(3)), '/gen.bin', auth)
+        self.assertEqual(self.drive.contents['/gen.bin'], b'\0' * 10 + b'\1' * 10 + b'\2' * 10)
+
+    def pipe(self):
+        """:return: the read end of a pipe the content is written to"""
+        r, w = os.pipe()
+        writer = threading.Thread(target=lambda: os.write(w, self.content) and os.close(w))
+        writer.start()
+        self.addCleanup(writer.join)
+        return os.fdopen(r, 'rb', buffering=0)
+
+    def test_pipe(self):
+        with self.pipe() as f:
+            progress = []
+            res = api.upload_simple(f, '/pipe.bin', auth, progress=lambda n, t: progress.append((n, t)))
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(self.drive.contents['/pipe.bin'], self.content)
+        self.assertEqual(progress[-1], (len(self.content), None))  # length unknown: sent chunked
+
+        with self.pipe() as f:
+            b = streams.body(f, size=len(self.content), chunk_size=1024)
+            self.assertEqual((len(b), b.replayable), (len(self.content), False))
+            self.assertEqual(b''.join(bytes(c) for c in b), self.content)
+
+    def test_retry_replays_file(self):
+        throttle.configure(max_retries=2, backoff=0.001, min_rate=1000)
+        self.addCleanup(throttle.configure)
+        codes = [503]
+        drive = self.drive
+        mount(session.get_session(), lambda r: (codes.pop(), {}, '') if codes else drive(r))
+        with open(self.file, 'rb') as f:
+            res = api.upload_simple(f, '/f.bin', auth)
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(self.drive.contents['/f.bin'], self.content)
+
+    def test_upload_large_progress(self):
+        content = os.urandom(2 * upload.fragment_unit + 5)
+        with open(self.file, 'wb') as f:
+            f.write(content)
+        progress = []
+        res = upload.upload_large(self.file, '/big.bin', auth, fragment_size=upload.fragment_unit, workers=2,
+                                  progress=lambda n, t: progress.append((n, t)))
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(self.drive.contents['/big.bin'], content)
+        self.assertEqual(max(progress), (len(content), len(content)))
+
+
+if __name__ == '__main__':
+    unittest.main()
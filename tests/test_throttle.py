@@ -0,0 +1,89 @@
+import time
+import unittest
+import requests
+from onedrive import api
+from onedrive import session
+from onedrive import throttle
+from helpers import mount
+
+auth = {'Authorization': 'bearer xyz'}
+
+
+class Flaky:
+    """answers with the given status codes first, then 200"""
+
+    def __init__(self, *codes, headers=None):
+        self.codes = list(codes)
+        self.headers = headers or {}
+
+    def __call__(self, request):
+        if self.codes:
+            code = self.codes.pop(0)
+            if code is None:
+                raise requests.ConnectionError("connection reset")
+            return code, self.headers, ''
+        return 200, {}, {'id': 'x'}
+
+
+class TestThrottle(unittest.TestCase):
+
+    def setUp(self):
+        throttle.configure(max_retries=3, backoff=0.001, min_rate=1000)
+
+    def tearDown(self):
+        throttle.configure()
+        session.close()
+
+    def test_retry_after(self):
+        adapter = mount(session.get_session(), Flaky(429, headers={'Retry-After': '0.05'}))
+        start = time.time()
+        self.assertEqual(api.get_metadata('/a', auth).status_code, 200)
+        self.assertGreaterEqual(time.time() - start, 0.05)
+        self.assertEqual(len(adapter.requests), 2)
+        self.assertIsNotNone(throttle.get_limiter().rate)
+
+    def test_server_errors(self):
+        adapter = mount(session.get_session(), Flaky(500, 502, None))
+        self.assertEqual(api.get_metadata('/a', auth).status_code, 200)
+        self.assertEqual(len(adapter.requests), 4)
+
+    def test_give_up(self):
+        mount(session.get_session(), Flaky(503, 503, 503, 503, 503))
+        self.assertEqual(api.delete('/a', auth).status_code, 503)
+
+    def test_no_retry_for_post_errors(self):
+        adapter = mount(session.get_session(), Flaky(500))
+        self.assertEqual(api.copy('/a', '/b', auth).status_code, 500)
+        self.assertEqual(len(adapter.requests), 1)
+
+    def test_too_long_retry_after(self):
+        adapter = mount(session.get_session(), Flaky(429, headers={'Retry-After': '3600'}))
+        self.assertEqual(api.get_metadata('/a', auth).status_code, 429)
+        res = api.get_metadata('/b', auth)  # all callers are locked out, nothing is sent
+        self.assertEqual(res.status_code, 429)
+        self.assertGreater(int(res.headers['Retry-After']), 3500)
+        self.assertEqual(len(adapter.requests), 1)
+
+    def test_rate_limiter(self):
+        limiter = throttle.RateLimiter(rate=100, min_rate=1)
+        start = time.time()
+        for _ in range(11):
+            limiter.acquire()
+        self.assertGreaterEqual(time.time() - start, 0.09)
+        limiter.throttled()
+        self.assertEqual(limiter.rate, 50)
+        limiter.succeeded()
+        self.assertAlmostEqual(limiter.rate, 50.1)
+
+    def test_halved_once_per_window(self):
+        limiter = throttle.RateLimiter(rate=1000, min_rate=1)
+        sent = [limiter.acquire() for _ in range(8)]  # concurrent requests, all throttled
+        for t in sent:
+            limiter.throttled(sent=t)
+        self.assertEqual(limiter.rate, 500)
+        limiter.throttled(sent=limiter.acquire())  # sent after the reduction
+        self.assertEqual(limiter.rate, 250)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+import os
+import tempfile
+import time
+import unittest
+from onedrive import api
+from onedrive import disk_cache
+from onedrive import download
+from onedrive import session
+from onedrive import thumbnails
+from helpers import FakeDrive, mount
+
+auth = {'Authorization': 'bearer xyz'}
+
+
+class TestDiskCache(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_lru(self):
+        dc = disk_cache.DiskCache(self.dir.name, max_bytes=25)
+        dc.put('a', 't1', b'a' * 10)
+        dc.put('b', 't1', b'b' * 10)
+        self.assertEqual(dc.get('a', 't1'), b'a' * 10)  # a is now more recent than b
+        self.assertIsNone(dc.get('a', 't2'))
+        dc.put('c', 't1', b'c' * 10)
+        self.assertIsNone(dc.get('b', 't1'))
+        self.assertEqual((dc.get('c', 't1'), dc.size), (b'c' * 10, 20))
+        dc.put('d', 't1', b'd' * 30)  # larger than the cache
+        self.assertIsNone(dc.get('d', 't1'))
+        self.assertEqual(dc.get('a', 't1', 'thumbnail:small'), None)
+
+    def test_reload(self):
+        dc = disk_cache.DiskCache(self.dir.name, max_bytes=25)
+        dc.put('a', 't', b'a' * 10)
+        dc.put('b', 't', b'b' * 10)
+        past = time.time() - 60
+        os.utime(dc.path('b', 't'), (past, past))  # b is the least recently used one
+        partial = os.path.join(self.dir.name, '.partial')
+        open(partial, 'wb').close()
+        stale = time.time() - disk_cache.stale_after - 1
+        os.utime(partial, (stale, stale))
+        dc = disk_cache.DiskCache(self.dir.name, max_bytes=25)
+        self.assertEqual(dc.size, 20)
+        self.assertFalse(os.path.exists(partial))
+        dc.put('c', 't', b'c' * 10)
+        self.assertIsNone(dc.get('b', 't'))
+        self.assertEqual(dc.get('a', 't'), b'a' * 10)
+        dc.clear()
+        self.assertEqual((dc.size, dc.get('a', 't')), (0, None))
+
+    def test_write_of_another_process(self):
+        dc = disk_cache.DiskCache(self.dir.name)
+
+        def chunks():
+            yield b'a' * 10
+            disk_cache.DiskCache(self.dir.name)  # another process starts while the file is written
+            yield b'b' * 10
+
+        dc.put_chunks('a', 't', chunks())
+        self.assertEqual(dc.get('a', 't'), b'a' * 10 + b'b' * 10)
+
+
+class TestCachedDownloads(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.dc = disk_cache.configure(os.path.join(self.dir.name, 'cache'))
+        self.drive = FakeDrive()
+        self.adapter = mount(session.get_session(), self.drive)
+        self.drive.mkdir('/photos')
+        for i in range(4):
+            self.drive.put('/photos/{}.jpg'.format(i), bytes([i]) * 100)
+        self.drive.mkdir('/photos/sub')
+
+    def tearDown(self):
+        disk_cache.disable()
+        session.close()
+        self.dir.cleanup()
+
+    def content_requests(self):
+        return [r for r in self.adapter.requests if r.url.split('?')[0].endswith('/content')]
+
+    def test_download(self):
+        self.assertEqual(api.download('/photos/1.jpg', auth).content, b'\1' * 100)
+        res = api.download('/photos/1.jpg', auth)
+        self.assertEqual((res.status_code, res.content), (200, b'\1' * 100))
+        self.assertEqual(len(self.content_requests()), 1)
+
+        self.drive.put('/photos/1.jpg', b'new')  # new eTag
+        self.assertEqual(api.download('/photos/1.jpg', auth).content, b'new')
+        self.assertEqual(len(self.content_requests()), 2)
+
+    def test_download_to(self):
+        dst = os.path.join(self.dir.name, 'a.jpg')
+        self.assertEqual(download.download_to('/photos/2.jpg', dst, auth).status_code, 200)
+        os.remove(dst)
+        sent = len(self.content_requests())
+        self.assertEqual(download.download_to('/photos/2.jpg', dst, auth).status_code, 200)
+        with open(dst, 'rb') as f:
+            self.assertEqual(f.read(), b'\2' * 100)
+        self.assertEqual(api.download('/photos/2.jpg', auth).content, b'\2' * 100)  # shared with download()
+        self.assertEqual(len(self.content_requests()), sent)
+
+    def test_thumbnails(self):
+        sets = thumbnails.thumbnails('/photos/0.jpg', auth).json_body()['value']
+        self.assertEqual(sorted(sets[0]), ['id', 'large', 'medium', 'small'])
+        item_id = self.drive.items['/photos/0.jpg']['id']
+        res = thumbnails.get_thumbnail('/photos/0.jpg', auth, 'large')
+        self.assertEqual(res.content, 'large:{}'.format(item_id).encode())
+        thumbnails.get_thumbnail('/photos/0.jpg', auth, 'large')
+        self.assertEqual(len([r for r in self.adapter.requests if '/thumbnails/0/' in r.url]), 1)
+        self.assertEqual(thumbnails.get_thumbnail('/photos/sub', auth).status_code, 404)
+        self.assertEqual(thumbnails.custom_size(300, 200, crop=True), 'c300x200_Crop')
+
+    def test_prefetch(self):
+        result = thumbnails.prefetch('/photos', auth, sizes=('small', 'medium'), content=True, workers=4)
+        self.assertEqual((result.fetched, result.cached, result.failed), (12, 0, []))
+        sent = len(self.adapter.requests)
+        self.assertEqual(api.download('/photos/3.jpg', auth).content, b'\3' * 100)
+        self.assertEqual(thumbnails.get_thumbnail('/photos/3.jpg', auth, 'small').status_code, 200)
+        self.assertFalse(any(r.url.split('?')[0].endswith('/content') for r in self.adapter.requests[sent:]))
+
+        self.drive.put('/photos/3.jpg', b'changed')
+        result = thumbnails.prefetch('/photos', auth, sizes=('small', 'medium'), content=True)
+        self.assertEqual((result.fetched, result.cached), (3, 9))
+        self.assertEqual(str(result), '3 fetched, 9 cached, 0 missing, 0 failed')
+
+        self.drive.put('/photos/sub/x.jpg', b'x')
+        self.assertEqual(thumbnails.prefetch('/photos', auth, recursive=True).fetched, 1)
+
+        disk_cache.disable()
+        self.assertRaises(ValueError, thumbnails.prefetch, '/photos', auth)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import os
+import tempfile
+import unittest
+from onedrive import session
+from onedrive import throttle
+from onedrive import transfer
+from helpers import FakeDrive, mount
+
+auth = {'Authorization': 'bearer xyz'}
+
+
+class TestTransfer(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.src = os.path.join(self.dir.name, 'src')
+        for d in ('a/b', 'c'):
+            os.makedirs(os.path.join(self.src, d))
+        self.files = {'f1.txt': b'1', 'a/f2.txt': b'22', 'a/b/f3.txt': b'333', 'c/f4.txt': b'4444'}
+        for name, content in self.files.items():
+            with open(os.path.join(self.src, name), 'wb') as f:
+                f.write(content)
+        self.drive = FakeDrive()
+        self.adapter = mount(session.get_session(), self.drive)
+
+    def tearDown(self):
+        session.close()
+        self.dir.cleanup()
+
+    def test_put_tree(self):
+        progress = []
+        p = transfer.put_tree(self.src, '/backup', auth, workers=4, progress=progress.append)
+        self.assertEqual(p.failed, [])
+        self.assertEqual((p.files_done, p.bytes_done, p.skipped), (4, 10, 0))
+        self.assertEqual(len(progress), 4)
+        for name, content in self.files.items():
+            self.assertEqual(self.drive.contents['/backup/' + name], content)
+
+        sent = len(self.adapter.requests)
+        p = transfer.put_tree(self.src, '/backup', auth)
+        self.assertEqual(p.skipped, 4)
+        self.assertFalse(any(r.method == 'PUT' for r in self.adapter.requests[sent:]))
+
+    def test_get_tree(self):
+        transfer.put_tree(self.src, '/backup', auth)
+        dst = os.path.join(self.dir.name, 'dst')
+        p = transfer.get_tree('/backup', dst, auth, workers=3)
+        self.assertEqual(p.failed, [])
+        self.assertEqual(p.files_done, 4)
+        for name, content in self.files.items():
+            with open(os.path.join(dst, *name.split('/')), 'rb') as f:
+                self.assertEqual(f.read(), content)
+
+        p = transfer.get_tree('/backup', dst, auth)
+        self.assertEqual(p.skipped, 4)
+
+    def test_put_tree_resume(self):
+        throttle.configure(max_retries=0)  # the failed fragments interrupt the uploads
+        self.addCleanup(throttle.configure)
+        large, transfer.large_file_size = transfer.large_file_size, 2  # f3 and f4 go through upload sessions
+        self.addCleanup(setattr, transfer, 'large_file_size', large)
+        state_dir = os.path.join(self.dir.name, 'state')
+        os.makedirs(state_dir)
+        failing = [True]
+
+        def service(request):
+            if request.method == 'PUT' and '/upload/' in request.url and failing[0]:
+                return 500, {}, {'error': {'code': 'generalException'}}
+            return self.drive(request)
+
+        mount(session.get_session(), service)
+        p = transfer.put_tree(self.src, '/backup', auth, state_dir=state_dir)
+        self.assertEqual(len(p.failed), 2)
+        self.assertEqual(len(os.listdir(state_dir)), 2)
+
+        failing[0] = False
+        adapter = mount(session.get_session(), service)
+        p = transfer.put_tree(self.src, '/backup', auth, state_dir=state_dir)
+        self.assertEqual(p.failed, [])
+        self.assertFalse(any('createUploadSession' in r.url for r in adapter.requests))  # the sessions are resumed
+        self.assertEqual(os.listdir(state_dir), [])
+        for name, content in self.files.items():
+            self.assertEqual(self.drive.contents['/backup/' + name], content)
+
+    def test_get_tree_resume(self):
+        transfer.put_tree(self.src, '/backup', auth)
+        dst = os.path.join(self.dir.name, 'dst')
+        transfer.get_tree('/backup', dst, auth)
+        with open(os.path.join(dst, 'c', 'f4.txt'), 'wb') as f:
+            f.write(b'44')  # interrupted
+        sent = len(self.adapter.requests)
+        p = transfer.get_tree('/backup', dst, auth, skip_unchanged=False, resume=True)
+        self.assertEqual(p.failed, [])
+        with open(os.path.join(dst, 'c', 'f4.txt'), 'rb') as f:
+            self.assertEqual(f.read(), b'4444')
+        ranges = [r.headers.get('Range') for r in self.adapter.requests[sent:] if r.method == 'GET']
+        self.assertIn('bytes=2-', ranges)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+import os
+import sys
+import tempfile
+import unittest
+from onedrive import api
+from onedrive import cache
+from onedrive import client
+from onedrive import download
+from onedrive import session
+from onedrive import transport
+from onedrive import upload
+from helpers import FakeDrive, mount
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+from mock_server import MockServer  # noqa: E402
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+auth = {'Authorization': 'bearer xyz'}
+
+
+class TestTransport(unittest.TestCase):
+
+    def setUp(self):
+        self.default = mount(session.get_session(), lambda r: (500, {}, 'the default transport is not used'))
+
+    def tearDown(self):
+        session.close()
+
+    def test_memory_transport(self):
+        drive = FakeDrive()
+        t = transport.MemoryTransport(drive)
+        c = client.Client(auth, base_url='http://stand-in/v1.0/', transport=t)
+        self.assertEqual(dict(c), auth)
+
+        self.assertEqual(api.mkdir('/a/b', c, parents=True).status_code, 201)
+        self.assertEqual(api.upload_simple(b'small', '/a/b/s.txt', c).status_code, 201)
+        with tempfile.TemporaryDirectory() as d:
+            src = os.path.join(d, 'big')
+            with open(src, 'wb') as f:
+                f.write(os.urandom(upload.fragment_unit + 1))
+            self.assertEqual(upload.upload_large(src, '/a/big', c, fragment_size=upload.fragment_unit).status_code, 201)
+            dst = os.path.join(d, 'copy')
+            self.assertEqual(download.download_to('/a/b/s.txt', dst, c).status_code, 200)
+            with open(dst, 'rb') as f:
+                self.assertEqual(f.read(), b'small')
+        self.assertEqual(len(drive.contents['/a/big']), upload.fragment_unit + 1)
+        self.assertEqual([i['name'] for i in api.list_children('/a', c).json_body()['value']], ['b', 'big'])
+
+        self.assertEqual(self.default.requests, [])
+        api_requests = [r for r in t.requests if '/upload/' not in r.url]
+        self.assertTrue(all(r.url.startswith('http://stand-in/v1.0/drive/') for r in api_requests))
+        self.assertTrue(all(r.headers['Authorization'] == 'bearer xyz' for r in api_requests))
+        fragments = [r for r in t.requests if '/upload/' in r.url]
+        self.assertTrue(fragments)
+        self.assertTrue(all('Authorization' not in r.headers for r in fragments))  # pre-authenticated
+
+        res = api.copy('/a/b/s.txt', '/a/c.txt', c)  # the monitor redirects to the copy once it is done
+        status = api.AsyncOperationStatus(res.headers['Location'], c)
+        self.assertEqual((status.status, status.percentageComplete), ('completed', 100))
+        self.assertEqual(status.response.json()['name'], 'c.txt')
+        self.assertEqual([r.status_code for r in status.response.history], [303])
+
+    def test_clients_side_by_side(self):
+        drives = FakeDrive(), FakeDrive()
+        clients = [client.Client(auth, transport=transport.MemoryTransport(d)) for d in drives]
+        for i, c in enumerate(clients):
+            api.upload_simple(str(i), '/x.txt', c)
+        self.assertEqual([d.contents['/x.txt'] for d in drives], [b'0', b'1'])
+
+    def test_caches_per_base_url(self):
+        cache.configure()
+        self.addCleanup(cache.disable)
+        drives = FakeDrive(), FakeDrive()
+        for d, content in zip(drives, (b'one', b'two')):
+            d.put('/x.txt', content)
+        ts = [transport.MemoryTransport(d) for d in drives]
+        clients = [client.Client(auth, base_url='http://{}/v1.0'.format(n), transport=t) for n, t in zip('ab', ts)]
+        for c in clients:
+            self.assertEqual(api.get_metadata('/x.txt', c).json_body()['size'], 3)
+        self.assertEqual([len(t.requests) for t in ts], [1, 1])  # not answered from the cache of the other
+        self.assertIsNot(clients[0].limiter, clients[1].limiter)
+
+        own = client.Client(auth, base_url='http://a/v1.0', transport=ts[0], cache=cache.MetadataCache())
+        api.get_metadata('/x.txt', own)
+        api.get_metadata('/x.txt', own)
+        self.assertEqual(len(ts[0].requests), 2)
+
+    def test_route(self):
+        c = client.Client(auth, base_url='http://stand-in/v1.0')
+        self.assertEqual(c.route('https://API.onedrive.com/v1.0/drive/root:/a#b.txt'),
+                         'http://stand-in/v1.0/drive/root:/a#b.txt')
+        for other in ('https://api.onedrive.com/v1.0evil/drive', 'https://api.onedrive.com.evil/v1.0/drive',
+                      'http://api.onedrive.com/v1.0/drive', 'https://download.example/v1.0/x'):
+            self.assertEqual(c.route(other), other)
+
+    def test_refresh(self):
+        class Provider(dict):
+            def refresh(self, stale):
+                self['Authorization'] = 'bearer new'
+
+        def handler(request):
+            ok = request.headers['Authorization'] == 'bearer new'
+            return (200, {}, {'id': 'x'}) if ok else (401, {}, {'error': {'code': 'unauthenticated'}})
+
+        c = client.Client(Provider(auth), transport=transport.MemoryTransport(handler))
+        self.assertTrue(api.exists('/x', c))
+        self.assertIsNone(client.Client(auth).refresh)
+
+    def test_requests_transport_local_server(self):
+        with MockServer() as server, client.Client(auth, server.base_url, transport.RequestsTransport()) as c:
+            self.assertEqual(api.mkdir('/a/b', c, parents=True).status_code, 201)
+            api.upload_simple(b'abc', '/a/b/f', c)
+            self.assertEqual(api.download('/a/b/f', c).content, b'abc')
+        self.assertEqual(self.default.requests, [])
+
+    @unittest.skipUnless(httpx, 'needs httpx')
+    def test_http2_transport_local_server(self):
+        with MockServer() as server, client.Client(auth, server.base_url, transport.Http2Transport()) as c:
+            self.assertEqual(api.mkdir('/a', c).status_code, 201)
+            api.upload_simple(b'abc' * 1000, '/a/f', c)
+            self.assertEqual(api.download('/a/f', c).content, b'abc' * 1000)
+            status = api.AsyncOperationStatus(api.copy('/a/f', '/g', c).headers['Location'], c)
+            self.assertEqual(status.status, 'completed')
+            with tempfile.TemporaryDirectory() as d:
+                dst = os.path.join(d, 'f')
+                self.assertEqual(download.download_to('/a/f', dst, c, chunk_size=100).status_code, 200)
+                self.assertEqual(os.path.getsize(dst), 3000)
+
+    def test_default_transport(self):
+        t = transport.MemoryTransport(lambda r: (200, {}, {'id': 'x'}))
+        self.assertIs(session.configure(transport=t), t)
+        self.assertIs(session.get_transport(), t)
+        self.assertTrue(api.exists('/x', auth))
+        self.assertEqual(len(t.requests), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
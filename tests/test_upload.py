@@ -0,0 +1,110 @@
+import os
+import re
+import tempfile
+import threading
+import unittest
+from onedrive import session
+from onedrive import throttle
+from onedrive import upload
+from helpers import mount
+
+auth = {'Authorization': 'bearer xyz'}
+unit = upload.fragment_unit
+
+
+class FakeUploadService:
+    """minimal upload session endpoint: keeps received bytes per offset"""
+
+    def __init__(self, size, fail_at=None):
+        self.size = size
+        self.received = {}
+        self.fail_at = fail_at
+        self.sessions = 0
+        self.lock = threading.Lock()
+
+    def missing(self):
+        ranges, pos = [], 0
+        for start in sorted(self.received):
+            if start > pos:
+                ranges.append('{}-{}'.format(pos, start - 1))
+            pos = max(pos, start + len(self.received[start]))
+        if pos < self.size:
+            ranges.append('{}-'.format(pos))
+        return ranges
+
+    def __call__(self, request):
+        if request.url.endswith(':/upload.createSession'):
+            self.sessions += 1
+            return 200, {}, {'uploadUrl': 'https://up.example/session', 'nextExpectedRanges': ['0-']}
+        if request.method == 'GET':
+            return 200, {}, {'nextExpectedRanges': self.missing()}
+        assert 'Authorization' not in request.headers
+        start, end, total = map(int, re.match(r'bytes (\d+)-(\d+)/(\d+)', request.headers['Content-Range']).groups())
+        if self.fail_at == start:
+            self.fail_at = None
+            return 500, {}, ''
+        with self.lock:
+            self.received[start] = request.body
+            if not self.missing():
+                return 201, {}, {'id': 'new', 'size': total}
+        return 202, {}, {'nextExpectedRanges': self.missing()}
+
+    def content(self):
+        return b''.join(self.received[k] for k in sorted(self.received))
+
+
+class TestUploadLarge(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.src = os.path.join(self.dir.name, 'big.bin')
+        self.content = os.urandom(5 * unit + 123)
+        with open(self.src, 'wb') as f:
+            f.write(self.content)
+        self.state = os.path.join(self.dir.name, 'state.json')
+
+    def tearDown(self):
+        session.close()
+        self.dir.cleanup()
+
+    def test_fragments(self):
+        self.assertEqual(list(upload.fragments([(0, 9)], 4)), [(0, 3), (4, 7), (8, 9)])
+        self.assertEqual(upload.parse_ranges(['0-4', '8-'], 12), [(0, 4), (8, 11)])
+
+    def test_invalid_fragment_size(self):
+        with self.assertRaises(ValueError):
+            upload.upload_large(self.src, '/big.bin', auth, fragment_size=1000)
+
+    def test_upload_sequential(self):
+        service = FakeUploadService(len(self.content))
+        mount(session.get_session(), service)
+        res = upload.upload_large(self.src, '/big.bin', auth, fragment_size=2 * unit)
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(service.content(), self.content)
+
+    def test_upload_parallel(self):
+        service = FakeUploadService(len(self.content))
+        mount(session.get_session(), service)
+        res = upload.upload_large(self.src, '/big.bin', auth, fragment_size=unit, workers=3)
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(service.content(), self.content)
+
+    def test_resume(self):
+        throttle.configure(max_retries=0)  # the failed fragment interrupts the upload
+        self.addCleanup(throttle.configure)
+        service = FakeUploadService(len(self.content), fail_at=2 * unit)
+        mount(session.get_session(), service)
+
+        res = upload.upload_large(self.src, '/big.bin', auth, fragment_size=unit, state_file=self.state)
+        self.assertEqual(res.status_code, 500)
+        self.assertTrue(os.path.isfile(self.state))
+
+        res = upload.upload_large(self.src, '/big.bin', auth, fragment_size=unit, state_file=self.state)
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(service.sessions, 1)
+        self.assertEqual(service.content(), self.content)
+        self.assertFalse(os.path.isfile(self.state))
+
+
+if __name__ == '__main__':
+    unittest.main()